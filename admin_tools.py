@@ -0,0 +1,198 @@
+"""
+Offline administration commands for the bid database
+
+Each command selects bids with set-based filters, updates all of them in memory,
+appends one history entry per bid and saves everything with a single workbook
+write. Use --dry-run to see how many bids would change without writing anything.
+
+Usage:
+    python admin_tools.py --dry-run reassign-buyer V001 V002 --comment "John has left"
+    python admin_tools.py close-drafts --older-than 90
+    python admin_tools.py reopen --from 2025-01-01 --to 2025-01-31 --comment "Rates revised"
+    python admin_tools.py rebuild-totals
+    python admin_tools.py rebuild-price-index
+    python admin_tools.py migrate
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import db_helper as db
+
+CLOSED_STATUS = 'Closed'
+
+# Bids in these states are finished, so reassign-buyer leaves them alone by default
+FINISHED_STATUSES = ['Approved', CLOSED_STATUS]
+
+
+def _date_filter(bids_df, args):
+    return db.bid_filter_mask(bids_df, date_from=args.date_from, date_to=args.date_to)
+
+
+def _id_filter(bids_df, bid_ids):
+    if not bid_ids:
+        return True
+    return bids_df['bid_id'].astype(str).isin(bid_ids)
+
+
+def reassign_buyer(args):
+    """Move bids from one buyer to another"""
+    buyer = db.get_buyer_by_id(args.to_buyer)
+    if not buyer:
+        raise ValueError(f"Buyer '{args.to_buyer}' not found")
+
+    def mask(bids_df):
+        selected = db.bid_filter_mask(bids_df, status=args.status, buyer_id=args.from_buyer) & _date_filter(bids_df, args)
+        if not args.status:
+            selected &= ~bids_df['status'].isin(FINISHED_STATUSES)
+        return selected
+
+    comment = f"Reassigned buyer {args.from_buyer} -> {buyer['buyer_name']} ({args.to_buyer})"
+    if args.comment:
+        comment += f": {args.comment}"
+    return db.bulk_update_bids(mask, {'selected_buyer_id': args.to_buyer}, args.actor, 'Vendor',
+                               'Reassigned Buyer', comment, dry_run=args.dry_run)
+
+
+def close_drafts(args):
+    """Close drafts created before a cut-off date"""
+    cutoff = args.before or (datetime.now() - timedelta(days=args.older_than)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def mask(bids_df):
+        created = db.bid_filter_mask(bids_df, date_to=cutoff) & bids_df['created_date'].notna()
+        return db.bid_filter_mask(bids_df, status=args.status) & created
+
+    comment = args.comment or f"Closed stale draft (created before {cutoff})"
+    return db.bulk_update_bids(mask, {'status': CLOSED_STATUS}, args.actor, 'Vendor',
+                               'Closed Stale Draft', comment, dry_run=args.dry_run)
+
+
+def reopen(args):
+    """Reopen approved bids for modifications, as a2_reopen_bid does for one bid"""
+    spec = db.APPROVAL_ACTIONS['a2_reopen']
+
+    def mask(bids_df):
+        return (db.bid_filter_mask(bids_df, status=spec['required_status'], buyer_id=args.buyer)
+                & _date_filter(bids_df, args) & _id_filter(bids_df, args.bid_ids))
+
+    updates = dict(spec['updates'], status=spec['new_status'])
+    return db.bulk_update_bids(mask, updates, args.actor, spec['role'], spec['history_action'],
+                               args.comment, dry_run=args.dry_run)
+
+
+def rebuild_totals(args):
+    """Recompute the materialized BidderTotals sheet from the submitted rates"""
+    if args.dry_run:
+        sheets = db.read_sheets(['BidderItemBids', 'BidItems'])
+        return db.compute_bidder_totals(sheets['BidderItemBids'], sheets['BidItems'])
+    return db.rebuild_bidder_totals()
+
+
+def rebuild_price_index(args):
+    """Recompute the PriceIndex sheet of per-bid rate percentiles from other bids"""
+    if args.dry_run:
+        sheets = db.read_sheets(['BidderItemBids', 'BidItems'])
+        return db.compute_price_index(sheets['BidderItemBids'], sheets['BidItems'])
+    return db.rebuild_price_index()
+
+
+def migrate(args):
+    """Add the materialized sheets missing from a workbook created before them"""
+    return db.ensure_materialized_sheets(dry_run=args.dry_run)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Bulk administration of the bid database')
+    parser.add_argument('--database', default=db.DATABASE_FILE, help='Path to database.xlsx')
+    parser.add_argument('--actor', default='Admin CLI', help='Name recorded in the history entries')
+    parser.add_argument('--dry-run', action='store_true', help='Only report how many bids would change')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_date_range(command):
+        command.add_argument('--from', dest='date_from', help='Earliest created_date (YYYY-MM-DD)')
+        command.add_argument('--to', dest='date_to', help='Latest created_date (YYYY-MM-DD)')
+
+    command = commands.add_parser('reassign-buyer', help="Move a buyer's bids to another buyer")
+    command.add_argument('from_buyer', help='Current buyer ID')
+    command.add_argument('to_buyer', help='New buyer ID')
+    command.add_argument('--status', action='append',
+                         help='Only bids with this status (repeatable; default: all except Approved/Closed)')
+    command.add_argument('--comment', default='', help='Reason added to the history comment')
+    add_date_range(command)
+    command.set_defaults(handler=reassign_buyer)
+
+    command = commands.add_parser('close-drafts', help='Close drafts that were never progressed')
+    cutoff = command.add_mutually_exclusive_group()
+    cutoff.add_argument('--older-than', type=int, default=30, help='Age in days (default: 30)')
+    cutoff.add_argument('--before', help='Close drafts created on or before this date instead')
+    command.add_argument('--status', action='append', default=None,
+                         help="Status treated as a draft (repeatable; default: Draft)")
+    command.add_argument('--comment', default='', help='History comment')
+    command.set_defaults(handler=close_drafts)
+
+    command = commands.add_parser('reopen', help='Reopen approved bids for modifications')
+    command.add_argument('--comment', required=True, help='History comment')
+    command.add_argument('--buyer', help='Only bids assigned to this buyer ID')
+    command.add_argument('--bid-id', dest='bid_ids', action='append', help='Only these bids (repeatable)')
+    add_date_range(command)
+    command.set_defaults(handler=reopen)
+
+    command = commands.add_parser('rebuild-totals', help='Recompute the BidderTotals comparison sheet')
+    command.set_defaults(handler=rebuild_totals)
+
+    command = commands.add_parser('rebuild-price-index', help='Recompute the PriceIndex sheet of rates quoted in other bids')
+    command.set_defaults(handler=rebuild_price_index)
+
+    command = commands.add_parser('migrate', help='Add the materialized sheets an older workbook is missing')
+    command.set_defaults(handler=migrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'close-drafts' and not args.status:
+        args.status = ['Draft']
+    db.DATABASE_FILE = args.database
+
+    if args.command == 'migrate':
+        built = args.handler(args)
+        if not built:
+            print("The workbook is up to date.")
+        else:
+            print(f"{'Dry run: would build' if args.dry_run else 'Built'} {', '.join(built)}.")
+        return 0
+
+    if args.command in ('rebuild-totals', 'rebuild-price-index'):
+        rows = args.handler(args)
+        if rows is None:
+            print("Error: could not save changes; nothing was written.")
+            return 1
+        count = rows if isinstance(rows, int) else len(rows)
+        sheet, unit = ('BidderTotals', 'bidder') if args.command == 'rebuild-totals' else ('PriceIndex', 'item')
+        print(f"{'Dry run: ' if args.dry_run else ''}{sheet} has {count} {unit} row(s).")
+        return 0
+
+    try:
+        affected = args.handler(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if affected is None:
+        print("Error: could not save changes; nothing was written.")
+        return 1
+
+    if affected.empty:
+        print("No bids matched.")
+        return 0
+
+    counts = affected['status'].fillna('(blank)').value_counts()
+    breakdown = ', '.join(f"{status}: {count}" for status, count in counts.items())
+    if args.dry_run:
+        print(f"Dry run: {len(affected)} bid(s) would be updated ({breakdown}).")
+    else:
+        print(f"Updated {len(affected)} bid(s) ({breakdown}) and added {len(affected)} history row(s).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,15 +2,27 @@
 Flask Bid Management System
 A web application for managing bids with approval workflow
 """
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, Response, jsonify, g, send_file
 import db_helper as db
+import bid_analysis
+import bulk_import
+import data_export
+import memory_report
+import metrics
+import money
+import profiler
+import report_export
+from pdf_report import _is_missing_excel_value, normalize_bid_record, render_bid_pdf, sanitize_excel_value
+import slowlog
+import tracing
 from datetime import datetime
-import io
-import math
+from functools import wraps
+import numpy as np
+import os
+import pandas as pd
+import tempfile
 import textwrap
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
+import time
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'
@@ -18,45 +30,34 @@ app.secret_key = 'your-secret-key-change-this-in-production'
 # Role management
 ROLES = ['Vendor', 'Buyer', 'Bidder', 'A1 Approver', 'A2 Approver']
 
+# Comparison PDFs up to this size are kept in memory; larger ones spill to a temp file
+PDF_SPOOL_MAX_SIZE = 2 * 1024 * 1024
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
 
-def _is_missing_excel_value(value):
-    """Detect whether a cell value from Excel should be treated as empty"""
-    if value is None:
-        return True
-    try:
-        if math.isnan(value):
-            return True
-    except (TypeError, ValueError):
-        pass
-    if isinstance(value, str) and value.strip().lower() in {'', 'nan', 'nat', 'none'}:
-        return True
-    return False
-
-
-def sanitize_excel_value(value, default=''):
-    """Return a safe default when Excel data is missing"""
-    return default if _is_missing_excel_value(value) else value
-
-
-def normalize_bid_record(bid_record):
-    """Coerce optional bid fields to predictable defaults"""
-    if not bid_record:
-        return {}
-
-    normalized = bid_record.copy()
-    for key in [
-        'selected_buyer_id',
-        'selected_submission_id',
-        'vendor_justification',
-        'buyer_comment',
-        'submission_date',
-        'a1_comment',
-        'a1_date',
-        'a2_comment',
-        'a2_date'
-    ]:
-        normalized[key] = sanitize_excel_value(normalized.get(key), '')
-    return normalized
+# Upper bound on bids fetched by one batch API call
+API_MAX_BATCH_SIZE = 500
+
+# Longest time budget, in seconds, a single award optimization request may use
+API_MAX_AWARD_SECONDS = 10.0
+
+# Columns never returned by the JSON API
+API_HIDDEN_FIELDS = {'password'}
+
+# The API exposes every bidder's rates and contacts, so only the roles that see
+# them in the views (and may export them) can call it
+API_ROLES = {'Vendor', 'A1 Approver', 'A2 Approver'}
+
+# Amounts are kept exact (see money.py) and rounded only here, for display
+app.add_template_filter(money.format_amount, 'money')
+
+# Slow db_helper calls go to the slow log, and the latency of every call to the
+# /metrics histograms
+slowlog.instrument_functions(db)
+metrics.instrument_functions(db)
+tracing.instrument_functions(db)
+
+# tracemalloc snapshots per request type, when BID_MEMORY_PROFILE=1
+memory_report.start()
 
 
 def _normalize_bool_flag(value):
@@ -124,6 +125,100 @@ def get_selected_submission(bid_record, buyer_bids):
 
     return buyer_bids.iloc[0:0]
 
+
+def iter_file_chunks(fileobj, chunk_size=PDF_STREAM_CHUNK_SIZE):
+    """Yield a file's contents from the start in fixed-size chunks, closing it afterwards"""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+@app.before_request
+def start_request_profile():
+    """Profile this request if a Vendor asked for it (?profile=1) or it falls in the sample"""
+    if request.endpoint in {'metrics_endpoint', 'list_profiles', 'download_profile', 'memory_diagnostics', 'static'}:
+        return
+    requested = request.args.get('profile') == '1' and session.get('role') == 'Vendor'
+    if requested or profiler.should_sample():
+        g.profile = profiler.start()
+
+
+@app.teardown_request
+def save_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.finish(profile, {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'bid_id': (request.view_args or {}).get('bid_id', ''),
+            'role': session.get('role', ''),
+            'error': repr(exc) if exc is not None else ''
+        })
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.slow_operation = slowlog.start('request', request.endpoint or 'unmatched',
+                                     route=request.url_rule.rule if request.url_rule else request.path,
+                                     method=request.method,
+                                     bid_id=(request.view_args or {}).get('bid_id', ''))
+
+
+@app.teardown_request
+def log_slow_request(exc):
+    operation = g.pop('slow_operation', None)
+    if operation is not None:
+        slowlog.finish(operation, status=g.pop('response_status', 500 if exc is not None else None))
+
+
+@app.before_request
+def start_request_span():
+    if tracing.TRACING_ENABLED:
+        g.trace_span = tracing.span(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                                    tracing.SPAN_KIND_SERVER,
+                                    **{'http.request.method': request.method,
+                                       'http.route': request.url_rule.rule if request.url_rule else None,
+                                       'url.path': request.path,
+                                       'flask.endpoint': request.endpoint,
+                                       'bid_id': (request.view_args or {}).get('bid_id')})
+
+
+@app.teardown_request
+def end_request_span(exc):
+    trace_span = g.pop('trace_span', None)
+    if trace_span is not None:
+        trace_span.set_attribute('http.response.status_code', g.get('response_status'))
+        if exc is not None:
+            trace_span.record_error(exc)
+        trace_span.end()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency under the route's endpoint name"""
+    g.response_status = response.status_code
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method)
+        metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    memory_report.record_request(request.endpoint)
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Process metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/')
 def index():
     """Home page - redirect to dashboard based on role"""
@@ -342,6 +437,26 @@ def bidder_submit_bid(bid_id):
             existing_rates[row['item_id']] = row['unit_rate']
     
     if request.method == 'POST':
+        # Rate sheet upload: the whole file is checked against the bid's items at once
+        rates_file = request.files.get('rates_file')
+        if rates_file and rates_file.filename:
+            try:
+                item_rates, errors = bulk_import.validate_rate_sheet(
+                    bulk_import.read_table(rates_file.stream, rates_file.filename), items)
+            except bulk_import.UploadError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('bidder_submit_bid', bid_id=bid_id))
+            if errors:
+                flash(f'Rate sheet rejected ({len(errors)} problem(s)). ' +
+                      ' | '.join(bulk_import.format_errors(errors)), 'danger')
+                return redirect(url_for('bidder_submit_bid', bid_id=bid_id))
+            
+            if not db.submit_bidder_item_bids(bid_id, bidder_id, item_rates):
+                flash('Could not save your rates. Please try again.', 'danger')
+                return redirect(url_for('bidder_submit_bid', bid_id=bid_id))
+            flash(f'Bid submitted successfully from rate sheet ({len(item_rates)} items)!', 'success')
+            return redirect(url_for('bidder_dashboard'))
+        
         item_rates = {}
         for _, item in items.iterrows():
             item_id = item['item_id']
@@ -364,6 +479,27 @@ def bidder_submit_bid(bid_id):
     return render_template('bidder_submit_bid.html', bid=bid, items=items, 
                          role=session.get('role'), existing_rates=existing_rates)
 
+@app.route('/bidder/rate_sheet/<bid_id>')
+def bidder_rate_sheet(bid_id):
+    """Download a CSV rate sheet for a bid, pre-filled with the bidder's current rates"""
+    if session.get('role') != 'Bidder' or 'bidder_id' not in session:
+        flash('Access denied. Bidder login required.', 'danger')
+        return redirect(url_for('index'))
+    
+    items = db.get_items_for_bid(bid_id)
+    if items.empty:
+        flash('No items found for this bid.', 'warning')
+        return redirect(url_for('bidder_dashboard'))
+    
+    existing = db.get_bidder_submission_for_bid(bid_id, session.get('bidder_id'))
+    existing_rates = dict(zip(existing['item_id'], existing['unit_rate']))
+    sheet = bulk_import.rate_sheet_template(items, existing_rates)
+    return Response(
+        sheet.to_csv(index=False),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=rate_sheet_{bid_id}.csv'}
+    )
+
 @app.route('/vendor/dashboard')
 def vendor_dashboard():
     """Admin Dashboard"""
@@ -421,18 +557,39 @@ def create_bid():
             flash('Selected buyer could not be found. Please choose a valid buyer.', 'danger')
             return render_template('create_bid.html', role=session.get('role'), buyers=buyers)
 
-        bid_id = db.create_bid(contract_name, contract_description, contract_value, vendor_name, assigned_buyer_id)
-        
-        # Add bid items if provided
+        # Items typed into the form
         item_names = request.form.getlist('item_name[]')
         item_descriptions = request.form.getlist('item_description[]')
         quantities = request.form.getlist('quantity[]')
         units = request.form.getlist('unit[]')
         
-        for i in range(len(item_names)):
-            if item_names[i]:  # Only add if item name is provided
-                db.add_bid_item(bid_id, item_names[i], item_descriptions[i], 
-                              float(quantities[i]) if quantities[i] else 0, units[i])
+        form_items = pd.DataFrame([
+            {
+                'item_name': item_names[i],
+                'item_description': item_descriptions[i],
+                'quantity': float(quantities[i]) if quantities[i] else 0,
+                'unit': units[i]
+            }
+            for i in range(len(item_names))
+            if item_names[i]  # Only add if item name is provided
+        ], columns=bulk_import.ITEM_COLUMNS)
+
+        # Items from an uploaded CSV/XLSX, validated before anything is written
+        items_file = request.files.get('items_file')
+        uploaded_items = form_items.iloc[0:0]
+        if items_file and items_file.filename:
+            try:
+                uploaded_items, errors = bulk_import.validate_items(
+                    bulk_import.read_table(items_file.stream, items_file.filename))
+            except bulk_import.UploadError as e:
+                flash(str(e), 'danger')
+                return render_template('create_bid.html', role=session.get('role'), buyers=buyers)
+            if errors:
+                flash('Item file rejected. ' + ' | '.join(bulk_import.format_errors(errors)), 'danger')
+                return render_template('create_bid.html', role=session.get('role'), buyers=buyers)
+
+        bid_id = db.create_bid(contract_name, contract_description, contract_value, vendor_name, assigned_buyer_id)
+        db.add_bid_items_bulk(bid_id, pd.concat([form_items, uploaded_items], ignore_index=True))
 
         selected_buyer = next((v for v in buyers if v.get('buyer_id') == assigned_buyer_id), None)
         buyer_label = selected_buyer['buyer_name'] if selected_buyer else assigned_buyer_id
@@ -442,6 +599,46 @@ def create_bid():
 
     return render_template('create_bid.html', role=session.get('role'), buyers=buyers)
 
+@app.route('/vendor/import_bids', methods=['GET', 'POST'])
+def import_bids():
+    """Bulk import bids (and optionally items) from a spreadsheet"""
+    if session.get('role') != 'Vendor':
+        flash('Access denied. Admin role required.', 'danger')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        bids_file = request.files.get('bids_file')
+        items_file = request.files.get('items_file')
+        if not bids_file or not bids_file.filename:
+            flash('Please choose a bids file to import.', 'danger')
+            return render_template('import_bids.html', role=session.get('role'))
+        
+        try:
+            sheets = bulk_import.read_tables(bids_file.stream, bids_file.filename)
+            bids_df = sheets.get('bids', next(iter(sheets.values())))
+            items_df = sheets.get('items')
+            if items_file and items_file.filename:
+                items_df = bulk_import.read_table(items_file.stream, items_file.filename)
+            bids, items, errors = bulk_import.load_bid_import(bids_df, items_df)
+        except bulk_import.UploadError as e:
+            flash(str(e), 'danger')
+            return render_template('import_bids.html', role=session.get('role'))
+        
+        if errors:
+            return render_template('import_bids.html', role=session.get('role'),
+                                   errors=bulk_import.format_errors(errors), error_count=len(errors))
+        
+        imported = db.import_bids_bulk(bids, items, session.get('user_name', 'Vendor'))
+        if not imported:
+            flash('Import failed. Nothing was saved.', 'danger')
+            return render_template('import_bids.html', role=session.get('role'))
+        
+        item_count = 0 if items is None else len(items)
+        flash(f'Imported {len(imported)} bid(s) with {item_count} item(s).', 'success')
+        return redirect(url_for('vendor_dashboard'))
+    
+    return render_template('import_bids.html', role=session.get('role'))
+
 @app.route('/vendor/view_bid/<bid_id>')
 def vendor_view_bid(bid_id):
     """View bid details and buyer submissions"""
@@ -466,6 +663,8 @@ def vendor_view_bid(bid_id):
     # Get all bidder submissions
     bidder_submissions = db.get_all_bidder_bids_with_totals(bid_id)
     num_bidders = len(bidder_submissions)
+    award = bid_analysis.get_item_award(bid_id)
+    price_flags = bid_analysis.get_price_flags(bid_id)
 
     return render_template(
         'vendor_view_bid.html',
@@ -475,6 +674,8 @@ def vendor_view_bid(bid_id):
         items=items,
         bidder_submissions=bidder_submissions,
         num_bidders=num_bidders,
+        award=award,
+        price_flags=price_flags,
         role=session.get('role')
     )
 
@@ -564,10 +765,12 @@ def buyer_view_bid(bid_id):
     # Get all bidder submissions
     bidder_submissions = db.get_all_bidder_bids_with_totals(bid_id)
     num_bidders = len(bidder_submissions)
+    award = bid_analysis.get_item_award(bid_id)
     
     return render_template('buyer_view_bid.html', bid=bid, items=items, 
                           buyer=buyer, history=history, role=session.get('role'), can_submit=can_submit,
-                          bidder_submissions=bidder_submissions, num_bidders=num_bidders)
+                          bidder_submissions=bidder_submissions, num_bidders=num_bidders,
+                          award=award)
 
 @app.route('/buyer/submit_bid/<bid_id>', methods=['POST'])
 def submit_bid(bid_id):
@@ -627,10 +830,14 @@ def a1_view_bid(bid_id):
     # Get all bidder submissions
     bidder_submissions = db.get_all_bidder_bids_with_totals(bid_id)
     num_bidders = len(bidder_submissions)
+    award = bid_analysis.get_item_award(bid_id)
+    price_flags = bid_analysis.get_price_flags(bid_id)
+    anomalies = bid_analysis.get_bid_anomalies(bid_id)
     
     return render_template('a1_view_bid.html', bid=bid, assigned_buyer=assigned_buyer,
                           history=history, items=items, role=session.get('role'),
-                          bidder_submissions=bidder_submissions, num_bidders=num_bidders)
+                          bidder_submissions=bidder_submissions, num_bidders=num_bidders,
+                          award=award, price_flags=price_flags, anomalies=anomalies)
 
 @app.route('/a1/approve/<bid_id>', methods=['POST'])
 def a1_approve_bid(bid_id):
@@ -680,6 +887,42 @@ def a1_reject_bid(bid_id):
     
     return redirect(url_for('a1_dashboard'))
 
+def _flash_bulk_results(results, success_label):
+    """Summarise per-bid results of a bulk approval action"""
+    succeeded = [bid_id for bid_id, (ok, _) in results.items() if ok]
+    failed = [(bid_id, message) for bid_id, (ok, message) in results.items() if not ok]
+    if succeeded:
+        flash(f"{len(succeeded)} bid(s) {success_label}: {', '.join(succeeded)}", 'success')
+    if failed:
+        details = '; '.join(f"{bid_id}: {message}" for bid_id, message in failed)
+        flash(f"{len(failed)} bid(s) skipped - {details}", 'warning')
+
+@app.route('/a1/bulk_action', methods=['POST'])
+def a1_bulk_action():
+    """A1 approve or reject several bids at once"""
+    if session.get('role') != 'A1 Approver':
+        flash('Access denied. A1 Approver role required.', 'danger')
+        return redirect(url_for('index'))
+
+    bid_ids = request.form.getlist('bid_ids')
+    action = request.form.get('action')
+    comment = request.form.get('comment', '').strip()
+    if action not in {'approve', 'reject'}:
+        flash('Unknown bulk action.', 'danger')
+        return redirect(url_for('a1_dashboard'))
+    if not bid_ids:
+        flash('Select at least one bid.', 'warning')
+        return redirect(url_for('a1_dashboard'))
+    if not comment:
+        flash('Please provide a comment for the selected bids.', 'danger')
+        return redirect(url_for('a1_dashboard'))
+
+    approver_name = session.get('user_name', 'A1 Approver')
+    results = db.bulk_apply_approval(bid_ids, f'a1_{action}', comment, approver_name)
+    _flash_bulk_results(results, 'approved and sent to A2' if action == 'approve' else 'rejected')
+
+    return redirect(url_for('a1_dashboard'))
+
 @app.route('/a2/dashboard')
 def a2_dashboard():
     """A2 Approver Dashboard"""
@@ -713,10 +956,14 @@ def a2_view_bid(bid_id):
     # Get all bidder submissions
     bidder_submissions = db.get_all_bidder_bids_with_totals(bid_id)
     num_bidders = len(bidder_submissions)
+    award = bid_analysis.get_item_award(bid_id)
+    price_flags = bid_analysis.get_price_flags(bid_id)
+    anomalies = bid_analysis.get_bid_anomalies(bid_id)
     
     return render_template('a2_view_bid.html', bid=bid, assigned_buyer=assigned_buyer,
                           history=history, items=items, role=session.get('role'),
-                          bidder_submissions=bidder_submissions, num_bidders=num_bidders)
+                          bidder_submissions=bidder_submissions, num_bidders=num_bidders,
+                          award=award, price_flags=price_flags, anomalies=anomalies)
 
 @app.route('/a2/approve/<bid_id>', methods=['POST'])
 def a2_approve_bid(bid_id):
@@ -766,6 +1013,32 @@ def a2_reject_bid(bid_id):
     
     return redirect(url_for('a2_dashboard'))
 
+@app.route('/a2/bulk_action', methods=['POST'])
+def a2_bulk_action():
+    """A2 approve or reject several bids at once"""
+    if session.get('role') != 'A2 Approver':
+        flash('Access denied. A2 Approver role required.', 'danger')
+        return redirect(url_for('index'))
+
+    bid_ids = request.form.getlist('bid_ids')
+    action = request.form.get('action')
+    comment = request.form.get('comment', '').strip()
+    if action not in {'approve', 'reject'}:
+        flash('Unknown bulk action.', 'danger')
+        return redirect(url_for('a2_dashboard'))
+    if not bid_ids:
+        flash('Select at least one bid.', 'warning')
+        return redirect(url_for('a2_dashboard'))
+    if not comment:
+        flash('Please provide a comment for the selected bids.', 'danger')
+        return redirect(url_for('a2_dashboard'))
+
+    approver_name = session.get('user_name', 'A2 Approver')
+    results = db.bulk_apply_approval(bid_ids, f'a2_{action}', comment, approver_name)
+    _flash_bulk_results(results, 'given final approval' if action == 'approve' else 'sent back to A1')
+
+    return redirect(url_for('a2_dashboard'))
+
 @app.route('/a2/reopen/<bid_id>', methods=['POST'])
 def a2_reopen_bid(bid_id):
     """A2 reopen approved bid for modifications"""
@@ -793,423 +1066,312 @@ def a2_reopen_bid(bid_id):
 @app.route('/download_pdf/<bid_id>')
 def download_pdf(bid_id):
     """Download bid comparison PDF - Accessible by all roles"""
-    bid = db.get_bid_by_id(bid_id)
-    if not bid:
+    # Large reports spill to disk and are streamed back in chunks, so a worker never
+    # holds a finished multi-megabyte PDF in memory while a slow client downloads it
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    if not render_bid_pdf(bid_id, spool):
+        spool.close()
         flash('Bid not found.', 'danger')
         return redirect(url_for('index'))
-    
-    bid = normalize_bid_record(bid)
-    history = db.get_history_for_bid(bid_id)
-    items = db.get_items_for_bid(bid_id)
-    
-    # Get bidder submissions for each item
-    bidder_submissions = {}
-    all_bidders = set()
-    if not items.empty:
-        for _, item in items.iterrows():
-            item_bids = db.get_bidder_bids_for_item(bid_id, item['item_id'])
-            bidder_submissions[item['item_id']] = item_bids
-            if not item_bids.empty:
-                for _, bid_sub in item_bids.iterrows():
-                    all_bidders.add(bid_sub['bidder_id'])
-    
-    # Get bidder names
-    bidder_names = {}
-    for bidder_id in all_bidders:
-        bidder = db.get_bidder_by_id(bidder_id)
-        if bidder:
-            bidder_names[bidder_id] = bidder['bidder_name']
-        else:
-            bidder_names[bidder_id] = bidder_id
-    
-    # Create Professional PDF
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    def draw_header(canvas_obj, y_start):
-        """Draw professional header"""
-        canvas_obj.setFillColorRGB(0.2, 0.3, 0.5)
-        canvas_obj.rect(0, y_start - 0.8*inch, width, 0.8*inch, fill=1)
-        canvas_obj.setFillColorRGB(1, 1, 1)
-        canvas_obj.setFont("Helvetica-Bold", 20)
-        canvas_obj.drawCentredString(width/2, y_start - 0.5*inch, "BID COMPARISON REPORT")
-        canvas_obj.setFillColorRGB(0, 0, 0)
-        return y_start - 1*inch
-    
-    def draw_section(canvas_obj, y_pos, title):
-        """Draw section header"""
-        canvas_obj.setFillColorRGB(0.2, 0.3, 0.5)
-        canvas_obj.setFont("Helvetica-Bold", 14)
-        canvas_obj.drawString(0.75*inch, y_pos, title)
-        canvas_obj.setStrokeColorRGB(0.2, 0.3, 0.5)
-        canvas_obj.setLineWidth(2)
-        canvas_obj.line(0.75*inch, y_pos - 5, width - 0.75*inch, y_pos - 5)
-        canvas_obj.setFillColorRGB(0, 0, 0)
-        canvas_obj.setStrokeColorRGB(0, 0, 0)
-        canvas_obj.setLineWidth(1)
-        return y_pos - 0.3*inch
-    
-    def draw_field(canvas_obj, y_pos, label, value, bold_label=True):
-        """Draw a label-value pair"""
-        label_font = "Helvetica-Bold" if bold_label else "Helvetica"
-        value_font = "Helvetica"
-        font_size = 10
-
-        label_text = f"{label}:" if label else ""
-        canvas_obj.setFont(label_font, font_size)
-        if label_text:
-            canvas_obj.drawString(1 * inch, y_pos, label_text)
-
-        value_str = str(value) if value not in (None, "") else "N/A"
-        label_width = canvas_obj.stringWidth(label_text, label_font, font_size) if label_text else 0
-        value_x = 1 * inch + label_width + (0.12 * inch if label_text else 0)
-        
-        canvas_obj.setFont(value_font, font_size)
-        canvas_obj.drawString(value_x, y_pos, value_str)
-        return y_pos - 0.25 * inch
-    
-    # PAGE 1
-    y = draw_header(c, height)
-    y -= 0.3*inch
-    
-    # Contract Information
-    y = draw_section(c, y, "1. CONTRACT INFORMATION")
-    y = draw_field(c, y, "Bid ID", bid['bid_id'])
-    y = draw_field(c, y, "Contract Name", bid['contract_name'])
-    y = draw_field(c, y, "Description", bid['contract_description'])
-    y = draw_field(c, y, "Contract Value", f"${bid['contract_value']:,.2f}")
-    y = draw_field(c, y, "Created By", bid['vendor_name'])
-    y = draw_field(c, y, "Created Date", bid['created_date'])
-    y = draw_field(c, y, "Status", bid['status'])
-    
-    # Get assigned buyer info
-    selected_buyer_id = str(sanitize_excel_value(bid.get('selected_buyer_id'), '')).strip()
-    assigned_buyer = db.get_buyer_by_id(selected_buyer_id) if selected_buyer_id else None
-    if assigned_buyer:
-        assigned_buyer_label = f"{assigned_buyer.get('buyer_name', 'N/A')} ({selected_buyer_id})"
+    size = spool.tell()
+    
+    return Response(
+        iter_file_chunks(spool),
+        mimetype='application/pdf',
+        headers={
+            'Content-Disposition': f'attachment; filename=bid_{bid_id}_comparison.pdf',
+            'Content-Length': str(size)
+        },
+        direct_passthrough=True
+    )
+
+@app.route('/reports/bulk_export')
+def bulk_export_reports():
+    """Download comparison PDFs for all bids matching a filter as one ZIP - Vendor and approver roles"""
+    if session.get('role') not in {'Vendor', 'A1 Approver', 'A2 Approver'}:
+        flash('Access denied. Vendor or approver role required.', 'danger')
+        return redirect(url_for('index'))
+
+    status = request.args.get('status', '').strip() or None
+    date_from = request.args.get('date_from', '').strip() or None
+    date_to = request.args.get('date_to', '').strip() or None
+
+    try:
+        bid_ids = report_export.select_report_bids(status, date_from, date_to)
+    except ValueError:
+        flash('Invalid date filter. Use the YYYY-MM-DD format.', 'danger')
+        return redirect(url_for('index'))
+
+    if not bid_ids:
+        flash('No bids matched the selected filters.', 'warning')
+        return redirect(url_for('index'))
+
+    filename = f"bid_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        report_export.iter_reports_zip(bid_ids),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/export/<sheet_name>')
+def export_sheet(sheet_name):
+    """Stream a filtered sheet as CSV or XLSX - Vendor and approver roles"""
+    if session.get('role') not in {'Vendor', 'A1 Approver', 'A2 Approver'}:
+        flash('Access denied. Vendor or approver role required.', 'danger')
+        return redirect(url_for('index'))
+
+    export_format = request.args.get('format', 'csv').strip().lower()
+    if sheet_name not in data_export.EXPORT_SHEETS or export_format not in data_export.EXPORT_FORMATS:
+        flash('Unknown export requested.', 'danger')
+        return redirect(url_for('index'))
+
+    bid_ids = [bid_id for bid_id in request.args.getlist('bid_id') if bid_id.strip()]
+    try:
+        export_filter = data_export.ExportFilter(
+            bid_ids=bid_ids or None,
+            status=request.args.get('status', '').strip() or None,
+            date_from=request.args.get('date_from', '').strip() or None,
+            date_to=request.args.get('date_to', '').strip() or None
+        )
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('index'))
+
+    filename = f"{sheet_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if export_format == 'xlsx':
+        body = data_export.iter_xlsx([sheet_name], export_filter)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     else:
-        assigned_buyer_label = "Not Assigned"
-    y = draw_field(c, y, "Assigned Buyer", assigned_buyer_label)
-    y -= 0.3*inch
-    
-    # Bid Items and Comparison in Tabular Form
-    if not items.empty and all_bidders:
-        if y < 5*inch:
-            c.showPage()
-            y = draw_header(c, height) - 0.3*inch
-            
-        y = draw_section(c, y, "2. BID ITEMS & BIDDER COMPARISON")
-        y -= 0.2*inch
-        
-        # Calculate column widths based on number of bidders
-        bidders_list = sorted(list(all_bidders))
-        num_bidders = len(bidders_list)
-        
-        # Improved table layout
-        item_col_width = 2.5*inch
-        qty_col_width = 0.4*inch
-        unit_col_width = 0.6*inch
-        available_width = width - 2*0.75*inch - item_col_width - qty_col_width - unit_col_width
-        bidder_col_width = available_width / num_bidders if num_bidders > 0 else 1.5*inch
-        
-        x_start = 0.75*inch
-        table_width = width - 1.5*inch
-        
-        # Draw table header with better styling
-        header_height = 0.5*inch
-        c.setFillColorRGB(0.2, 0.3, 0.5)  # Dark blue header
-        c.rect(x_start, y - header_height, table_width, header_height, fill=1, stroke=1)
-        c.setFillColorRGB(1, 1, 1)  # White text
-        c.setFont("Helvetica-Bold", 9)
-        
-        x = x_start + 0.05*inch
-        # Multi-line header for Item column
-        c.drawString(x, y - 0.2*inch, "Item Name")
-        c.setFont("Helvetica-Bold", 8)
-        c.drawString(x, y - 0.35*inch, "Description")
-        
-        x += item_col_width
-        c.setFont("Helvetica-Bold", 9)
-        c.drawString(x, y - 0.27*inch, "Qty")
-        
-        x += qty_col_width
-        c.drawString(x, y - 0.27*inch, "Unit")
-        
-        x += unit_col_width
-        
-        # Bidder columns with better formatting
-        c.setFont("Helvetica-Bold", 8)
-        for bidder_id in bidders_list:
-            bidder_name = bidder_names.get(bidder_id, bidder_id)
-            # Smart truncation
-            if len(bidder_name) > 18:
-                bidder_name = bidder_name[:15] + "..."
-            c.drawString(x + 0.05*inch, y - 0.18*inch, bidder_name)
-            c.setFont("Helvetica", 7)
-            c.drawString(x + 0.05*inch, y - 0.35*inch, "Rate | Total")
-            c.setFont("Helvetica-Bold", 8)
-            x += bidder_col_width
-        
-        y -= (header_height + 0.05*inch)
-        
-        # Draw items rows with improved formatting
-        for idx, item in items.iterrows():
-            if y < 1.5*inch:
-                c.showPage()
-                y = draw_header(c, height) - 0.3*inch
-                # Redraw header on new page
-                c.setFillColorRGB(0.2, 0.3, 0.5)
-                c.rect(x_start, y - header_height, table_width, header_height, fill=1, stroke=1)
-                c.setFillColorRGB(1, 1, 1)
-                c.setFont("Helvetica-Bold", 9)
-                x = x_start + 0.05*inch
-                c.drawString(x, y - 0.2*inch, "Item Name")
-                c.setFont("Helvetica-Bold", 8)
-                c.drawString(x, y - 0.35*inch, "Description")
-                x += item_col_width
-                c.setFont("Helvetica-Bold", 9)
-                c.drawString(x, y - 0.27*inch, "Qty")
-                x += qty_col_width
-                c.drawString(x, y - 0.27*inch, "Unit")
-                x += unit_col_width
-                c.setFont("Helvetica-Bold", 8)
-                for bidder_id in bidders_list:
-                    bidder_name = bidder_names.get(bidder_id, bidder_id)
-                    if len(bidder_name) > 18:
-                        bidder_name = bidder_name[:15] + "..."
-                    c.drawString(x + 0.05*inch, y - 0.18*inch, bidder_name)
-                    c.setFont("Helvetica", 7)
-                    c.drawString(x + 0.05*inch, y - 0.35*inch, "Rate | Total")
-                    c.setFont("Helvetica-Bold", 8)
-                    x += bidder_col_width
-                y -= (header_height + 0.05*inch)
-            
-            row_height = 0.45*inch
-            
-            # Draw row background with alternating colors
-            if idx % 2 == 0:
-                c.setFillColorRGB(0.97, 0.97, 0.97)
-            else:
-                c.setFillColorRGB(1, 1, 1)
-            c.rect(x_start, y - row_height, table_width, row_height, fill=1, stroke=0)
-            
-            # Draw row border
-            c.setFillColorRGB(0, 0, 0)
-            c.setStrokeColorRGB(0.7, 0.7, 0.7)
-            c.setLineWidth(0.5)
-            c.rect(x_start, y - row_height, table_width, row_height, fill=0, stroke=1)
-            c.setStrokeColorRGB(0, 0, 0)
-            c.setLineWidth(1)
-            
-            x = x_start + 0.05*inch
-            
-            # Item name and description with better formatting
-            c.setFont("Helvetica-Bold", 9)
-            item_name = str(item['item_name'])
-            if len(item_name) > 35:
-                item_name = item_name[:32] + "..."
-            c.drawString(x, y - 0.17*inch, item_name)
-            
-            c.setFont("Helvetica", 7)
-            item_desc = str(item['item_description'])
-            if len(item_desc) > 45:
-                item_desc = item_desc[:42] + "..."
-            c.drawString(x, y - 0.32*inch, item_desc)
-            
-            x += item_col_width
-            
-            # Quantity
-            c.setFont("Helvetica", 9)
-            c.drawString(x, y - 0.25*inch, f"{item['quantity']}")
-            x += qty_col_width
-            
-            # Unit
-            unit_text = str(item['unit'])
-            if len(unit_text) > 6:
-                unit_text = unit_text[:5] + "."
-            c.drawString(x, y - 0.25*inch, unit_text)
-            x += unit_col_width
-            
-            # Bidder rates with better formatting
-            item_bids = bidder_submissions.get(item['item_id'])
-            for bidder_id in bidders_list:
-                rate_text = "N/A"
-                total_text = ""
-                
-                if item_bids is not None and not item_bids.empty:
-                    bidder_bid = item_bids[item_bids['bidder_id'] == bidder_id]
-                    if not bidder_bid.empty:
-                        unit_rate = float(bidder_bid.iloc[0]['unit_rate'])
-                        total = unit_rate * float(item['quantity'])
-                        rate_text = f"${unit_rate:,.2f}"
-                        total_text = f"${total:,.2f}"
-                
-                c.setFont("Helvetica-Bold", 8)
-                c.drawString(x + 0.05*inch, y - 0.17*inch, rate_text)
-                if total_text:
-                    c.setFont("Helvetica", 7)
-                    c.setFillColorRGB(0.3, 0.3, 0.3)
-                    c.drawString(x + 0.05*inch, y - 0.32*inch, total_text)
-                    c.setFillColorRGB(0, 0, 0)
-                
-                x += bidder_col_width
-            
-            y -= row_height
-        
-        # Add total row
-        c.setFillColorRGB(0.9, 0.9, 0.9)
-        total_row_height = 0.35*inch
-        c.rect(x_start, y - total_row_height, table_width, total_row_height, fill=1, stroke=1)
-        c.setFillColorRGB(0, 0, 0)
-        
-        x = x_start + 0.05*inch
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(x, y - 0.22*inch, "TOTAL BID AMOUNTS:")
-        
-        x = x_start + item_col_width + qty_col_width + unit_col_width
-        
-        # Calculate and show totals for each bidder
-        for bidder_id in bidders_list:
-            total_amount = 0
-            if not items.empty:
-                for _, item in items.iterrows():
-                    item_bids = bidder_submissions.get(item['item_id'])
-                    if item_bids is not None and not item_bids.empty:
-                        bidder_bid = item_bids[item_bids['bidder_id'] == bidder_id]
-                        if not bidder_bid.empty:
-                            unit_rate = float(bidder_bid.iloc[0]['unit_rate'])
-                            total_amount += unit_rate * float(item['quantity'])
-            
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(x + 0.05*inch, y - 0.22*inch, f"${total_amount:,.2f}")
-            x += bidder_col_width
-        
-        y -= (total_row_height + 0.3*inch)
-    
-    # Check if we need a new page
-    if y < 4*inch:
-        c.showPage()
-        y = draw_header(c, height) - 0.3*inch
-    
-    # Approval Workflow
-    y = draw_section(c, y, "3. APPROVAL WORKFLOW")
-    y -= 0.1*inch
-    
-    # Buyer Comments
-    buyer_comment = bid.get('buyer_comment', '').strip()
-    if buyer_comment:
-        c.setFont("Helvetica-Bold", 11)
-        c.drawString(1*inch, y, "Buyer Comments")
-        y -= 0.2*inch
-        y = draw_field(c, y, "Buyer", assigned_buyer_label if assigned_buyer else "N/A")
-        y = draw_field(c, y, "Comment", buyer_comment)
-        y = draw_field(c, y, "Submitted On", bid.get('submission_date') or 'Not submitted')
-        y -= 0.2*inch
-    
-    # A1 Approval
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(1*inch, y, "Level 1 Approval (A1)")
-    y -= 0.2*inch
-    y = draw_field(c, y, "Status", bid['a1_status'])
-    y = draw_field(c, y, "Comment", bid['a1_comment'])
-    y = draw_field(c, y, "Date", bid['a1_date'])
-    y -= 0.2*inch
-    
-    # A2 Approval
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(1*inch, y, "Level 2 Approval (A2) - FINAL")
-    y -= 0.2*inch
-    y = draw_field(c, y, "Status", bid['a2_status'])
-    y = draw_field(c, y, "Comment", bid['a2_comment'])
-    y = draw_field(c, y, "Date", bid['a2_date'])
-    y -= 0.3*inch
-    
-    # Final Status Box
-    final_status = bid.get('status', 'Unknown')
-    
-    # Determine status color
-    status_color = (0.9, 0.9, 0.9)  # Default gray
-    if final_status == 'Approved':
-        status_color = (0.2, 0.7, 0.3)  # Green
-    elif final_status == 'Rejected':
-        status_color = (0.8, 0.2, 0.2)  # Red
-    elif final_status in ['Pending', 'Submitted', 'Under Review']:
-        status_color = (0.95, 0.7, 0.2)  # Orange
-    
-    # Draw final status box with border
-    box_width = 3*inch
-    box_height = 0.5*inch
-    x_center = (width - box_width) / 2
-    
-    # Draw outer border (darker)
-    c.setStrokeColorRGB(0, 0, 0)
-    c.setLineWidth(2)
-    c.setFillColorRGB(*status_color)
-    c.rect(x_center, y - box_height, box_width, box_height, fill=1, stroke=1)
-    
-    # Draw text
-    c.setFillColorRGB(1, 1, 1)  # White text
-    c.setFont("Helvetica-Bold", 14)
-    text_width = c.stringWidth(f"FINAL STATUS: {final_status.upper()}", "Helvetica-Bold", 14)
-    c.drawString(x_center + (box_width - text_width) / 2, y - 0.32*inch, f"FINAL STATUS: {final_status.upper()}")
-    
-    # Reset colors
-    c.setFillColorRGB(0, 0, 0)
-    c.setStrokeColorRGB(0, 0, 0)
-    c.setLineWidth(1)
-    
-    y -= (box_height + 0.3*inch)
-    
-    # Check if we need a new page for audit trail
-    if y < 3*inch:
-        c.showPage()
-        y = draw_header(c, height) - 0.3*inch
-    
-    # Audit Trail
-    y = draw_section(c, y, "4. AUDIT TRAIL")
-    y -= 0.1*inch
-    
+        body = data_export.iter_csv(sheet_name, export_filter)
+        mimetype = 'text/csv'
+
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """Recent request profiles - Vendor only"""
+    if session.get('role') != 'Vendor':
+        flash('Access denied. Admin role required.', 'danger')
+        return redirect(url_for('index'))
+
+    return render_template('admin_profiles.html', profiles=profiler.list_profiles(),
+                           profile_dir=profiler.PROFILE_DIR, sample_rate=profiler.PROFILE_SAMPLE_RATE,
+                           role=session.get('role'))
+
+@app.route('/admin/profiles/<name>/<kind>')
+def download_profile(name, kind):
+    """Download one saved profile as pstats (prof), collapsed stacks or JSON summary"""
+    if session.get('role') != 'Vendor':
+        flash('Access denied. Admin role required.', 'danger')
+        return redirect(url_for('index'))
+
+    path = profiler.profile_path(name, f'.{kind}')
+    if path is None:
+        flash('Profile not found.', 'danger')
+        return redirect(url_for('list_profiles'))
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f'{name}.{kind}')
+
+@app.route('/admin/memory')
+def memory_diagnostics():
+    """Cache sizes and tracemalloc allocation sites per request type, as JSON - Vendor only"""
+    if session.get('role') != 'Vendor':
+        flash('Access denied. Admin role required.', 'danger')
+        return redirect(url_for('index'))
+
+    try:
+        limit = int(request.args.get('limit', memory_report.TOP_SITES))
+    except ValueError:
+        limit = memory_report.TOP_SITES
+    if request.args.get('reset') == '1':
+        memory_report.reset()
+    return jsonify(memory_report.report(max(limit, 1)))
+
+# JSON API - read-only access to bids for integrations
+
+def _json_value(value):
+    """Convert pandas/numpy cell values to plain JSON types"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if _is_missing_excel_value(value):
+        return None
+    if hasattr(value, 'isoformat'):
+        return str(value)
+    return value
+
+
+def _json_record(record):
+    return {key: _json_value(value) for key, value in record.items() if key not in API_HIDDEN_FIELDS}
+
+
+def _json_records(df):
+    return [_json_record(record) for record in df.to_dict('records')] if not df.empty else []
+
+
+def bid_detail_payload(bundle):
+    """Build the API representation of a bid bundle with ranked bidder totals"""
+    rates = bundle['rates']
+    line_totals = bundle['line_totals']
+
+    ranking = []
+    for row in bundle['rankings'].to_dict('records'):
+        bidder_id = row['bidder_id']
+        bidder = bundle['bidders'].get(bidder_id, {})
+        quoted_items = rates.columns[rates.loc[bidder_id].notna().to_numpy()] if bidder_id in rates.index else []
+        ranking.append({
+            'rank': int(row['rank']),
+            'bidder_id': _json_value(bidder_id),
+            'bidder_name': _json_value(bidder.get('bidder_name', bidder_id)),
+            'total_bid_amount': float(row['total_amount']),
+            'items_quoted': int(row['item_count']),
+            'rates': [
+                {
+                    'item_id': _json_value(item_id),
+                    'unit_rate': float(rates.at[bidder_id, item_id]),
+                    'total': float(line_totals.at[bidder_id, item_id])
+                }
+                for item_id in quoted_items
+            ]
+        })
+
+    assigned_buyer = bundle['assigned_buyer']
+    return {
+        'bid': _json_record(normalize_bid_record(bundle['bid'])),
+        'assigned_buyer': _json_record(assigned_buyer) if assigned_buyer else None,
+        'items': _json_records(bundle['items']),
+        'bidders': ranking,
+        'history': _json_records(bundle['history'])
+    }
+
+
+def _requested_bid_ids():
+    """Collect bid IDs from ?ids=a,b / repeated ?bid_id= or a JSON body {"bid_ids": [...]}"""
+    bid_ids = []
+    for value in request.args.getlist('ids') + request.args.getlist('bid_id'):
+        bid_ids.extend(part.strip() for part in value.split(','))
+    if request.is_json:
+        body = request.get_json(silent=True) or {}
+        bid_ids.extend(str(bid_id).strip() for bid_id in body.get('bid_ids', []))
+    return list(dict.fromkeys(bid_id for bid_id in bid_ids if bid_id))
+
+
+def api_role_required(view):
+    """JSON 401 without a session role and 403 for roles outside API_ROLES"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        role = session.get('role')
+        if not role:
+            return jsonify({'error': 'Authentication required.'}), 401
+        if role not in API_ROLES:
+            return jsonify({'error': 'Access denied. Vendor or approver role required.'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/bids')
+@api_role_required
+def api_list_bids():
+    """List bids, optionally filtered by status, buyer_id and created date range"""
+    try:
+        bids = db.filter_bids(
+            status=request.args.get('status', '').strip() or None,
+            buyer_id=request.args.get('buyer_id', '').strip() or None,
+            date_from=request.args.get('date_from', '').strip() or None,
+            date_to=request.args.get('date_to', '').strip() or None
+        )
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = request.args.get('limit')
+        limit = max(int(limit), 0) if limit else None
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value.'}), 400
+
+    total = len(bids)
+    page = bids.iloc[offset:offset + limit] if limit is not None else bids.iloc[offset:]
+    return jsonify({'count': total, 'offset': offset, 'bids': _json_records(page)})
+
+
+@app.route('/api/bids/batch', methods=['GET', 'POST'])
+@api_role_required
+def api_batch_bids():
+    """Fetch full details for many bids in one call; unknown IDs map to null"""
+    bid_ids = _requested_bid_ids()
+    if not bid_ids:
+        return jsonify({'error': 'Provide bid IDs via ?ids=BID001,BID002 or {"bid_ids": [...]}.'}), 400
+    if len(bid_ids) > API_MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {API_MAX_BATCH_SIZE} bids per request.'}), 400
+
+    bundles = db.get_bid_bundles(bid_ids)
+    return jsonify({
+        'bids': {
+            bid_id: bid_detail_payload(bundles[bid_id]) if bid_id in bundles else None
+            for bid_id in bid_ids
+        }
+    })
+
+
+@app.route('/api/bids/<bid_id>')
+@api_role_required
+def api_bid_detail(bid_id):
+    """Bid details with items, ranked bidder totals and history"""
+    bundle = db.get_bid_bundle(bid_id)
+    if not bundle:
+        return jsonify({'error': 'Bid not found.'}), 404
+    return jsonify(bid_detail_payload(bundle))
+
+
+@app.route('/api/bids/<bid_id>/history')
+@api_role_required
+def api_bid_history(bid_id):
+    """History for a single bid, newest first"""
+    if not db.select_rows('Bids', 'bid_id', [bid_id]).shape[0]:
+        return jsonify({'error': 'Bid not found.'}), 404
+    return jsonify({'bid_id': bid_id, 'history': _json_records(db.get_history_for_bid(bid_id))})
+
+
+@app.route('/api/bids/<bid_id>/award')
+@api_role_required
+def api_bid_award(bid_id):
+    """Cheapest item award under max_suppliers / min_lots rules, within time_budget seconds"""
+    if not db.select_rows('Bids', 'bid_id', [bid_id]).shape[0]:
+        return jsonify({'error': 'Bid not found.'}), 404
+    try:
+        max_suppliers = request.args.get('max_suppliers', '').strip()
+        max_suppliers = int(max_suppliers) if max_suppliers else None
+        min_lots = request.args.get('min_lots', '').strip()
+        min_lots = int(min_lots) if min_lots else None
+        time_budget = float(request.args.get('time_budget', bid_analysis.DEFAULT_TIME_BUDGET))
+    except ValueError:
+        return jsonify({'error': 'Invalid award parameter.'}), 400
+    if (max_suppliers is not None and max_suppliers < 1) or (min_lots is not None and min_lots < 1) or time_budget <= 0:
+        return jsonify({'error': 'max_suppliers, min_lots and time_budget must be positive.'}), 400
+
+    award = bid_analysis.get_constrained_award(bid_id, max_suppliers, min_lots,
+                                               min(time_budget, API_MAX_AWARD_SECONDS))
+    if award is None:
+        return jsonify({'error': 'No bidder quotes for this bid.'}), 404
+    return jsonify(dict(award, bid_id=bid_id))
+
+
+@app.route('/api/history', methods=['GET', 'POST'])
+@api_role_required
+def api_batch_history():
+    """History for many bids in one call, keyed by bid_id"""
+    bid_ids = _requested_bid_ids()
+    if not bid_ids:
+        return jsonify({'error': 'Provide bid IDs via ?ids=BID001,BID002 or {"bid_ids": [...]}.'}), 400
+    if len(bid_ids) > API_MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {API_MAX_BATCH_SIZE} bids per request.'}), 400
+
+    history = db.select_rows('History', 'bid_id', bid_ids)
     if not history.empty:
-        c.setFont("Helvetica", 8)
-        for idx, record in history.iterrows():
-            if y < 1.5*inch:
-                c.showPage()
-                y = draw_header(c, height) - 0.3*inch
-            
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(1*inch, y, f"{record['action_date']} - {record['action']}")
-            y -= 0.15*inch
-            c.setFont("Helvetica", 8)
-            c.drawString(1.2*inch, y, f"By: {record['action_by']} ({record['role']})")
-            y -= 0.12*inch
-            if record['comment']:
-                comment_str = str(record['comment'])
-                if len(comment_str) > 80:
-                    comment_str = comment_str[:77] + "..."
-                c.drawString(1.2*inch, y, f"Comment: {comment_str}")
-                y -= 0.12*inch
-            if record['previous_status'] or record['new_status']:
-                prev_status = record['previous_status'] if record['previous_status'] else 'None'
-                new_status = record['new_status'] if record['new_status'] else 'None'
-                c.drawString(1.2*inch, y, f"Status: {prev_status} → {new_status}")
-                y -= 0.12*inch
-            y -= 0.1*inch
-    else:
-        c.setFont("Helvetica-Oblique", 9)
-        c.drawString(1*inch, y, "No audit trail records found")
-        y -= 0.3*inch
-    
-    # Footer
-    c.setFont("Helvetica", 8)
-    c.drawString(0.75*inch, 0.5*inch, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    c.drawRightString(width - 0.75*inch, 0.5*inch, f"Document: {bid['bid_id']}_Comparison.pdf")
-    
-    c.save()
-    buffer.seek(0)
-    
-    return send_file(buffer, as_attachment=True, download_name=f"bid_{bid_id}_comparison.pdf", 
-                     mimetype='application/pdf')
+        history = history.sort_values('action_date', ascending=False)
+    grouped = {bid_id: [] for bid_id in bid_ids}
+    for record in _json_records(history):
+        grouped[record['bid_id']].append(record)
+    return jsonify({'history': grouped})
 
 if __name__ == '__main__':
+    # Workbooks created before the materialized sheets existed get them here, before
+    # serving; deployments that import app run `admin_tools.py migrate` instead
+    db.ensure_materialized_sheets()
     app.run(debug=True, port=5000)
@@ -0,0 +1,95 @@
+"""
+Benchmark: pricing anomaly detection on synthetic tenders
+
+Times bid_analysis.detect_anomalies (robust z-scores, identical-rate pairs and
+pattern correlations) on the same seeded tenders as bench_award_optimizer, with a
+few copied and scaled bidders planted so every stage has pairs to report. Exits
+with status 1 when the median run of any tender takes longer than --max-seconds.
+
+Usage:
+    python benchmarks/bench_anomalies.py
+    python benchmarks/bench_anomalies.py --repeat 5 --max-seconds 1.0
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import bid_analysis
+from bench_award_optimizer import make_tender
+
+# name, bidders, items, quote coverage
+SCENARIOS = [
+    ('small', 8, 40, 0.8),
+    ('medium', 40, 500, 0.6),
+    ('large', 200, 2000, 0.5),
+    ('large', 500, 5000, 0.7),
+]
+DEFAULT_MAX_SECONDS = 1.0
+
+
+def plant_anomalies(rng, rates):
+    """Copy one bidder's rates, scale another's and mark up a few quotes tenfold"""
+    rates[1] = rates[0]
+    rates[3] = np.round(rates[2] * 1.08, 2)
+    rows = rng.integers(0, len(rates), size=max(rates.shape[1] // 100, 1))
+    columns = rng.integers(0, rates.shape[1], size=len(rows))
+    rates[rows, columns] *= 10
+    return rates
+
+
+def run_scenario(rng, scenario, repeat):
+    name, bidders, items, coverage = scenario
+    rates = plant_anomalies(rng, make_tender(rng, bidders, items, coverage)[0])
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = bid_analysis.detect_anomalies(rates)
+        times.append(time.perf_counter() - start)
+
+    with np.errstate(invalid='ignore'):
+        outliers = int((np.abs(np.nan_to_num(found['zscores'])) >= bid_analysis.ANOMALY_Z_THRESHOLD).sum())
+    first, _ = bid_analysis._upper_pairs(found['shared'] >= bid_analysis.IDENTICAL_MIN_ITEMS)
+    correlated, _ = bid_analysis._upper_pairs(found['correlation'] >= bid_analysis.CORRELATION_THRESHOLD)
+    return {
+        'name': name,
+        'size': f"{bidders}x{items}",
+        'median': statistics.median(times),
+        'outliers': outliers,
+        'identical': len(first),
+        'correlated': len(correlated)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pricing anomaly detection')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per tender; the median is reported')
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                        help='Fail when any tender takes longer than this')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic tenders')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'tender':<8}{'size':>10}{'time':>9}{'outliers':>10}{'identical':>11}{'correlated':>12}")
+    slow = 0
+    for scenario in SCENARIOS:
+        row = run_scenario(rng, scenario, args.repeat)
+        over = row['median'] > args.max_seconds
+        slow += over
+        print(f"{row['name']:<8}{row['size']:>10}{row['median']:>8.2f}s{row['outliers']:>10}"
+              f"{row['identical']:>11}{row['correlated']:>12}" + ('  SLOW' if over else ''))
+    if slow:
+        print(f"\n{slow} tender(s) slower than {args.max_seconds:.2f}s.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
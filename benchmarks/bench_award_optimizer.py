@@ -0,0 +1,114 @@
+"""
+Benchmark: constrained award optimization on synthetic tenders
+
+Generates random bidders x items rate matrices (seeded, so runs are repeatable)
+with partial coverage and bidder price levels, and solves each under a supplier
+cap and minimum lots per supplier. Reports the method used, run time, the award
+total and its premium over the unconstrained split award. Small tenders are also
+solved with the heuristic alone to show how far it is from the exact optimum.
+
+Usage:
+    python benchmarks/bench_award_optimizer.py --time-budget 2
+    python benchmarks/bench_award_optimizer.py --only large --seed 7
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import bid_analysis
+
+# name, bidders, items, quote coverage, max_suppliers, min_lots
+SCENARIOS = [
+    ('small', 8, 40, 0.8, 3, None),
+    ('small', 8, 40, 0.8, 3, 10),
+    ('small', 12, 80, 0.7, 4, 15),
+    ('medium', 40, 500, 0.6, 5, None),
+    ('medium', 40, 500, 0.6, 8, 40),
+    ('large', 200, 2000, 0.5, 10, None),
+    ('large', 200, 2000, 0.5, 10, 150),
+    ('large', 500, 5000, 0.3, 20, 200),
+]
+
+
+def make_tender(rng, bidders, items, coverage):
+    """
+    Random unit rates: each item has a base price, each bidder a price level and
+    per-item noise; a (1 - coverage) share of quotes is missing. Every item keeps
+    at least one quote so the tender can be fully awarded.
+    """
+    base = rng.lognormal(mean=4, sigma=1, size=items)
+    level = rng.uniform(0.85, 1.15, size=(bidders, 1))
+    rates = np.round(base * level * rng.uniform(0.9, 1.1, size=(bidders, items)), 2)
+    missing = rng.random((bidders, items)) > coverage
+    missing[rng.integers(0, bidders, size=items), np.arange(items)] = False
+    rates[missing] = np.nan
+    quantities = rng.integers(1, 100, size=items).astype(float)
+    return rates, quantities
+
+
+def run_scenario(rng, scenario, time_budget):
+    name, bidders, items, coverage, max_suppliers, min_lots = scenario
+    rates, quantities = make_tender(rng, bidders, items, coverage)
+    split_total = bid_analysis.analyze_rates(rates, quantities)['split_total']
+
+    start = time.perf_counter()
+    found = bid_analysis.optimize_award(rates, quantities, max_suppliers, min_lots, time_budget)
+    seconds = time.perf_counter() - start
+
+    gap = None
+    if found['method'] == 'exact' and found['feasible']:
+        limit = bid_analysis.EXACT_WORK_LIMIT
+        bid_analysis.EXACT_WORK_LIMIT = 0
+        try:
+            heuristic = bid_analysis.optimize_award(rates, quantities, max_suppliers, min_lots, time_budget)
+        finally:
+            bid_analysis.EXACT_WORK_LIMIT = limit
+        if heuristic['feasible']:
+            gap = (heuristic['total'] / found['total'] - 1) * 100
+
+    return {
+        'name': name,
+        'size': f"{bidders}x{items}",
+        'rules': f"<={max_suppliers} sup" + (f", >={min_lots} lots" if min_lots else ''),
+        'method': found['method'],
+        'seconds': seconds,
+        'total': found['total'],
+        'premium': (found['total'] / split_total - 1) * 100 if found['feasible'] else None,
+        'suppliers': len(found['suppliers']),
+        'gap': gap
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the constrained award optimizer')
+    parser.add_argument('--time-budget', type=float, default=bid_analysis.DEFAULT_TIME_BUDGET,
+                        help='Seconds allowed per tender')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic tenders')
+    parser.add_argument('--only', choices=sorted({scenario[0] for scenario in SCENARIOS}),
+                        help='Run one group of scenarios')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'tender':<8}{'size':>10}  {'rules':<22}{'method':<11}{'time':>8}"
+          f"{'total':>16}{'vs split':>10}{'sup':>5}{'heur gap':>10}")
+    for scenario in SCENARIOS:
+        if args.only and scenario[0] != args.only:
+            continue
+        row = run_scenario(rng, scenario, args.time_budget)
+        total = f"{row['total']:,.2f}" if row['total'] is not None else 'infeasible'
+        premium = f"+{row['premium']:.2f}%" if row['premium'] is not None else '-'
+        gap = f"{row['gap']:.2f}%" if row['gap'] is not None else '-'
+        print(f"{row['name']:<8}{row['size']:>10}  {row['rules']:<22}{row['method']:<11}"
+              f"{row['seconds']:>7.2f}s{total:>16}{premium:>10}{row['suppliers']:>5}{gap:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
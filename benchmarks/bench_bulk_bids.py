@@ -0,0 +1,101 @@
+"""
+Benchmark: bulk bid import vs. creating bids one at a time
+
+Generates a synthetic bids file (and items file) and imports it into a temporary
+copy of database.xlsx through the same path as `python bulk_import.py`. The
+per-bid create_bid path rewrites the workbook several times per bid, so it is
+timed on a small sample against the starting database and extrapolated (a lower
+bound, since each write gets slower as the workbook grows).
+
+Usage:
+    python benchmarks/bench_bulk_bids.py --bids 50000 --items-per-bid 2 --sample 5
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import bulk_import
+import db_helper as db
+
+
+def make_import_files(work_dir, bid_count, items_per_bid, buyer_ids):
+    """Write bids.csv and items.csv with synthetic data; returns their paths"""
+    refs = [f'R{i}' for i in range(bid_count)]
+    bids_path = os.path.join(work_dir, 'bids.csv')
+    pd.DataFrame({
+        'ref': refs,
+        'contract_name': [f'Imported contract {i}' for i in range(bid_count)],
+        'contract_description': 'Synthetic bid for import benchmark',
+        'contract_value': [1000 + (i % 997) * 10 for i in range(bid_count)],
+        'assigned_buyer_id': [buyer_ids[i % len(buyer_ids)] if buyer_ids and i % 3 else '' for i in range(bid_count)],
+        'created_date': '2024-06-30'
+    }).to_csv(bids_path, index=False)
+
+    items_path = os.path.join(work_dir, 'items.csv')
+    pd.DataFrame({
+        'bid_ref': [ref for ref in refs for _ in range(items_per_bid)],
+        'item_name': [f'Item {n}' for _ in refs for n in range(items_per_bid)],
+        'item_description': '',
+        'quantity': 10,
+        'unit': 'pcs'
+    }).to_csv(items_path, index=False)
+    return bids_path, items_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark bulk bid import')
+    parser.add_argument('--bids', type=int, default=50000, help='Bids in the import file')
+    parser.add_argument('--items-per-bid', type=int, default=2, help='Items per imported bid')
+    parser.add_argument('--sample', type=int, default=5, help='Bids timed on the per-bid create_bid path')
+    parser.add_argument('--database', default=os.path.join(project_home, 'database.xlsx'))
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_bids_')
+    try:
+        db.DATABASE_FILE = os.path.join(work_dir, 'database.xlsx')
+        shutil.copy(args.database, db.DATABASE_FILE)
+        buyer_ids = db.get_all_buyers()['buyer_id'].dropna().astype(str).tolist()
+        bids_path, items_path = make_import_files(work_dir, args.bids, args.items_per_bid, buyer_ids)
+
+        # Timed on the starting database; per-bid cost grows with the workbook size
+        start = time.perf_counter()
+        for i in range(args.sample):
+            db.create_bid(f'Single {i}', '', 100, 'bench', buyer_ids[0] if buyer_ids else None)
+        per_bid_seconds = (time.perf_counter() - start) / max(args.sample, 1)
+
+        start = time.perf_counter()
+        with open(bids_path, 'rb') as f:
+            bids_df = bulk_import.read_table(f, 'bids.csv')
+        with open(items_path, 'rb') as f:
+            items_df = bulk_import.read_table(f, 'items.csv')
+        bids, items, errors = bulk_import.load_bid_import(bids_df, items_df)
+        validate_seconds = time.perf_counter() - start
+        assert not errors, bulk_import.format_errors(errors)
+
+        start = time.perf_counter()
+        imported = db.import_bids_bulk(bids, items, 'bench')
+        import_seconds = time.perf_counter() - start
+
+        total = validate_seconds + import_seconds
+        print(f"Bids imported:          {len(imported)} ({len(items)} items)")
+        print(f"Parse + validate:       {validate_seconds:.2f}s")
+        print(f"Import (1 write):       {import_seconds:.2f}s")
+        print(f"Throughput:             {len(imported) / total:,.0f} bids/s end to end")
+        print(f"Per-bid create_bid:     {per_bid_seconds:.2f}s/bid "
+              f"(at least ~{per_bid_seconds * args.bids / 3600:.1f}h for {args.bids} bids)")
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
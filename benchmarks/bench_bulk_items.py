@@ -0,0 +1,82 @@
+"""
+Benchmark: adding bid line items one at a time vs. in a single bulk write
+
+Runs against a temporary copy of database.xlsx, so the real database is never
+touched. The per-row path rewrites the workbook on every call, so it is timed on
+a small sample and extrapolated to the full item count.
+
+Usage:
+    python benchmarks/bench_bulk_items.py --items 10000 --sample 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import bulk_import
+import db_helper as db
+
+
+def make_items_csv(path, count):
+    """Write a CSV with `count` synthetic line items"""
+    pd.DataFrame({
+        'item_name': [f'Item {i}' for i in range(count)],
+        'item_description': [f'Synthetic line item {i}' for i in range(count)],
+        'quantity': [(i % 50) + 1 for i in range(count)],
+        'unit': ['pcs'] * count
+    }).to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark bulk bid item import')
+    parser.add_argument('--items', type=int, default=10000, help='Items in the uploaded file')
+    parser.add_argument('--sample', type=int, default=20, help='Items timed on the per-row path')
+    parser.add_argument('--database', default=os.path.join(project_home, 'database.xlsx'))
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_items_')
+    try:
+        db.DATABASE_FILE = os.path.join(work_dir, 'database.xlsx')
+        shutil.copy(args.database, db.DATABASE_FILE)
+        bid_id = db.create_bid('Benchmark', 'Bulk item benchmark', 0, 'bench', '')
+
+        csv_path = os.path.join(work_dir, 'items.csv')
+        make_items_csv(csv_path, args.items)
+
+        start = time.perf_counter()
+        with open(csv_path, 'rb') as f:
+            items, errors = bulk_import.validate_items(bulk_import.read_table(f, 'items.csv'))
+        parse_seconds = time.perf_counter() - start
+        assert not errors, errors
+
+        start = time.perf_counter()
+        db.add_bid_items_bulk(bid_id, items)
+        bulk_seconds = time.perf_counter() - start
+
+        sample = items.head(args.sample)
+        start = time.perf_counter()
+        for row in sample.itertuples(index=False):
+            db.add_bid_item(bid_id, row.item_name, row.item_description, row.quantity, row.unit)
+        per_row_seconds = (time.perf_counter() - start) / max(len(sample), 1)
+
+        stored = len(db.get_items_for_bid(bid_id))
+        print(f"Items imported:           {stored - len(sample)}")
+        print(f"Parse + validate:         {parse_seconds:.3f}s")
+        print(f"Bulk write (1 write):     {bulk_seconds:.3f}s")
+        print(f"Per-row add_bid_item:     {per_row_seconds * 1000:.1f}ms/item "
+              f"(~{per_row_seconds * args.items:.0f}s for {args.items} items)")
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Benchmark: db_helper functions at several database sizes
+
+For each size a synthetic database is generated (see generate_database.py, same
+seed every run, BidderTotals and PriceIndex sheets included), and every case
+below is timed --repeat times. Functions that write start each run from a fresh
+copy of that database with an empty sheet cache; as in the app after any write,
+they pay for parsing the sheets they need. Read-only cases are timed both cold
+(empty cache) and warm (sheets already parsed), the steady state of a running
+worker.
+
+Results are printed as a table and can be saved as JSON. Given a saved baseline,
+each case's median is compared with it and the run fails (exit code 1) when any
+case is slower by more than --threshold.
+
+Usage:
+    python benchmarks/bench_db_helper.py --sizes tiny small --output bench_db.json
+    python benchmarks/bench_db_helper.py --baseline bench_db.json --threshold 0.25
+    python benchmarks/bench_db_helper.py --sizes medium --only read_sheet get_next_bid_id
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import db_helper as db
+import generate_database
+
+DEFAULT_SIZES = ['tiny', 'small']
+DEFAULT_THRESHOLD = 0.2
+
+
+class Fixture:
+    """Bids and IDs from the generated database that the cases act on"""
+
+    def __init__(self, sheets):
+        bids = sheets['Bids']
+        items = sheets['BidItems']
+
+        def bid_with(status):
+            matches = bids.loc[bids['status'] == status, 'bid_id']
+            return matches.iloc[0] if not matches.empty else bids['bid_id'].iloc[0]
+
+        counts = sheets['BidderItemBids'].groupby('bid_id').size()
+        self.bid_id = counts.idxmax() if not counts.empty else bids['bid_id'].iloc[0]
+        self.pending_a1 = bid_with('Pending A1')
+        self.pending_a2 = bid_with('Pending A2')
+        self.approved = bid_with('Approved')
+        self.buyer_id = sheets['Buyers']['buyer_id'].iloc[0]
+        self.bidder_id = sheets['Bidders']['bidder_id'].iloc[0]
+        bid_items = items.loc[items['bid_id'] == self.bid_id, 'item_id']
+        self.item_rates = {item_id: 100.0 + n for n, item_id in enumerate(bid_items)}
+        self.history = sheets['History']
+
+
+def _get_next_cases():
+    names = sorted(name for name in dir(db) if name.startswith('get_next_') and name.endswith('_id'))
+    return [(name, False, False, lambda f, name=name: getattr(db, name)()) for name in names]
+
+
+# name, writes to the workbook, warm cache, call
+CASES = [
+    ('read_sheet[cold]', False, False, lambda f: db.read_sheet('BidderItemBids')),
+    ('read_sheet[warm]', False, True, lambda f: db.read_sheet('BidderItemBids')),
+    ('write_sheet', True, False, lambda f: db.write_sheet(f.history, 'History')),
+] + _get_next_cases() + [
+    ('create_bid', True, False,
+     lambda f: db.create_bid('Benchmark contract', 'Created by bench_db_helper', 1000, 'Benchmark', f.buyer_id)),
+    ('add_history', True, False,
+     lambda f: db.add_history(f.bid_id, 'Benchmark', 'Vendor', 'Benchmark', 'Benchmark entry', None, None)),
+    ('submit_bidder_item_bids', True, False,
+     lambda f: db.submit_bidder_item_bids(f.bid_id, f.bidder_id, f.item_rates)),
+    ('get_all_bidder_bids_with_totals[cold]', False, False, lambda f: db.get_all_bidder_bids_with_totals(f.bid_id)),
+    ('get_all_bidder_bids_with_totals[warm]', False, True, lambda f: db.get_all_bidder_bids_with_totals(f.bid_id)),
+    ('get_history_for_bid[cold]', False, False, lambda f: db.get_history_for_bid(f.bid_id)),
+    ('get_history_for_bid[warm]', False, True, lambda f: db.get_history_for_bid(f.bid_id)),
+    ('a1_approve', True, False, lambda f: db.a1_approve(f.pending_a1, 'Benchmark', 'Benchmark')),
+    ('a1_reject', True, False, lambda f: db.a1_reject(f.pending_a1, 'Benchmark', 'Benchmark')),
+    ('a2_approve', True, False, lambda f: db.a2_approve(f.pending_a2, 'Benchmark', 'Benchmark')),
+    ('a2_reject', True, False, lambda f: db.a2_reject(f.pending_a2, 'Benchmark', 'Benchmark')),
+    ('a2_reopen_bid', True, False, lambda f: db.a2_reopen_bid(f.approved, 'Benchmark', 'Benchmark')),
+]
+
+
+def prepare_database(work_dir, size, seed):
+    """Generate the database for one size; returns (path, rows)"""
+    path = os.path.join(work_dir, f"{size}.xlsx")
+    rows = generate_database.generate(path, 'xlsx', seed, **generate_database.SCALES[size])
+    db.DATABASE_FILE = path
+    db.clear_cache()
+    return path, rows
+
+
+def time_case(case, pristine, work_path, fixture, repeat):
+    """Run one case `repeat` times; returns the durations in seconds"""
+    name, writes, warm, call = case
+    db.DATABASE_FILE = pristine
+    durations = []
+    for _ in range(repeat):
+        if writes:
+            shutil.copyfile(pristine, work_path)
+            db.DATABASE_FILE = work_path
+        db.clear_cache()
+        if warm:
+            call(fixture)
+        start = time.perf_counter()
+        call(fixture)
+        durations.append(time.perf_counter() - start)
+    db.DATABASE_FILE = pristine
+    return durations
+
+
+def run(sizes, repeat, seed, only=None, work_dir=None):
+    """Benchmark every selected case at every size; returns the result records"""
+    cases = [case for case in CASES if not only or any(case[0].startswith(name) for name in only)]
+    results = []
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='bench_db_')
+    try:
+        for size in sizes:
+            print(f"Generating {size} database...", flush=True)
+            pristine, rows = prepare_database(work_dir, size, seed)
+            fixture = Fixture(db.read_sheets(['Bids', 'BidItems', 'BidderItemBids', 'Buyers', 'Bidders', 'History']))
+            work_path = os.path.join(work_dir, f"{size}_work.xlsx")
+            for case in cases:
+                durations = time_case(case, pristine, work_path, fixture, repeat)
+                record = {
+                    'size': size,
+                    'case': case[0],
+                    'median': statistics.median(durations),
+                    'min': min(durations),
+                    'mean': statistics.fmean(durations),
+                    'max': max(durations),
+                    'runs': durations,
+                    'rows': rows
+                }
+                results.append(record)
+                print(f"  {size:<8}{case[0]:<42}{record['median'] * 1000:>11.2f} ms", flush=True)
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Pair each result with the baseline case; returns rows of (size, case, old, new, change, regressed)"""
+    old = {(record['size'], record['case']): record['median'] for record in baseline.get('results', [])}
+    rows = []
+    for record in results:
+        key = (record['size'], record['case'])
+        if key not in old:
+            rows.append((*key, None, record['median'], None, False))
+            continue
+        change = record['median'] / old[key] - 1 if old[key] > 0 else 0.0
+        rows.append((*key, old[key], record['median'], change, change > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'size':<8}{'case':<42}{'baseline':>12}{'now':>12}{'change':>10}")
+    for size, case, old, new, change, regressed in rows:
+        old_text = f"{old * 1000:.2f} ms" if old is not None else 'new'
+        change_text = f"{change * 100:+.1f}%" if change is not None else '-'
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{size:<8}{case:<42}{old_text:>12}{new * 1000:>9.2f} ms{change_text:>10}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) above {threshold * 100:.0f}%.")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark db_helper functions at several database sizes')
+    parser.add_argument('--sizes', nargs='+', choices=[s for s in generate_database.SCALES if s != 'production'],
+                        default=DEFAULT_SIZES, help='Database presets from generate_database.py')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the generated databases')
+    parser.add_argument('--only', nargs='+', help='Only cases whose name starts with one of these')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with results saved by an earlier --output')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown of a case median before it counts as a regression (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading baseline {args.baseline}: {e}")
+            return 1
+
+    results = run(args.sizes, max(args.repeat, 1), args.seed, args.only)
+    if args.output:
+        payload = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'repeat': args.repeat
+            },
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = print_comparison(compare(results, baseline, args.threshold), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
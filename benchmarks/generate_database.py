@@ -0,0 +1,435 @@
+"""
+Synthetic database generator for performance work
+
+Builds a database with the same sheets and columns as database.xlsx at any
+scale, from a seed, so every run with the same arguments produces identical
+data. Bids move through the real workflow statuses: each bid's History is the
+ordered chain of actions that leads to its status, with some A1/A2 rejections and
+reopenings looping back along the way. Each bid has a random number of items, and
+bidders quote on bids with skewed (Zipf-like) participation, so a few bidders
+appear on most bids and most bidders on few. Rates follow an item base price x
+bidder price level x noise, with some items left unquoted. The BidderTotals and
+PriceIndex sheets are derived from the rates with db_helper, as the app builds them.
+
+Two output formats:
+    xlsx  a workbook the app can open directly; every sheet must fit in Excel's
+          1,048,576 rows, which is checked before anything is written
+    csv   a directory with one <Sheet>.csv per sheet, written in chunks, for
+          sizes beyond what a workbook can hold
+
+Usage:
+    python benchmarks/generate_database.py --scale medium --output bench.xlsx
+    python benchmarks/generate_database.py --scale production --format csv --output bench_store
+    python benchmarks/generate_database.py --bids 2000 --items-per-bid 15 --seed 7 --output custom.xlsx
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import db_helper
+
+# Rows per sheet in an .xlsx file, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+# Bids generated per chunk; fixed so the output depends only on the seed and sizes
+CHUNK_BIDS = 500
+
+SCALES = {
+    'tiny': dict(bids=20, items_per_bid=4, bidders=8, bidders_per_bid=3, history_per_bid=4, buyers=4),
+    'small': dict(bids=500, items_per_bid=8, bidders=60, bidders_per_bid=4, history_per_bid=6, buyers=20),
+    'medium': dict(bids=5000, items_per_bid=10, bidders=300, bidders_per_bid=5, history_per_bid=8, buyers=50),
+    'large': dict(bids=20000, items_per_bid=12, bidders=1000, bidders_per_bid=3, history_per_bid=10, buyers=100),
+    # 50k bids, ~2M BidItems, ~20M BidderItemBids and ~5M History rows: csv only
+    'production': dict(bids=50000, items_per_bid=40, bidders=2000, bidders_per_bid=11, history_per_bid=100,
+                       buyers=200),
+}
+
+BID_COLUMNS = ['bid_id', 'contract_name', 'contract_description', 'contract_value', 'created_date',
+               'vendor_name', 'status', 'selected_buyer_id', 'selected_submission_id', 'vendor_justification',
+               'submission_date', 'buyer_comment', 'a1_status', 'a1_comment', 'a1_date',
+               'a2_status', 'a2_comment', 'a2_date']
+EMPTY_SHEETS = {
+    'VendorBids': ['submission_id', 'bid_id', 'vendor_id', 'vendor_name', 'bid_amount', 'bid_description',
+                   'submission_date', 'is_selected'],
+    'BuyerBids': ['submission_id', 'bid_id', 'buyer_id', 'buyer_name', 'bid_amount', 'bid_description',
+                  'submission_date', 'is_selected'],
+    'BidComparison': ['bid_id', 'item_id', 'item_name', 'quantity', 'unit'],
+}
+HISTORY_COLUMNS = ['history_id', 'bid_id', 'action_date', 'action_by', 'role', 'action', 'comment',
+                   'previous_status', 'new_status']
+SHEET_ORDER = ['Bids', 'Vendors', 'Buyers', 'BidItems', 'VendorBids', 'BuyerBids', 'History', 'Bidders',
+               'BidderItemBids', 'BidComparison', 'BidderTotals', 'PriceIndex']
+
+# Share of bids in each workflow status
+STATUS_WEIGHTS = {
+    'Draft': 0.05,
+    'Awaiting Buyer': 0.25,
+    'Pending A1': 0.20,
+    'Pending A2': 0.15,
+    'Approved': 0.35,
+}
+
+# History entries as db_helper writes them: action, role, previous status, new status, comment
+HISTORY_ACTIONS = [
+    ('Created Bid', 'Vendor', '', 'Draft', 'Created new bid'),
+    ('Created Bid', 'Vendor', '', 'Awaiting Buyer', 'Created new bid'),
+    ('Assigned Buyer', 'Vendor', 'Awaiting Buyer', 'Awaiting Buyer', 'Assigned buyer'),
+    ('Submitted for A1 Approval', 'Buyer', 'Awaiting Buyer', 'Pending A1', 'Reviewed the bidder rates.'),
+    ('Approved', 'A1 Approver', 'Pending A1', 'Pending A2', 'Looks good.'),
+    ('Rejected', 'A1 Approver', 'Pending A1', 'Awaiting Buyer', 'Please review the rates again.'),
+    ('Approved - Final', 'A2 Approver', 'Pending A2', 'Approved', 'Approved.'),
+    ('Rejected - Sent back to A1', 'A2 Approver', 'Pending A2', 'Pending A1', 'Sent back for another review.'),
+    ('Reopened Bid for Modifications', 'A2 Approver', 'Approved', 'Awaiting Buyer', 'Reopened for modifications.'),
+]
+(CREATED_DRAFT, CREATED, ASSIGNED, SUBMITTED, A1_APPROVED, A1_REJECTED, A2_APPROVED, A2_REJECTED,
+ REOPENED) = range(len(HISTORY_ACTIONS))
+
+# Per status reached: the step that reaches it and a detour that returns to it
+WORKFLOW_STAGES = [
+    ('Pending A1', [SUBMITTED], [A1_REJECTED, SUBMITTED]),
+    ('Pending A2', [A1_APPROVED], [A2_REJECTED, A1_APPROVED]),
+    ('Approved', [A2_APPROVED], [REOPENED, SUBMITTED, A1_APPROVED, A2_APPROVED]),
+]
+STAGE_STATUSES = ['Awaiting Buyer'] + [status for status, _, _ in WORKFLOW_STAGES]
+
+ITEM_NAMES = ['Office Desk', 'Office Chair', 'Laptop', 'Monitor', 'Network Switch', 'Firewall', 'Server Rack',
+              'Printer', 'Cleaning Service', 'Security Guard Shift', 'Cable Run', 'Software License',
+              'Air Conditioner', 'LED Panel', 'Filing Cabinet', 'Conference Table', 'UPS Unit', 'Router']
+UNITS = ['pieces', 'sets', 'hours', 'licenses', 'metres', 'months']
+CONTRACT_WORDS = ['IT', 'Facility', 'Security', 'Office', 'Network', 'Maintenance', 'Supply', 'Support',
+                  'Infrastructure', 'Audit', 'Furniture', 'Cleaning']
+
+BASE_DATE = np.datetime64('2022-01-01T09:00:00')
+
+
+def _timestamps(seconds):
+    """Format seconds after BASE_DATE as database timestamps"""
+    stamps = BASE_DATE + np.asarray(seconds, dtype='int64').astype('timedelta64[s]')
+    return pd.Series(stamps).dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+
+
+def _ids(prefix, numbers, width=3):
+    return [f"{prefix}{str(n).zfill(width)}" for n in numbers]
+
+
+def bidder_weights(rng, bidders, skew=1.1):
+    """Participation weight per bidder: Zipf-like by rank, ranks shuffled over the bidder IDs"""
+    weights = 1.0 / np.arange(1, bidders + 1) ** skew
+    return rng.permutation(weights / weights.sum())
+
+
+def make_parties(rng, prefix, count, label, width=3):
+    ids = _ids(prefix, range(1, count + 1), width)
+    return pd.DataFrame({
+        f'{label}_id': ids,
+        f'{label}_name': [f"{label.title()} {n}" for n in range(1, count + 1)],
+        'contact_email': [f"{i.lower()}@example.com" for i in ids],
+        'contact_phone': [f"+1-555-{n:04d}" for n in rng.integers(0, 10000, size=count)],
+        'password': [f"pass{n}" for n in range(1, count + 1)],
+    })
+
+
+def make_bids(rng, count, buyer_ids):
+    """The Bids sheet, with approval fields consistent with each bid's status"""
+    statuses = np.array(list(STATUS_WEIGHTS))
+    status = rng.choice(statuses, size=count, p=np.array(list(STATUS_WEIGHTS.values())))
+    created = np.sort(rng.integers(0, 3 * 365 * 86400, size=count))
+    words = rng.choice(CONTRACT_WORDS, size=(count, 2))
+
+    assigned = status != 'Draft'
+    submitted = np.isin(status, ['Pending A1', 'Pending A2', 'Approved'])
+    a1_done = np.isin(status, ['Pending A2', 'Approved'])
+    a2_done = status == 'Approved'
+    step = rng.integers(3600, 14 * 86400, size=(count, 3)).cumsum(axis=1) + created[:, None]
+
+    def when(mask, column):
+        return np.where(mask, _timestamps(step[:, column]), '')
+
+    return pd.DataFrame({
+        'bid_id': _ids('BID', range(1, count + 1)),
+        'contract_name': [f"{a} {b} Contract {n}" for n, (a, b) in enumerate(words, 1)],
+        'contract_description': 'Synthetic bid generated for benchmarking',
+        'contract_value': np.round(rng.lognormal(11, 1, size=count), -2),
+        'created_date': _timestamps(created),
+        'vendor_name': 'Admin User',
+        'status': status,
+        'selected_buyer_id': np.where(assigned, rng.choice(buyer_ids, size=count), ''),
+        'selected_submission_id': '',
+        'vendor_justification': '',
+        'submission_date': when(submitted, 0),
+        'buyer_comment': np.where(submitted, 'Reviewed the bidder rates.', ''),
+        'a1_status': np.where(a1_done, 'Approved', 'Pending'),
+        'a1_comment': np.where(a1_done, 'Looks good.', ''),
+        'a1_date': when(a1_done, 1),
+        'a2_status': np.where(a2_done, 'Approved', 'Pending'),
+        'a2_comment': np.where(a2_done, 'Approved.', ''),
+        'a2_date': when(a2_done, 2),
+    }, columns=BID_COLUMNS)
+
+
+def make_items(rng, bid_ids, items_per_bid):
+    """The BidItems sheet plus each item's base unit price; every bid gets at least one item"""
+    counts = rng.poisson(max(items_per_bid - 1, 0), size=len(bid_ids)) + 1
+    total = int(counts.sum())
+    names = rng.choice(ITEM_NAMES, size=total)
+    items = pd.DataFrame({
+        'item_id': np.arange(1, total + 1),
+        'bid_id': np.repeat(np.asarray(bid_ids, dtype=object), counts),
+        'item_name': names,
+        'item_description': [f"{name} (spec {n % 97})" for n, name in enumerate(names)],
+        'quantity': rng.integers(1, 200, size=total),
+        'unit': rng.choice(UNITS, size=total),
+    })
+    base_price = np.round(rng.lognormal(5, 1.2, size=total), 2)
+    return items, counts, base_price
+
+
+def _pick_bidders(rng, weights, counts):
+    """Per bid, `count` distinct bidders drawn by weight (Gumbel top-k); returns (bid positions, bidders)"""
+    k_max = int(counts.max())
+    keys = np.log(weights)[None, :] + rng.gumbel(size=(len(counts), len(weights)))
+    top = np.argpartition(-keys, k_max - 1, axis=1)[:, :k_max]
+    order = np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    take = np.arange(k_max)[None, :] < counts[:, None]
+    rows = np.nonzero(take)[0]
+    return rows, top[take]
+
+
+def iter_rates(rng, bid_ids, item_counts, base_price, weights, bidders_per_bid, coverage, submitted_from):
+    """
+    BidderItemBids rows, CHUNK_BIDS bids at a time: each bid gets a Poisson number
+    of distinct bidders, who quote about `coverage` of its items
+    """
+    bidder_ids = np.asarray(_ids('BIDDER', range(1, len(weights) + 1)), dtype=object)
+    level = rng.uniform(0.85, 1.2, size=len(weights))
+    item_start = np.concatenate([[0], np.cumsum(item_counts)[:-1]])
+    bid_ids = np.asarray(bid_ids, dtype=object)
+    next_id = 1
+    for start in range(0, len(bid_ids), CHUNK_BIDS):
+        chunk = slice(start, start + CHUNK_BIDS)
+        counts = np.minimum(rng.poisson(max(bidders_per_bid - 1, 0), size=len(bid_ids[chunk])) + 1, len(weights))
+        pair_bid, pair_bidder = _pick_bidders(rng, weights, counts)
+        pair_bid += start
+
+        lengths = item_counts[pair_bid]
+        first = np.repeat(item_start[pair_bid] - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        item = first + np.arange(int(lengths.sum()))
+        bid = np.repeat(pair_bid, lengths)
+        bidder = np.repeat(pair_bidder, lengths)
+        quoted = rng.random(len(item)) < coverage
+        item, bid, bidder = item[quoted], bid[quoted], bidder[quoted]
+
+        rates = np.round(base_price[item] * level[bidder] * rng.lognormal(0, 0.08, size=len(item)), 2)
+        submitted = submitted_from[bid] + rng.integers(3600, 30 * 86400, size=len(item))
+        yield pd.DataFrame({
+            'bidder_bid_id': np.arange(next_id, next_id + len(item)),
+            'bid_id': bid_ids[bid],
+            'bidder_id': bidder_ids[bidder],
+            'item_id': item + 1,
+            'unit_rate': rates,
+            'submission_date': _timestamps(submitted),
+        })
+        next_id += len(item)
+
+
+def workflow_path(rng, status, length):
+    """
+    History action codes that take a new bid to `status`: creation, then each
+    approval step in order. Until the path has about `length` entries, detours
+    are added at the stages the bid has passed (A1 or A2 rejection, reopening).
+    """
+    if status == 'Draft':
+        return [CREATED_DRAFT]
+    stages = WORKFLOW_STAGES[:STAGE_STATUSES.index(status)]
+    loops = np.zeros(len(stages), dtype=int)
+    spare = length - 2 - len(stages)
+    while stages:
+        stage = rng.integers(0, len(stages))
+        spare -= len(stages[stage][2])
+        if spare < 0:
+            break
+        loops[stage] += 1
+    path = [CREATED, ASSIGNED]
+    for (_, step, detour), count in zip(stages, loops):
+        path += step + detour * int(count)
+    return path
+
+
+def iter_history(rng, bids, history_per_bid, created_seconds):
+    """History rows, CHUNK_BIDS bids at a time: each bid's ordered workflow path to its status"""
+    bid_ids = bids['bid_id'].to_numpy(dtype=object)
+    buyers = bids['selected_buyer_id'].to_numpy(dtype=object)
+    statuses = bids['status'].to_numpy(dtype=object)
+    actions = np.array(HISTORY_ACTIONS, dtype=object)
+    next_id = 1
+    for start in range(0, len(bid_ids), CHUNK_BIDS):
+        chunk = np.arange(start, min(start + CHUNK_BIDS, len(bid_ids)))
+        lengths = rng.poisson(max(history_per_bid - 1, 0), size=len(chunk)) + 1
+        paths = [workflow_path(rng, statuses[n], length) for n, length in zip(chunk, lengths)]
+        counts = np.array([len(path) for path in paths])
+        bid = np.repeat(chunk, counts)
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        picked = actions[np.concatenate(paths)]
+        role = picked[:, 1]
+        action_by = np.where(role == 'Buyer', buyers[bid], np.where(role == 'Vendor', 'Admin User', role))
+
+        gaps = rng.integers(60, 3 * 86400, size=len(bid))
+        gaps[first] = 0
+        offsets = np.cumsum(gaps) - np.repeat(np.cumsum(gaps)[first], counts)
+        yield pd.DataFrame({
+            'history_id': np.arange(next_id, next_id + len(bid)),
+            'bid_id': bid_ids[bid],
+            'action_date': _timestamps(created_seconds[bid] + offsets),
+            'action_by': action_by,
+            'role': role,
+            'action': picked[:, 0],
+            'comment': picked[:, 4],
+            'previous_status': picked[:, 2],
+            'new_status': picked[:, 3],
+        }, columns=HISTORY_COLUMNS)
+        next_id += len(bid)
+
+
+def estimate_rows(bids, items_per_bid, bidders, bidders_per_bid, history_per_bid, buyers, coverage=0.9):
+    """Expected rows per generated sheet for the given sizes"""
+    return {
+        'Bids': bids,
+        'BidItems': bids * items_per_bid,
+        'BidderItemBids': int(bids * items_per_bid * min(bidders_per_bid, bidders) * coverage),
+        'History': bids * history_per_bid,
+        'BidderTotals': bids * min(bidders_per_bid, bidders),
+        'PriceIndex': bids * min(items_per_bid, len(ITEM_NAMES) * len(UNITS)),
+        'Bidders': bidders,
+        'Buyers': buyers,
+    }
+
+
+def check_excel_limits(rows):
+    """Raise ValueError naming the sheets that would not fit in an .xlsx file"""
+    too_big = {sheet: count for sheet, count in rows.items() if count + 1 > EXCEL_MAX_ROWS}
+    if too_big:
+        detail = ', '.join(f"{sheet} ({count:,} rows)" for sheet, count in too_big.items())
+        raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS - 1:,} data rows: {detail}. "
+                         f"Use --format csv or a smaller scale.")
+
+
+def generate_sheets(seed=42, bids=500, items_per_bid=8, bidders=60, bidders_per_bid=4, history_per_bid=6,
+                    buyers=20, coverage=0.9, skew=1.1):
+    """
+    Yield (sheet name, DataFrame) pairs for a synthetic database; BidderItemBids,
+    History and BidderTotals come in several chunks, in order. PriceIndex compares
+    every bid with all others, so it is computed last from all the rates.
+    """
+    rng = np.random.default_rng(seed)
+    buyers_df = make_parties(rng, 'V', buyers, 'buyer')
+    bidders_df = make_parties(rng, 'BIDDER', bidders, 'bidder')
+    vendors_df = pd.DataFrame([{'vendor_id': 'vendor1', 'vendor_name': 'Admin User',
+                                'contact_email': 'admin@example.com', 'contact_phone': '+1-555-0000',
+                                'password': 'vendor123'}])
+    bids_df = make_bids(rng, bids, buyers_df['buyer_id'].to_numpy(dtype=object))
+    items_df, item_counts, base_price = make_items(rng, bids_df['bid_id'], items_per_bid)
+    created = ((pd.to_datetime(bids_df['created_date']) - pd.Timestamp(BASE_DATE)).dt.total_seconds()
+               .to_numpy(dtype='int64'))
+
+    yield 'Bids', bids_df
+    yield 'Vendors', vendors_df
+    yield 'Buyers', buyers_df
+    yield 'BidItems', items_df
+    yield 'VendorBids', pd.DataFrame(columns=EMPTY_SHEETS['VendorBids'])
+    yield 'BuyerBids', pd.DataFrame(columns=EMPTY_SHEETS['BuyerBids'])
+    for chunk in iter_history(rng, bids_df, history_per_bid, created):
+        yield 'History', chunk
+    yield 'Bidders', bidders_df
+    weights = bidder_weights(rng, bidders, skew)
+    totals, rates = [], []
+    for chunk in iter_rates(rng, bids_df['bid_id'], item_counts, base_price, weights,
+                            bidders_per_bid, coverage, created):
+        yield 'BidderItemBids', chunk
+        # Rate chunks hold whole bids, so each chunk's totals and ranks are final
+        totals.append(db_helper.compute_bidder_totals(chunk, items_df[items_df['bid_id'].isin(chunk['bid_id'])]))
+        rates.append(chunk[['bid_id', 'bidder_id', 'item_id', 'unit_rate']])
+    yield 'BidComparison', pd.DataFrame(columns=EMPTY_SHEETS['BidComparison'])
+    for chunk in totals:
+        yield 'BidderTotals', chunk
+    yield 'PriceIndex', db_helper.compute_price_index(pd.concat(rates, ignore_index=True), items_df)
+
+
+def write_xlsx(sheets, path):
+    """Collect the chunks of each sheet, check the row limit and write one workbook"""
+    frames = {}
+    for sheet, df in sheets:
+        frames.setdefault(sheet, []).append(df)
+    frames = {sheet: pd.concat(parts, ignore_index=True) for sheet, parts in frames.items()}
+    check_excel_limits({sheet: len(df) for sheet, df in frames.items()})
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet in SHEET_ORDER:
+            frames[sheet].to_excel(writer, sheet_name=sheet, index=False)
+    return {sheet: len(df) for sheet, df in frames.items()}
+
+
+def write_csv(sheets, directory):
+    """Stream each sheet to <directory>/<Sheet>.csv, appending chunk by chunk"""
+    os.makedirs(directory, exist_ok=True)
+    rows = {}
+    for sheet, df in sheets:
+        path = os.path.join(directory, f"{sheet}.csv")
+        df.to_csv(path, mode='a' if sheet in rows else 'w', header=sheet not in rows, index=False)
+        rows[sheet] = rows.get(sheet, 0) + len(df)
+    return rows
+
+
+def generate(output, output_format='xlsx', seed=42, **sizes):
+    """Write a synthetic database to output; returns the rows written per sheet"""
+    if output_format == 'xlsx':
+        check_excel_limits(estimate_rows(**{key: sizes[key] for key in
+                                            ('bids', 'items_per_bid', 'bidders', 'bidders_per_bid',
+                                             'history_per_bid', 'buyers')},
+                                         coverage=sizes.get('coverage', 0.9)))
+        return write_xlsx(generate_sheets(seed, **sizes), output)
+    return write_csv(generate_sheets(seed, **sizes), output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic bid database for benchmarks')
+    parser.add_argument('--scale', choices=list(SCALES), default='small', help='Preset sizes (default: small)')
+    parser.add_argument('--output', required=True, help='Workbook path (xlsx) or directory (csv)')
+    parser.add_argument('--format', dest='output_format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+    for size in SCALES['small']:
+        parser.add_argument(f"--{size.replace('_', '-')}", dest=size, type=int,
+                            help=f"Override the preset {size.replace('_', ' ')}")
+    parser.add_argument('--coverage', type=float, default=0.9, help='Share of items each bidder quotes')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of bidder participation')
+    args = parser.parse_args(argv)
+
+    sizes = dict(SCALES[args.scale])
+    sizes.update({key: getattr(args, key) for key in sizes if getattr(args, key) is not None})
+    if min(sizes.values()) < 1:
+        print("Error: all sizes must be at least 1.")
+        return 1
+
+    expected = estimate_rows(coverage=args.coverage, **sizes)
+    print("Expected rows: " + ', '.join(f"{sheet} ~{count:,}" for sheet, count in expected.items()))
+    started = time.perf_counter()
+    try:
+        rows = generate(args.output, args.output_format, args.seed, coverage=args.coverage, skew=args.skew,
+                        **sizes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Wrote {args.output} in {time.perf_counter() - started:.1f}s: "
+          + ', '.join(f"{sheet} {count:,}" for sheet, count in rows.items() if count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,548 @@
+"""
+Load test: complete bid workflows through the Flask app
+
+Simulated users work concurrently, one thread each, and every bid goes through
+the whole workflow: a Vendor opens the create form and posts the bid with its
+items for a Buyer; Bidders open the rate form and submit a rate for every item;
+the assigned Buyer comments; A1 and A2 approve; A2 then downloads the comparison
+PDF. Redirects are followed the way a browser would, and every hop is timed
+under its route (bid IDs are folded into <bid_id>).
+
+By default requests go through the Flask test client against a copy of a
+generated database (see generate_database.py), so nothing outside a temporary
+directory is touched. With --url the same users drive a running server instead.
+
+Afterwards the workbook is read back and every step the app confirmed is checked:
+the bid row, its items, each bidder's rates, the buyer comment, the final status
+and one History entry per step. Anything missing is counted as a lost update.
+The exit code is 1 when there were server errors or lost updates.
+
+Usage:
+    python benchmarks/load_test.py --scale small --users 3 --bids-per-vendor 4
+    python benchmarks/load_test.py --vendors 4 --bidders 6 --a1 1 --a2 1 --output load.json
+    python benchmarks/load_test.py --url http://localhost:5000 --database database.xlsx
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import db_helper as db
+import generate_database
+
+MAX_REDIRECTS = 5
+PERCENTILES = (50, 90, 95, 99)
+
+# Workflow steps in order, with the History entry (role, new_status) each one adds
+STEPS = ['create', 'bidders', 'buyer_comment', 'a1_approve', 'a2_approve', 'pdf']
+STEP_HISTORY = {
+    'create': ('Vendor', 'Awaiting Buyer'),
+    'buyer_comment': ('Buyer', 'Pending A1'),
+    'a1_approve': ('A1 Approver', 'Pending A2'),
+    'a2_approve': ('A2 Approver', 'Approved')
+}
+
+_BID_CREATED = re.compile(r'Bid (\S+) created')
+_RATE_FIELD = re.compile(r'name="unit_rate_([^"]+)"')
+_BID_PATH = re.compile(r'/BID\d+')
+_OPTION = re.compile(r'<option value="([^"]+)"')
+_FLASH_DANGER = 'alert-danger alert-dismissible'
+
+
+class ClientTransport:
+    """One user's cookie session against the app through the Flask test client"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.headers.get('Location'), response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """One user's cookie session against a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + urllib.parse.quote(path, safe='/?=&'),
+                                     data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=300) as response:
+                return response.status, response.headers.get('Location'), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Location'), e.read()
+
+
+def route_label(method, path):
+    path = _BID_PATH.sub('/<bid_id>', urllib.parse.urlsplit(path).path)
+    return f"{method} {path}"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Stats:
+    """Latencies, errors and step outcomes collected from every user thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.error_samples = []
+        self.steps = {step: {'ok': 0, 'rejected': 0, 'failed': 0} for step in STEPS}
+
+    def record(self, label, seconds):
+        with self.lock:
+            self.latencies.setdefault(label, []).append(seconds)
+
+    def error(self, label, message):
+        with self.lock:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            if len(self.error_samples) < 20:
+                self.error_samples.append(f"{label}: {message}")
+
+    def step(self, step, outcome):
+        with self.lock:
+            self.steps[step][outcome] += 1
+
+    def routes(self):
+        summary = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            route = {'count': len(values), 'errors': self.errors.get(label, 0),
+                     'mean_ms': round(sum(values) / len(values) * 1000, 2)}
+            for pct in PERCENTILES:
+                route[f"p{pct}_ms"] = round(percentile(values, pct) * 1000, 2)
+            route['max_ms'] = round(values[-1] * 1000, 2)
+            summary[label] = route
+        return summary
+
+
+class User:
+    """A simulated user: follows redirects and times every hop"""
+
+    def __init__(self, transport, stats):
+        self.transport = transport
+        self.stats = stats
+
+    def request(self, method, path, data=None):
+        """Returns the final (status, body); raises on transport failures"""
+        for _ in range(MAX_REDIRECTS + 1):
+            label = route_label(method, path)
+            started = time.perf_counter()
+            try:
+                status, location, body = self.transport.request(method, path, data)
+            except Exception as e:
+                self.stats.error(label, f"{type(e).__name__}: {e}")
+                raise
+            self.stats.record(label, time.perf_counter() - started)
+            if status >= 400:
+                self.stats.error(label, f"HTTP {status}")
+            if status not in (301, 302, 303, 307, 308) or not location:
+                return status, body
+            parts = urllib.parse.urlsplit(location)
+            path = parts.path + (f"?{parts.query}" if parts.query else '')
+            method, data = 'GET', None
+        return status, body
+
+    def submit(self, step, method, path, data=None):
+        """Post a form; returns the landing page body when the app confirmed it, else None"""
+        try:
+            status, body = self.request(method, path, data)
+        except Exception:
+            self.stats.step(step, 'failed')
+            return None
+        if status >= 400:
+            self.stats.step(step, 'failed')
+            return None
+        text = body.decode('utf-8', 'replace')
+        if _FLASH_DANGER in text:
+            self.stats.step(step, 'rejected')
+            return None
+        self.stats.step(step, 'ok')
+        return text
+
+
+class Workflow:
+    """What the app confirmed for one bid"""
+
+    def __init__(self, vendor, number, buyer_id, items):
+        self.contract_name = f"Load test {vendor}-{number}"
+        self.buyer_id = buyer_id
+        self.items = items
+        self.bid_id = None
+        self.bidders = {}
+        self.buyer_comment = None
+        self.done = set()
+
+
+class LoadTest:
+    """Runs the role threads and hands bids from one workflow stage to the next"""
+
+    def __init__(self, make_transport, stats, users, bids_per_vendor, items_per_bid, bidders_per_bid):
+        self.make_transport = make_transport
+        self.stats = stats
+        self.users = users
+        self.bids_per_vendor = bids_per_vendor
+        self.items_per_bid = items_per_bid
+        self.bidders_per_bid = min(bidders_per_bid, users['Bidder'])
+        self.workflows = []
+        self.lock = threading.Lock()
+        self.bidder_queues = [queue.Queue() for _ in range(users['Bidder'])]
+        self.buyer_queues = {}
+        self.a1_queue = queue.Queue()
+        self.a2_queue = queue.Queue()
+        self.pending_bidders = {}
+        self.buyer_ids = []
+        self.bidder_ids = []
+
+    def login_options(self, role, page):
+        user = User(self.make_transport(), self.stats)
+        user.request('GET', f"/switch_role/{role}")
+        _, body = user.request('GET', page)
+        return _OPTION.findall(body.decode('utf-8', 'replace'))
+
+    def vendor(self, number):
+        user = User(self.make_transport(), self.stats)
+        user.request('GET', '/switch_role/Vendor')
+        for n in range(self.bids_per_vendor):
+            buyer_id = self.buyer_ids[(number * self.bids_per_vendor + n) % len(self.buyer_ids)]
+            items = [f"Item {i + 1}" for i in range(self.items_per_bid)]
+            workflow = Workflow(number + 1, n + 1, buyer_id, items)
+            with self.lock:
+                self.workflows.append(workflow)
+            user.request('GET', '/vendor/create_bid')
+            text = user.submit('create', 'POST', '/vendor/create_bid', {
+                'contract_name': workflow.contract_name,
+                'contract_description': 'Created by load_test.py',
+                'contract_value': '10000',
+                'assigned_buyer_id': buyer_id,
+                'item_name[]': items,
+                'item_description[]': ['Load test item'] * len(items),
+                'quantity[]': ['10'] * len(items),
+                'unit[]': ['Nos'] * len(items)
+            })
+            match = _BID_CREATED.search(text) if text else None
+            if not match:
+                continue
+            workflow.bid_id = match.group(1)
+            workflow.done.add('create')
+            if self.bidders_per_bid:
+                with self.lock:
+                    self.pending_bidders[id(workflow)] = self.bidders_per_bid
+                first = (number * self.bids_per_vendor + n) % len(self.bidder_queues)
+                for k in range(self.bidders_per_bid):
+                    self.bidder_queues[(first + k) % len(self.bidder_queues)].put(workflow)
+            else:
+                self.buyer_queues[buyer_id].put(workflow)
+
+    def bidder(self, number):
+        user = User(self.make_transport(), self.stats)
+        bidder_id = self.bidder_ids[number % len(self.bidder_ids)]
+        user.request('GET', '/switch_role/Bidder')
+        user.request('POST', '/bidder/login', {'bidder_id': bidder_id})
+        while True:
+            workflow = self.bidder_queues[number].get()
+            if workflow is None:
+                return
+            path = f"/bidder/submit_bid/{workflow.bid_id}"
+            try:
+                _, body = user.request('GET', path)
+                item_ids = _RATE_FIELD.findall(body.decode('utf-8', 'replace'))
+            except Exception:
+                item_ids = []
+            if item_ids and user.submit('bidders', 'POST', path,
+                                        {f"unit_rate_{item_id}": str(100 + number) for item_id in item_ids}):
+                with self.lock:
+                    workflow.bidders[bidder_id] = len(item_ids)
+            elif not item_ids:
+                self.stats.step('bidders', 'failed')
+            with self.lock:
+                self.pending_bidders[id(workflow)] -= 1
+                finished = self.pending_bidders[id(workflow)] == 0
+            if finished:
+                if len(workflow.bidders) == self.bidders_per_bid:
+                    workflow.done.add('bidders')
+                self.buyer_queues[workflow.buyer_id].put(workflow)
+
+    def buyer(self, buyer_id):
+        user = User(self.make_transport(), self.stats)
+        user.request('GET', '/switch_role/Buyer')
+        user.request('POST', '/buyer/login', {'buyer_id': buyer_id})
+        while True:
+            workflow = self.buyer_queues[buyer_id].get()
+            if workflow is None:
+                return
+            comment = f"Load test comment for {workflow.bid_id}"
+            user.request('GET', f"/buyer/view_bid/{workflow.bid_id}")
+            if user.submit('buyer_comment', 'POST', f"/buyer/submit_bid/{workflow.bid_id}",
+                           {'buyer_comment': comment}):
+                workflow.buyer_comment = comment
+                workflow.done.add('buyer_comment')
+                self.a1_queue.put(workflow)
+
+    def approver(self, role, step, prefix, source, target):
+        user = User(self.make_transport(), self.stats)
+        user.request('GET', f"/switch_role/{role}")
+        while True:
+            workflow = source.get()
+            if workflow is None:
+                return
+            user.request('GET', f"/{prefix}/view_bid/{workflow.bid_id}")
+            if not user.submit(step, 'POST', f"/{prefix}/approve/{workflow.bid_id}",
+                               {'comment': f"{role} approval"}):
+                continue
+            workflow.done.add(step)
+            if target is not None:
+                target.put(workflow)
+                continue
+            try:
+                status, body = user.request('GET', f"/download_pdf/{workflow.bid_id}")
+            except Exception:
+                status, body = 0, b''
+            if status == 200 and body[:4] == b'%PDF':
+                workflow.done.add('pdf')
+                self.stats.step('pdf', 'ok')
+            else:
+                self.stats.step('pdf', 'failed')
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=self._guard, args=(target,) + args, daemon=True)
+        thread.start()
+        return thread
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            self.stats.error(target.__name__, f"{type(e).__name__}: {e}")
+            traceback.print_exc()
+
+    def run(self):
+        """Run every workflow to completion; returns the wall time in seconds"""
+        buyers = self.login_options('Buyer', '/buyer/login')
+        bidders = self.login_options('Bidder', '/bidder/login')
+        if not buyers or (self.users['Bidder'] and not bidders):
+            raise RuntimeError('The database needs at least one buyer and one bidder')
+        self.buyer_ids = buyers[:self.users['Buyer']]
+        self.bidder_ids = bidders[:self.users['Bidder']]
+        self.buyer_queues = {buyer_id: queue.Queue() for buyer_id in self.buyer_ids}
+
+        started = time.perf_counter()
+        a2_threads = [self._start(self.approver, 'A2 Approver', 'a2_approve', 'a2', self.a2_queue, None)
+                      for _ in range(self.users['A2 Approver'])]
+        a1_threads = [self._start(self.approver, 'A1 Approver', 'a1_approve', 'a1', self.a1_queue, self.a2_queue)
+                      for _ in range(self.users['A1 Approver'])]
+        buyer_threads = [self._start(self.buyer, buyer_id) for buyer_id in self.buyer_ids]
+        bidder_threads = [self._start(self.bidder, n) for n in range(len(self.bidder_queues))]
+        vendor_threads = [self._start(self.vendor, n) for n in range(self.users['Vendor'])]
+
+        # Each stage is told to stop once everything upstream of it has finished
+        for thread in vendor_threads:
+            thread.join()
+        for source in self.bidder_queues:
+            source.put(None)
+        for thread in bidder_threads:
+            thread.join()
+        for source in self.buyer_queues.values():
+            source.put(None)
+        for thread in buyer_threads:
+            thread.join()
+        for _ in a1_threads:
+            self.a1_queue.put(None)
+        for thread in a1_threads:
+            thread.join()
+        for _ in a2_threads:
+            self.a2_queue.put(None)
+        for thread in a2_threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def find_lost_updates(workflows, database):
+    """Read the workbook back and count confirmed steps that are not in it, by kind"""
+    lost = {'bid_row': 0, 'items': 0, 'bidder_rates': 0, 'buyer_comment': 0,
+            'status': 0, 'history': 0, 'duplicate_bid_id': 0, 'duplicate_history_id': 0}
+    db.DATABASE_FILE = database
+    db.clear_cache()
+    sheets = db.read_sheets(['Bids', 'BidItems', 'BidderItemBids', 'History'])
+    bids, items, rates, history = sheets['Bids'], sheets['BidItems'], sheets['BidderItemBids'], sheets['History']
+
+    lost['duplicate_bid_id'] = int(bids['bid_id'].duplicated().sum())
+    lost['duplicate_history_id'] = int(history['history_id'].dropna().duplicated().sum())
+    item_counts = items.groupby('bid_id').size()
+    rate_counts = rates.groupby(['bid_id', 'bidder_id']).size()
+    history_keys = set(zip(history['bid_id'], history['role'], history['new_status']))
+
+    for workflow in workflows:
+        if 'create' not in workflow.done:
+            continue
+        rows = bids[bids['bid_id'] == workflow.bid_id]
+        if rows.empty:
+            lost['bid_row'] += 1
+            continue
+        bid = rows.iloc[0]
+        if item_counts.get(workflow.bid_id, 0) < len(workflow.items):
+            lost['items'] += 1
+        for bidder_id, count in workflow.bidders.items():
+            if rate_counts.get((workflow.bid_id, bidder_id), 0) < count:
+                lost['bidder_rates'] += 1
+        if workflow.buyer_comment is not None and bid.get('buyer_comment') != workflow.buyer_comment:
+            lost['buyer_comment'] += 1
+        expected_status = None
+        for step, status in (('a2_approve', 'Approved'), ('a1_approve', 'Pending A2'), ('buyer_comment', 'Pending A1')):
+            if step in workflow.done:
+                expected_status = status
+                break
+        if expected_status and bid.get('status') != expected_status:
+            lost['status'] += 1
+        for step, (role, new_status) in STEP_HISTORY.items():
+            if step in workflow.done and (workflow.bid_id, role, new_status) not in history_keys:
+                lost['history'] += 1
+    return lost
+
+
+def build_report(test, stats, wall_seconds, lost, meta):
+    requests = sum(len(values) for values in stats.latencies.values())
+    completed = sum(1 for workflow in test.workflows if 'pdf' in workflow.done)
+    return {
+        'meta': meta,
+        'wall_seconds': round(wall_seconds, 3),
+        'requests': requests,
+        'requests_per_second': round(requests / wall_seconds, 2) if wall_seconds else 0.0,
+        'workflows': len(test.workflows),
+        'workflows_completed': completed,
+        'workflows_per_minute': round(completed / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        'errors': sum(stats.errors.values()),
+        'error_samples': stats.error_samples,
+        'lost_updates': sum(lost.values()) if lost else None,
+        'lost_update_kinds': lost,
+        'steps': stats.steps,
+        'routes': stats.routes()
+    }
+
+
+def print_report(report):
+    print(f"\n{report['workflows_completed']}/{report['workflows']} workflows completed in "
+          f"{report['wall_seconds']:.1f}s ({report['workflows_per_minute']:.1f}/min), "
+          f"{report['requests']} requests ({report['requests_per_second']:.1f}/s)")
+    print(f"\n{'route':<40}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, route in report['routes'].items():
+        print(f"{label:<40}{route['count']:>7}{route['errors']:>8}{route['p50_ms']:>10.1f}"
+              f"{route['p90_ms']:>10.1f}{route['p99_ms']:>10.1f}{route['max_ms']:>10.1f}")
+    print(f"\n{'step':<16}{'ok':>6}{'rejected':>10}{'failed':>8}")
+    for step, counts in report['steps'].items():
+        print(f"{step:<16}{counts['ok']:>6}{counts['rejected']:>10}{counts['failed']:>8}")
+    print(f"\nErrors: {report['errors']}")
+    for sample in report['error_samples']:
+        print(f"  {sample}")
+    if report['lost_updates'] is None:
+        print('Lost updates: not checked (pass --database with --url)')
+    else:
+        kinds = ', '.join(f"{kind}={count}" for kind, count in report['lost_update_kinds'].items() if count)
+        print(f"Lost updates: {report['lost_updates']}" + (f" ({kinds})" if kinds else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive complete bid workflows through the app with concurrent users')
+    parser.add_argument('--url', help='Drive a running server, e.g. http://localhost:5000, instead of the test client')
+    parser.add_argument('--database', help='Workbook to use; copied unless --url is given. Default: generate one')
+    parser.add_argument('--scale', default='tiny', choices=[s for s in generate_database.SCALES if s != 'production'],
+                        help='Preset for the generated database')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the generated database')
+    parser.add_argument('--users', type=int, default=2, help='Concurrent users per role')
+    for role in ('vendors', 'bidders', 'buyers', 'a1', 'a2'):
+        parser.add_argument(f"--{role}", type=int, help="Users for this role (default --users)")
+    parser.add_argument('--bids-per-vendor', type=int, default=3, help='Bids each vendor creates')
+    parser.add_argument('--items', type=int, default=5, help='Items per bid')
+    parser.add_argument('--bidders-per-bid', type=int, default=2, help='Bidders submitting rates on each bid')
+    parser.add_argument('--output', help='Write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    def count(value):
+        return max(args.users if value is None else value, 0)
+
+    users = {'Vendor': max(count(args.vendors), 1), 'Bidder': count(args.bidders), 'Buyer': max(count(args.buyers), 1),
+             'A1 Approver': max(count(args.a1), 1), 'A2 Approver': max(count(args.a2), 1)}
+
+    work_dir = None
+    if args.url:
+        database = args.database
+        make_transport = lambda: HttpTransport(args.url)
+    else:
+        work_dir = tempfile.mkdtemp(prefix='load_test_')
+        database = os.path.join(work_dir, 'database.xlsx')
+        if args.database:
+            shutil.copyfile(args.database, database)
+        else:
+            print(f"Generating {args.scale} database...", flush=True)
+            generate_database.generate(database, 'xlsx', args.seed, **generate_database.SCALES[args.scale])
+        db.DATABASE_FILE = database
+        import app as bid_app
+        bid_app.app.config['TESTING'] = True
+        make_transport = lambda: ClientTransport(bid_app.app)
+
+    try:
+        stats = Stats()
+        test = LoadTest(make_transport, stats, users, max(args.bids_per_vendor, 1), max(args.items, 1),
+                        max(args.bidders_per_bid, 0))
+        print(f"Running {users['Vendor'] * test.bids_per_vendor} workflow(s) with users {users}...", flush=True)
+        wall_seconds = test.run()
+        lost = find_lost_updates(test.workflows, database) if database else None
+        report = build_report(test, stats, wall_seconds, lost, {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'mode': 'http' if args.url else 'test-client',
+            'url': args.url,
+            'database': args.database or f"generated:{args.scale}",
+            'seed': args.seed,
+            'users': users,
+            'bids_per_vendor': test.bids_per_vendor,
+            'items_per_bid': test.items_per_bid,
+            'bidders_per_bid': test.bidders_per_bid
+        })
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 1 if report['errors'] or report['lost_updates'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Stress test: concurrent db_helper writes, checked for lost updates and corruption
+
+Every mutation reads sheets, changes them and rewrites the whole workbook, so two
+writers that overlap can each save a copy missing the other's change. This script
+runs many writers at once and then checks what survived.
+
+For each mode (threads in one process, or separate processes) and each concurrency
+level, a fresh copy of a generated database (see generate_database.py) is
+hammered by that many workers. Each worker runs --ops-per-worker operations,
+cycling through add_history, a1_approve, submit_bidder_item_bids and create_bid,
+all started together. Afterwards the workbook is checked:
+  - it still opens, with every sheet present
+  - every row that existed before is still there, and no ID is duplicated
+  - History grew by exactly the rows the operations add
+  - each operation's own change is there: the history entry, the approval
+    (status and A1 history entry), the bidder's rates, the new bid
+  - every stored unit rate times the item quantity equals its line total (the
+    submitted rates have half cents, which must be rounded when stored)
+
+Throughput (operations per second) and the violations are reported per level.
+The exit code is 1 when any level breaks an invariant.
+
+Usage:
+    python benchmarks/stress_test.py
+    python benchmarks/stress_test.py --modes thread --levels 1 4 16 --ops-per-worker 3
+    python benchmarks/stress_test.py --operations a1_approve add_history --output stress.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
+
+import db_helper as db
+import generate_database
+import money
+
+OPERATIONS = ['add_history', 'a1_approve', 'submit_bidder_item_bids', 'create_bid']
+# History rows each operation adds; create_bid logs the creation and the buyer assignment
+HISTORY_ROWS = {'add_history': 1, 'a1_approve': 1, 'submit_bidder_item_bids': 1, 'create_bid': 2}
+ID_COLUMNS = {
+    'Bids': 'bid_id',
+    'BidItems': 'item_id',
+    'BidderItemBids': 'bidder_bid_id',
+    'History': 'history_id',
+    'Buyers': 'buyer_id',
+    'Bidders': 'bidder_id'
+}
+STRESS_MARKER = 'stress'
+
+
+def run_worker(database, tasks, barrier, results, worker):
+    """Run one worker's tasks once every worker is ready; puts (worker, calls, failures)"""
+    db.DATABASE_FILE = database
+    failures = []
+    barrier.wait()
+    for operation, args in tasks:
+        try:
+            if getattr(db, operation)(*args) is False:
+                failures.append(f"{operation}{args[:2]} returned False")
+        except Exception as e:
+            failures.append(f"{operation}{args[:2]}: {type(e).__name__}: {e}")
+    results.put((worker, len(tasks), failures))
+
+
+class Fixture:
+    """The pristine database's contents that the plans and checks refer to"""
+
+    def __init__(self, database):
+        sheets = pd.read_excel(database, sheet_name=None)
+        self.sheet_names = list(sheets)
+        self.bid_ids = sheets['Bids']['bid_id'].tolist()
+        self.buyer_id = sheets['Buyers']['buyer_id'].iloc[0]
+        self.bidder_ids = sheets['Bidders']['bidder_id'].tolist()
+        items = sheets['BidItems']
+        self.items = {bid_id: group['item_id'].tolist() for bid_id, group in items.groupby('bid_id')}
+        self.ids = {sheet: set(sheets[sheet][column].dropna()) for sheet, column in ID_COLUMNS.items()}
+        rates = sheets['BidderItemBids']
+        self.rate_ids = {key: set(group['bidder_bid_id']) for key, group in rates.groupby(['bid_id', 'bidder_id'])}
+        self.history_rows = len(sheets['History'])
+        history = sheets['History']
+        self.a1_entries = history[history['role'] == 'A1 Approver'].groupby('bid_id').size().to_dict()
+
+
+def prepare_database(work_dir, scale, seed):
+    """Generate the pristine database with every bid waiting for A1, so any of them can be approved"""
+    path = os.path.join(work_dir, 'pristine.xlsx')
+    generate_database.generate(path, 'xlsx', seed, **generate_database.SCALES[scale])
+    sheets = pd.read_excel(path, sheet_name=None)
+    sheets['Bids']['status'] = 'Pending A1'
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet, data in sheets.items():
+            data.to_excel(writer, sheet_name=sheet, index=False)
+    return path
+
+
+def build_plan(fixture, workers, ops_per_worker, operations):
+    """Split the operations between workers; returns (tasks per worker, expected effects)"""
+    expected = {'history_rows': 0, 'history_markers': [], 'approvals': {}, 'rates': {}, 'bids': []}
+    tasks = [[] for _ in range(workers)]
+    counters = {operation: 0 for operation in operations}
+    for i in range(ops_per_worker):
+        for worker in range(workers):
+            operation = operations[(worker + i) % len(operations)]
+            n = counters[operation]
+            counters[operation] += 1
+            marker = f"{STRESS_MARKER}-{worker}-{i}"
+            expected['history_rows'] += HISTORY_ROWS[operation]
+            if operation == 'add_history':
+                args = (fixture.bid_ids[n % len(fixture.bid_ids)], marker, 'Vendor', 'Stress test', marker, None, None)
+                expected['history_markers'].append(marker)
+            elif operation == 'a1_approve':
+                bid_id = fixture.bid_ids[n % len(fixture.bid_ids)]
+                args = (bid_id, marker, marker)
+                expected['approvals'][bid_id] = expected['approvals'].get(bid_id, 0) + 1
+            elif operation == 'submit_bidder_item_bids':
+                # Distinct (bid, bidder) pairs so no submission replaces another
+                bidder_id = fixture.bidder_ids[n % len(fixture.bidder_ids)]
+                bid_id = fixture.bid_ids[(n // len(fixture.bidder_ids)) % len(fixture.bid_ids)]
+                items = fixture.items.get(bid_id, [])
+                # Half-cent rates, which must be stored rounded to whole cents
+                args = (bid_id, bidder_id, {item_id: 100.005 + worker for item_id in items})
+                expected['rates'][(bid_id, bidder_id)] = len(items)
+            else:
+                args = (marker, 'Created by stress_test.py', 1000, STRESS_MARKER, fixture.buyer_id)
+                expected['bids'].append(marker)
+            tasks[worker].append((operation, args))
+    return tasks, expected
+
+
+def run_level(mode, database, tasks):
+    """Run the workers together; returns (wall seconds, calls, failures)"""
+    workers = len(tasks)
+    if mode == 'thread':
+        db.DATABASE_FILE = database
+        db.clear_cache()
+        barrier = threading.Barrier(workers + 1)
+        results = queue.Queue()
+        runners = [threading.Thread(target=run_worker, args=(database, tasks[w], barrier, results, w))
+                   for w in range(workers)]
+    else:
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(workers + 1)
+        results = context.Queue()
+        runners = [context.Process(target=run_worker, args=(database, tasks[w], barrier, results, w))
+                   for w in range(workers)]
+    for runner in runners:
+        runner.start()
+    barrier.wait()
+    started = time.perf_counter()
+    collected = [results.get() for _ in range(workers)]
+    wall_seconds = time.perf_counter() - started
+    for runner in runners:
+        runner.join()
+    calls = sum(count for _, count, _ in collected)
+    failures = [failure for _, _, worker_failures in collected for failure in worker_failures]
+    return wall_seconds, calls, failures
+
+
+def check_invariants(database, fixture, expected):
+    """Open the workbook and count every violation, by kind"""
+    violations = {'corrupt': 0, 'missing_sheets': 0, 'missing_rows': 0, 'duplicate_ids': 0,
+                  'history_rows': 0, 'lost_history': 0, 'lost_approvals': 0, 'lost_rates': 0,
+                  'rate_totals': 0, 'lost_bids': 0}
+    try:
+        workbook = openpyxl.load_workbook(database, read_only=True)
+        sheet_names = workbook.sheetnames
+        workbook.close()
+        sheets = pd.read_excel(database, sheet_name=None)
+    except Exception as e:
+        print(f"Workbook {database} does not open: {type(e).__name__}: {e}")
+        violations['corrupt'] = 1
+        return violations
+
+    violations['missing_sheets'] = len(set(fixture.sheet_names) - set(sheet_names))
+    # A bidder's earlier rates on a bid are meant to be replaced by a new submission
+    replaced = {'BidderItemBids': set().union(*(fixture.rate_ids.get(key, set()) for key in expected['rates']))}
+    for sheet, column in ID_COLUMNS.items():
+        if sheet not in sheets:
+            continue
+        present = sheets[sheet][column].dropna()
+        violations['missing_rows'] += len(fixture.ids[sheet] - replaced.get(sheet, set()) - set(present))
+        violations['duplicate_ids'] += int(present.duplicated().sum())
+
+    history = sheets.get('History', pd.DataFrame(columns=['bid_id', 'action_by', 'role']))
+    violations['history_rows'] = abs(fixture.history_rows + expected['history_rows'] - len(history))
+    violations['lost_history'] = len(set(expected['history_markers']) - set(history['action_by']))
+
+    bids = sheets.get('Bids', pd.DataFrame(columns=['bid_id', 'status', 'contract_name']))
+    status = dict(zip(bids['bid_id'], bids['status']))
+    a1_entries = history[history['role'] == 'A1 Approver'].groupby('bid_id').size()
+    for bid_id, approvals in expected['approvals'].items():
+        added = a1_entries.get(bid_id, 0) - fixture.a1_entries.get(bid_id, 0)
+        if status.get(bid_id) != 'Pending A2' or added < approvals:
+            violations['lost_approvals'] += max(approvals - added, 1)
+
+    rates = sheets.get('BidderItemBids', pd.DataFrame(columns=['bid_id', 'bidder_id']))
+    rate_counts = rates.groupby(['bid_id', 'bidder_id']).size()
+    for key, count in expected['rates'].items():
+        if rate_counts.get(key, 0) < count:
+            violations['lost_rates'] += 1
+
+    # A stored rate times the quantity must be exactly the line total the app shows
+    quantities = sheets.get('BidItems', pd.DataFrame(columns=['item_id', 'quantity']))[['item_id', 'quantity']]
+    lines = rates.merge(quantities.drop_duplicates('item_id'), on='item_id', how='inner').dropna(subset=['unit_rate'])
+    product = money.to_units(lines['unit_rate'].to_numpy(dtype=float) * lines['quantity'].to_numpy(dtype=float),
+                             money.LINE_DECIMALS)
+    violations['rate_totals'] = int((product != money.line_units(lines['unit_rate'], lines['quantity'])).sum())
+
+    violations['lost_bids'] = len(set(expected['bids']) - set(bids['contract_name']))
+    return {kind: int(count) for kind, count in violations.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hammer db_helper writes concurrently and check the workbook afterwards')
+    parser.add_argument('--modes', nargs='+', choices=['thread', 'process'], default=['thread', 'process'],
+                        help='Run workers as threads of one process, as separate processes, or both')
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 2, 4, 8], help='Concurrent workers per run')
+    parser.add_argument('--ops-per-worker', type=int, default=4, help='Operations each worker runs')
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS,
+                        help='Operations the workers cycle through')
+    parser.add_argument('--scale', default='tiny', choices=[s for s in generate_database.SCALES if s != 'production'],
+                        help='Preset for the generated database')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the generated database')
+    parser.add_argument('--keep', help='Keep the workbook of every run in this directory')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='stress_test_')
+    results = []
+    try:
+        print(f"Generating {args.scale} database...", flush=True)
+        pristine = prepare_database(work_dir, args.scale, args.seed)
+        fixture = Fixture(pristine)
+        print(f"\n{'mode':<9}{'workers':>8}{'ops':>6}{'seconds':>10}{'ops/s':>8}{'failed':>8}{'violations':>12}")
+        for mode in args.modes:
+            for level in args.levels:
+                level = max(level, 1)
+                database = os.path.join(work_dir, f"{mode}_{level}.xlsx")
+                shutil.copyfile(pristine, database)
+                tasks, expected = build_plan(fixture, level, max(args.ops_per_worker, 1), args.operations)
+                try:
+                    wall_seconds, calls, failures = run_level(mode, database, tasks)
+                except Exception:
+                    traceback.print_exc()
+                    return 1
+                violations = check_invariants(database, fixture, expected)
+                if args.keep:
+                    os.makedirs(args.keep, exist_ok=True)
+                    shutil.copyfile(database, os.path.join(args.keep, os.path.basename(database)))
+                total = sum(violations.values())
+                results.append({
+                    'mode': mode,
+                    'workers': level,
+                    'operations': calls,
+                    'seconds': round(wall_seconds, 3),
+                    'ops_per_second': round(calls / wall_seconds, 2) if wall_seconds else 0.0,
+                    'failed_calls': len(failures),
+                    'failure_samples': failures[:10],
+                    'violations': total,
+                    'violation_kinds': violations
+                })
+                kinds = ', '.join(f"{kind}={count}" for kind, count in violations.items() if count)
+                print(f"{mode:<9}{level:>8}{calls:>6}{wall_seconds:>10.2f}{calls / wall_seconds:>8.2f}"
+                      f"{len(failures):>8}{total:>12}" + (f"  ({kinds})" if kinds else ''), flush=True)
+    finally:
+        db.DATABASE_FILE = 'database.xlsx'
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        payload = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'scale': args.scale,
+                'seed': args.seed,
+                'ops_per_worker': args.ops_per_worker,
+                'operations': args.operations
+            },
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 1 if any(result['violations'] or result['failed_calls'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
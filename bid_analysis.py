@@ -0,0 +1,906 @@
+"""
+Item-level analysis of bidder rates
+
+Works on the bidders x items rate matrix from db_helper.build_rate_matrix as a
+NumPy array (NaN where a bidder did not quote an item):
+  - the three lowest rates per item (L1/L2/L3)
+  - the split award that gives every item to its cheapest bidder
+  - the saving of that split over the best single bidder who quoted every item
+  - the cheapest award under procurement rules (a cap on the number of suppliers
+    and/or a minimum number of lots per supplier), see optimize_award
+  - quotes far outside the rates other bids received for the same item (PriceIndex sheet)
+  - pricing anomalies within a bid: per-item robust z-scores, bidders quoting
+    identical rates and bidders whose price patterns are highly correlated
+
+Results are cached for the most recently viewed bids and reused until the
+workbook changes (db_helper.data_version).
+"""
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import db_helper as db
+import money
+
+LEVELS = 3
+
+# Constrained awards are solved exactly by enumerating supplier sets while
+# (supplier sets x items) stays below this; larger tenders use local search.
+# With a minimum-lots rule each set may need an O(items^3) assignment solve, so
+# (supplier sets x items^3) must also stay below EXACT_ASSIGN_WORK_LIMIT.
+EXACT_WORK_LIMIT = 2000000
+EXACT_ASSIGN_WORK_LIMIT = 50000000
+DEFAULT_TIME_BUDGET = 2.0
+# Swap candidates per removed supplier that are fully evaluated in local search
+SWAP_CANDIDATES = 3
+
+# A quote is flagged when it lies more than PRICE_OUTLIER_IQR interquartile
+# ranges outside the historical p25-p75 band (and at least PRICE_OUTLIER_MIN_SPREAD
+# of the median away), for items with at least PRICE_OUTLIER_MIN_SAMPLES rates
+PRICE_OUTLIER_IQR = 1.5
+PRICE_OUTLIER_MIN_SPREAD = 0.1
+PRICE_OUTLIER_MIN_SAMPLES = 5
+
+# Anomaly thresholds: robust z-score (median/MAD based) of a quote within its
+# item, bidder pairs quoting the same rate on at least this share of the items
+# both priced, and correlation of bidders' relative price patterns
+ANOMALY_Z_THRESHOLD = 3.5
+ANOMALY_MIN_QUOTES = 3
+IDENTICAL_MIN_ITEMS = 3
+IDENTICAL_MIN_SHARE = 0.5
+CORRELATION_THRESHOLD = 0.9
+CORRELATION_MIN_ITEMS = 5
+# Longest lists of anomalies passed to the views
+ANOMALY_MAX_ROWS = 25
+
+# Bids whose results each cache keeps, least recently viewed dropped first
+ANALYSIS_CACHE_SIZE = int(os.environ.get('BID_ANALYSIS_CACHE_SIZE', 256))
+
+_award_cache = OrderedDict()
+_anomaly_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_results():
+    """The cached award and anomaly results by bid_id, for memory diagnostics"""
+    with _cache_lock:
+        return {'award': dict(_award_cache), 'anomalies': dict(_anomaly_cache)}
+
+
+def _cache_get(cache, bid_id, version):
+    """A bid's cached result if it was computed at this data version, else None"""
+    with _cache_lock:
+        entry = cache.get(bid_id)
+        if entry is None or entry[0] != version:
+            return None
+        cache.move_to_end(bid_id)
+        return entry[1]
+
+
+def _cache_put(cache, bid_id, version, result):
+    with _cache_lock:
+        cache[bid_id] = (version, result)
+        cache.move_to_end(bid_id)
+        while len(cache) > ANALYSIS_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def rank_item_rates(rates, depth=LEVELS):
+    """
+    Lowest `depth` quotes per item of a bidders x items array (NaN = not quoted)
+    Returns (positions, ranked), both shaped depth x items: positions are bidder
+    row numbers (-1 where an item has fewer quotes) and ranked the matching rates.
+    Ties go to the bidder that comes first in the matrix.
+    """
+    rates = np.asarray(rates, dtype=float)
+    bidders, items = rates.shape
+    positions = np.full((depth, items), -1, dtype=int)
+    ranked = np.full((depth, items), np.nan)
+    if bidders == 0 or items == 0:
+        return positions, ranked
+
+    levels = min(depth, bidders)
+    order = np.argsort(np.where(np.isnan(rates), np.inf, rates), axis=0, kind='stable')[:levels]
+    ranked[:levels] = np.take_along_axis(rates, order, axis=0)
+    positions[:levels] = np.where(np.isnan(ranked[:levels]), -1, order)
+    return positions, ranked
+
+
+def analyze_rates(rates, quantities, depth=LEVELS):
+    """
+    Split-award analysis of a bidders x items rate array and per-item quantities
+    Returns a dict of NumPy results indexed by matrix position; see get_item_award
+    for the labelled version.
+    """
+    rates = np.asarray(rates, dtype=float)
+    quantities = np.asarray(quantities, dtype=float)
+    positions, ranked = rank_item_rates(rates, depth)
+
+    # Totals are summed exactly as integer units (see money.py)
+    lines = money.line_units(rates, quantities)
+    awarded = positions[0]
+    covered = awarded >= 0
+    award_units = np.where(covered, lines[np.maximum(awarded, 0), np.arange(rates.shape[1])], 0)
+    split_total = float(money.from_units(award_units.sum(), money.LINE_DECIMALS))
+    bidder_count = rates.shape[0]
+    split_units = np.zeros(bidder_count, dtype=lines.dtype)
+    np.add.at(split_units, awarded[covered], award_units[covered])
+    split_amounts = money.from_units(split_units, money.LINE_DECIMALS)
+    split_items = np.bincount(awarded[covered], minlength=bidder_count)
+
+    # A single-bidder award is only possible for bidders who quoted every item
+    complete = ~np.isnan(rates).any(axis=1) if rates.size else np.zeros(bidder_count, dtype=bool)
+    single_totals = money.from_units(lines.sum(axis=1), money.LINE_DECIMALS)
+    best_single = None
+    if complete.any():
+        best_single = int(np.flatnonzero(complete)[np.argmin(single_totals[complete])])
+
+    return {
+        'positions': positions,
+        'ranked': ranked,
+        'quantities': quantities,
+        'covered': covered,
+        'split_total': split_total,
+        'split_amounts': split_amounts,
+        'split_items': split_items,
+        'single_totals': single_totals,
+        'complete': complete,
+        'best_single': best_single
+    }
+
+
+def _label_award(analysis, rates, items, bidder_names):
+    """Turn positional results into records for templates and the PDF"""
+    bidder_ids = list(rates.index)
+    positions = analysis['positions']
+    ranked = analysis['ranked']
+    quantities = analysis['quantities']
+
+    item_levels = []
+    for column, item in enumerate(items[['item_id', 'item_name', 'quantity', 'unit']].to_dict('records')):
+        levels = []
+        for level in range(positions.shape[0]):
+            position = positions[level, column]
+            if position < 0:
+                break
+            bidder_id = bidder_ids[position]
+            levels.append({
+                'level': f"L{level + 1}",
+                'bidder_id': bidder_id,
+                'bidder_name': bidder_names.get(bidder_id, bidder_id),
+                'unit_rate': float(ranked[level, column]),
+                'total': float(money.line_amounts(ranked[level, column], quantities[column]))
+            })
+        item_levels.append(dict(item, levels=levels))
+
+    split = [
+        {
+            'bidder_id': bidder_id,
+            'bidder_name': bidder_names.get(bidder_id, bidder_id),
+            'items': int(analysis['split_items'][position]),
+            'amount': float(analysis['split_amounts'][position])
+        }
+        for position, bidder_id in enumerate(bidder_ids)
+        if analysis['split_items'][position] > 0
+    ]
+    split.sort(key=lambda row: -row['amount'])
+
+    best = analysis['best_single']
+    best_single_total = float(analysis['single_totals'][best]) if best is not None else None
+    savings = money.difference(best_single_total, analysis['split_total']) if best is not None else None
+    return {
+        'item_levels': item_levels,
+        'split_total': analysis['split_total'],
+        'split_award': split,
+        'uncovered_items': int((~analysis['covered']).sum()),
+        'best_single_bidder': bidder_ids[best] if best is not None else None,
+        'best_single_name': bidder_names.get(bidder_ids[best], bidder_ids[best]) if best is not None else None,
+        'best_single_total': best_single_total,
+        'savings': savings,
+        'savings_pct': (savings / best_single_total * 100) if savings is not None and best_single_total else None
+    }
+
+
+def get_item_award(bid_id, bundle=None):
+    """
+    L1/L2/L3 per item, split award and savings for a bid, or None without quotes
+    Pass a bundle from db.get_bid_bundle to reuse its matrix; otherwise only the
+    bid's rows are read. Cached until the workbook changes.
+    """
+    # Taken before any data is read, so a concurrent write can only make the entry miss
+    version = bundle['version'] if bundle is not None else db.data_version()
+    cached = _cache_get(_award_cache, bid_id, version)
+    if cached is not None:
+        return cached
+
+    if bundle is not None:
+        rates, items = bundle['rates'], bundle['items']
+    else:
+        items = db.select_rows('BidItems', 'bid_id', [bid_id])
+        rates = db.build_rate_matrix(db.select_rows('BidderItemBids', 'bid_id', [bid_id]), items) \
+            if not items.empty else pd.DataFrame()
+    if rates.empty or items.empty:
+        return None
+
+    bidders_df = db.read_sheet('Bidders')
+    bidder_names = dict(zip(bidders_df['bidder_id'], bidders_df['bidder_name'])) if not bidders_df.empty else {}
+    analysis = analyze_rates(rates.to_numpy(dtype=float), items['quantity'].astype(float).to_numpy())
+    award = _label_award(analysis, rates, items, bidder_names)
+
+    _cache_put(_award_cache, bid_id, version, award)
+    return award
+
+
+def flag_price_outliers(rates, reference):
+    """
+    Compare a bidders x items rate array with per-item reference percentiles of other bids
+    reference: DataFrame aligned to the items with sample_count, p25, p50, p75.
+    Returns a bidders x items array of -1 (unusually low), 1 (high) or 0.
+    """
+    rates = np.asarray(rates, dtype=float)
+    p25 = reference['p25'].to_numpy(dtype=float)
+    p50 = reference['p50'].to_numpy(dtype=float)
+    p75 = reference['p75'].to_numpy(dtype=float)
+    spread = np.maximum((p75 - p25) * PRICE_OUTLIER_IQR, np.abs(p50) * PRICE_OUTLIER_MIN_SPREAD)
+    known = reference['sample_count'].fillna(0).to_numpy() >= PRICE_OUTLIER_MIN_SAMPLES
+
+    with np.errstate(invalid='ignore'):
+        high = known & (rates > p75 + spread)
+        low = known & (rates < p25 - spread)
+    return high.astype(int) - low.astype(int)
+
+
+def get_price_flags(bid_id, bundle=None):
+    """
+    Outlier quotes of a bid against the rates other bids received for the same items
+    Returns {(bidder_id, item_id): {'flag': 'high'|'low', 'p10', 'p50', 'p90',
+    'sample_count'}} for flagged quotes only.
+    """
+    if bundle is not None:
+        rates, items = bundle['rates'], bundle['items']
+    else:
+        items = db.select_rows('BidItems', 'bid_id', [bid_id])
+        rates = db.build_rate_matrix(db.select_rows('BidderItemBids', 'bid_id', [bid_id]), items)
+    if rates.empty or items.empty:
+        return {}
+
+    reference = db.get_price_reference(items)
+    flags = flag_price_outliers(rates.to_numpy(dtype=float), reference)
+    bidder_ids = list(rates.index)
+    item_ids = list(items['item_id'])
+    stats = reference[['p10', 'p50', 'p90', 'sample_count']].to_dict('records')
+
+    flagged = {}
+    for row, column in zip(*np.nonzero(flags)):
+        flagged[(bidder_ids[row], item_ids[column])] = dict(
+            stats[column], flag='high' if flags[row, column] > 0 else 'low',
+            sample_count=int(stats[column]['sample_count']))
+    return flagged
+
+
+def _hungarian(cost, deadline=None):
+    """
+    Minimum-cost assignment of a square cost matrix (rows to columns)
+    Returns the column assigned to each row, or None when the deadline passes
+    first (the solve is O(n^3) in Python loops). Shortest augmenting path version
+    of the Hungarian algorithm with the inner loops over columns done in NumPy.
+    """
+    n = cost.shape[0]
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    p = np.zeros(n + 1, dtype=int)
+    way = np.zeros(n + 1, dtype=int)
+    for row in range(1, n + 1):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        p[0] = row
+        j0 = 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    columns = np.empty(n, dtype=int)
+    columns[p[1:] - 1] = np.arange(n)
+    return columns
+
+
+def _assign_exact(cost, members, min_lots, deadline=None):
+    """
+    Cheapest assignment of items to a fixed supplier set where every supplier
+    gets at least min_lots items. Returns (total, picks) with picks indexing
+    into members, (inf, None) when the set cannot satisfy the rule, or None when
+    the deadline passes before the assignment is solved.
+    """
+    sub = cost[members]
+    items = sub.shape[1]
+    spare = items - len(members) * min_lots
+    if spare < 0:
+        return np.inf, None
+
+    # min_lots mandatory columns per supplier, plus spare columns any supplier can fill
+    big = np.nanmax(np.where(np.isfinite(sub), sub, np.nan)) * items + 1
+    finite = np.where(np.isfinite(sub), sub, big)
+    best = finite.min(axis=0)
+    matrix = np.hstack([np.repeat(finite, min_lots, axis=0).T, np.repeat(best[:, None], spare, axis=1)])
+    column_owner = np.concatenate([np.repeat(np.arange(len(members)), min_lots),
+                                   np.full(spare, -1)])
+
+    columns = _hungarian(matrix, deadline)
+    if columns is None:
+        return None
+    picks = column_owner[columns]
+    spare_rows = picks < 0
+    picks[spare_rows] = finite[:, spare_rows].argmin(axis=0)
+    amounts = sub[picks, np.arange(items)]
+    if not np.isfinite(amounts).all():
+        return np.inf, None
+    return float(amounts.sum()), picks
+
+
+def _assign(cost, members, min_lots=None):
+    """
+    Assign each item to its cheapest supplier in `members`, then top up any
+    supplier below min_lots with the items it is cheapest to move to it.
+    Returns (total, picks) with picks indexing into members, or (inf, None).
+    """
+    sub = cost[members]
+    items = sub.shape[1]
+    columns = np.arange(items)
+    picks = sub.argmin(axis=0)
+    best = sub[picks, columns]
+    if not np.isfinite(best).all():
+        return np.inf, None
+    if not min_lots:
+        return float(best.sum()), picks
+
+    counts = np.bincount(picks, minlength=len(members))
+    for supplier in np.flatnonzero(counts < min_lots):
+        delta = sub[supplier] - best
+        for item in np.argsort(delta, kind='stable'):
+            if counts[supplier] >= min_lots or not np.isfinite(delta[item]):
+                break
+            donor = picks[item]
+            if donor == supplier or counts[donor] <= min_lots:
+                continue
+            picks[item] = supplier
+            best[item] = sub[supplier, item]
+            counts[donor] -= 1
+            counts[supplier] += 1
+        if counts[supplier] < min_lots:
+            return np.inf, None
+    return float(best.sum()), picks
+
+
+def _greedy_suppliers(cost, max_suppliers, first=None):
+    """
+    Pick suppliers one at a time, each time the one that lowers the total most
+    (items nobody picked yet count at a penalty rate), optionally starting from
+    a given first supplier.
+    """
+    bidders, items = cost.shape
+    penalty = np.nanmax(np.where(np.isfinite(cost), cost, np.nan)) * 10 + 1
+    padded = np.where(np.isfinite(cost), cost, penalty)
+    current = np.full(items, penalty * 2)
+    members = []
+    available = np.ones(bidders, dtype=bool)
+    if first is not None:
+        members.append(int(first))
+        available[first] = False
+        current = np.minimum(current, padded[first])
+    while len(members) < max_suppliers and available.any():
+        totals = np.minimum(padded, current).sum(axis=1)
+        totals[~available] = np.inf
+        choice = int(np.argmin(totals))
+        if members and totals[choice] >= current.sum():
+            break
+        members.append(choice)
+        available[choice] = False
+        current = np.minimum(current, padded[choice])
+    return sorted(members)
+
+
+def _local_search(cost, members, max_suppliers, min_lots, deadline):
+    """
+    Improve a supplier set with drop, add and swap moves until no move helps or
+    the deadline passes. Moves are screened with the unconstrained cost, a lower
+    bound of the constrained one, so only promising sets are fully evaluated.
+    """
+    bidders = cost.shape[0]
+    total, picks = _assign(cost, members, min_lots)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        sub = cost[members]
+        order = np.argsort(sub, axis=0)
+        first = np.take_along_axis(sub, order[:1], axis=0)[0]
+        second = np.take_along_axis(sub, order[1:2], axis=0)[0] if len(members) > 1 else np.full_like(first, np.inf)
+        outside = np.setdiff1d(np.arange(bidders), members)
+
+        moves = []
+        for position, supplier in enumerate(members):
+            removed = np.where(order[0] == position, second, first)
+            rest = [m for m in members if m != supplier]
+            if rest:
+                moves.append((removed.sum(), rest))
+            if outside.size:
+                scores = np.minimum(cost[outside], removed).sum(axis=1)
+                for best in np.argsort(scores)[:SWAP_CANDIDATES]:
+                    moves.append((scores[best], sorted(rest + [int(outside[best])])))
+        if len(members) < max_suppliers and outside.size:
+            scores = np.minimum(cost[outside], first).sum(axis=1)
+            for best in np.argsort(scores)[:SWAP_CANDIDATES]:
+                moves.append((scores[best], sorted(members + [int(outside[best])])))
+
+        moves.sort(key=lambda move: move[0])
+        for bound, candidate in moves:
+            if bound >= total or time.perf_counter() >= deadline:
+                break
+            candidate_total, candidate_picks = _assign(cost, candidate, min_lots)
+            if candidate_total < total:
+                members, total, picks = candidate, candidate_total, candidate_picks
+                improved = True
+                break
+    return members, total, picks
+
+
+def _exact_search(cost, max_suppliers, min_lots, deadline, members, total, picks):
+    """
+    Enumerate supplier sets in order of their unconstrained cost, solving each
+    with the min-lots rule exactly, until the lower bound passes the best total.
+    Starts from an incumbent solution. Returns (members, total, picks, complete).
+    """
+    bidders = cost.shape[0]
+    eligible = np.flatnonzero(np.isfinite(cost).sum(axis=1) >= (min_lots or 1))
+    candidates = []
+    for size in range(1, min(max_suppliers, len(eligible)) + 1):
+        if min_lots and size * min_lots > cost.shape[1]:
+            break
+        for chunk in _chunks(itertools.combinations(eligible, size), 4096):
+            sets = np.array(chunk)
+            bounds = cost[sets].min(axis=1).sum(axis=1)
+            keep = bounds < total
+            candidates.extend(zip(bounds[keep], map(tuple, sets[keep])))
+            if time.perf_counter() >= deadline:
+                return members, total, picks, False
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    for bound, candidate in candidates:
+        if bound >= total:
+            break
+        if time.perf_counter() >= deadline:
+            return members, total, picks, False
+        candidate = list(candidate)
+        candidate_total, candidate_picks = _assign(cost, candidate, None)
+        if candidate_picks is None:
+            continue
+        if min_lots and np.bincount(candidate_picks, minlength=len(candidate)).min() < min_lots:
+            solved = _assign_exact(cost, candidate, min_lots, deadline)
+            if solved is None:
+                return members, total, picks, False
+            candidate_total, candidate_picks = solved
+        if candidate_total < total:
+            members, total, picks = candidate, candidate_total, candidate_picks
+    return members, total, picks, True
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _set_count(bidders, max_suppliers):
+    return sum(math.comb(bidders, size) for size in range(1, min(max_suppliers, bidders) + 1))
+
+
+def optimize_award(rates, quantities, max_suppliers=None, min_lots=None, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Cheapest award of a bidders x items rate array under procurement rules
+    max_suppliers caps how many bidders win lots; min_lots is the minimum number
+    of items each winning bidder must receive. Items nobody quoted are left out.
+    Small tenders are solved exactly; larger ones, or exact searches that run out
+    of time_budget seconds (checked inside each assignment solve too), return the
+    best award found by local search with optimal=False.
+
+    Returns a dict with assignment (bidder row per item, -1 if uncovered), total,
+    suppliers (bidder rows), feasible, optimal, method and elapsed seconds.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    rates = np.asarray(rates, dtype=float)
+    quantities = np.asarray(quantities, dtype=float)
+    bidders, items = rates.shape
+    cost = np.where(np.isnan(rates), np.inf, rates * quantities)
+    covered = np.isfinite(cost).any(axis=0) if bidders else np.zeros(items, dtype=bool)
+    cost = cost[:, covered]
+    max_suppliers = min(max_suppliers or bidders, bidders)
+    min_lots = min_lots if min_lots and min_lots > 1 else None
+
+    def result(members, total, picks, optimal, method):
+        assignment = np.full(items, -1, dtype=int)
+        if picks is not None:
+            assignment[covered] = np.asarray(members)[picks]
+        feasible = bool(np.isfinite(total))
+        return {
+            'assignment': assignment,
+            'total': float(total) if feasible else None,
+            'suppliers': sorted(int(s) for s in np.unique(assignment[assignment >= 0])),
+            'feasible': feasible,
+            'optimal': optimal and feasible,
+            'method': method,
+            'elapsed': time.perf_counter() - start
+        }
+
+    if bidders == 0 or not covered.any():
+        return result([], np.inf, None, False, 'none')
+
+    # Without rules beyond the cap, the cherry-picked split award is optimal when it fits
+    winners = sorted(np.unique(cost.argmin(axis=0)).tolist())
+    if not min_lots and len(winners) <= max_suppliers:
+        total, picks = _assign(cost, winners)
+        return result(winners, total, picks, True, 'split')
+
+    # Local search from the split award (or a greedy set when it has too many
+    # suppliers), then from greedy sets seeded with each of the cheapest single
+    # bidders in turn while time remains. Small tenders only need one start as
+    # the exact search follows.
+    sets = _set_count(bidders, max_suppliers)
+    exact = sets * cost.shape[1] <= EXACT_WORK_LIMIT and \
+        (not min_lots or sets * cost.shape[1] ** 3 <= EXACT_ASSIGN_WORK_LIMIT)
+    starts = [winners if len(winners) <= max_suppliers else _greedy_suppliers(cost, max_suppliers)]
+    if not exact:
+        penalty = np.nanmax(np.where(np.isfinite(cost), cost, np.nan)) * 10 + 1
+        singles = np.where(np.isfinite(cost), cost, penalty).sum(axis=1)
+        starts = itertools.chain(starts, (_greedy_suppliers(cost, max_suppliers, first)
+                                          for first in np.argsort(singles, kind='stable')))
+
+    members, total, picks = [], np.inf, None
+    seen = set()
+    for start_members in starts:
+        if time.perf_counter() >= deadline and picks is not None:
+            break
+        if tuple(start_members) in seen:
+            continue
+        seen.add(tuple(start_members))
+        found = _local_search(cost, start_members, max_suppliers, min_lots, deadline)
+        if found[1] < total or picks is None:
+            members, total, picks = found
+    if not exact:
+        return result(members, total, picks, False, 'heuristic')
+
+    members, total, picks, complete = _exact_search(cost, max_suppliers, min_lots, deadline,
+                                                    members, total, picks)
+    return result(members, total, picks, complete, 'exact' if complete else 'heuristic')
+
+
+def get_constrained_award(bid_id, max_suppliers=None, min_lots=None, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Cheapest award for a bid under a supplier cap and/or minimum lots per
+    supplier, labelled with bidder and item names, or None without quotes
+    """
+    items = db.select_rows('BidItems', 'bid_id', [bid_id])
+    if items.empty:
+        return None
+    rates = db.build_rate_matrix(db.select_rows('BidderItemBids', 'bid_id', [bid_id]), items)
+    if rates.empty:
+        return None
+
+    rate_values = rates.to_numpy(dtype=float)
+    quantities = items['quantity'].astype(float).to_numpy()
+    found = optimize_award(rate_values, quantities, max_suppliers, min_lots, time_budget)
+    split_total = analyze_rates(rate_values, quantities)['split_total']
+
+    bidders_df = db.read_sheet('Bidders')
+    bidder_names = dict(zip(bidders_df['bidder_id'], bidders_df['bidder_name'])) if not bidders_df.empty else {}
+    bidder_ids = list(rates.index)
+    assignment = found['assignment']
+    # The optimizer works in floats; report exact totals from integer units
+    amount_units = np.where(assignment >= 0, money.line_units(
+        rate_values[np.maximum(assignment, 0), np.arange(len(items))], quantities), 0)
+    amounts = money.from_units(amount_units, money.LINE_DECIMALS)
+    total = float(money.from_units(amount_units.sum(), money.LINE_DECIMALS)) if found['feasible'] else None
+
+    awarded_items = []
+    for column, item in enumerate(items[['item_id', 'item_name']].to_dict('records')):
+        position = assignment[column]
+        bidder_id = bidder_ids[position] if position >= 0 else None
+        awarded_items.append(dict(item, bidder_id=bidder_id,
+                                  bidder_name=bidder_names.get(bidder_id, bidder_id) if bidder_id else None,
+                                  amount=float(amounts[column]) if bidder_id else None))
+
+    suppliers = [
+        {
+            'bidder_id': bidder_ids[position],
+            'bidder_name': bidder_names.get(bidder_ids[position], bidder_ids[position]),
+            'items': int((assignment == position).sum()),
+            'amount': float(money.from_units(amount_units[assignment == position].sum(), money.LINE_DECIMALS))
+        }
+        for position in found['suppliers']
+    ]
+    suppliers.sort(key=lambda row: -row['amount'])
+
+    return {
+        'max_suppliers': max_suppliers,
+        'min_lots': min_lots,
+        'feasible': found['feasible'],
+        'optimal': found['optimal'],
+        'method': found['method'],
+        'elapsed': found['elapsed'],
+        'total': total,
+        'split_total': split_total,
+        'premium': money.difference(total, split_total) if found['feasible'] else None,
+        'suppliers': suppliers,
+        'items': awarded_items,
+        'uncovered_items': int((assignment < 0).sum())
+    }
+
+
+def _column_medians(values):
+    """
+    NaN-ignoring median of each column, from one float64 sort of the transposed
+    array (NaN sorts last); faster than np.nanmedian on bidders x items arrays.
+    Sorting in float32 would round rates above ~100000 to a few cents, e.g.
+    [100000.01] * 3 + [100000.02] must give 100000.01, not 100000.0078.
+    """
+    ordered = np.sort(np.ascontiguousarray(values.T, dtype=float), axis=1)
+    counts = (~np.isnan(values)).sum(axis=0)
+    low = np.maximum((counts - 1) // 2, 0)[:, None]
+    high = np.maximum(counts // 2, 0)[:, None]
+    medians = (np.take_along_axis(ordered, low, axis=1)[:, 0] + np.take_along_axis(ordered, high, axis=1)[:, 0]) / 2
+    return np.where(counts > 0, medians, np.nan)
+
+
+def item_zscores(rates, medians=None):
+    """
+    Robust z-score of every quote against the other quotes for the same item
+    Uses the median and MAD (scaled to match a standard deviation), falling back
+    to the mean absolute deviation when most quotes are equal. Items with fewer
+    than ANOMALY_MIN_QUOTES quotes, and unquoted cells, get NaN.
+    """
+    rates = np.asarray(rates, dtype=float)
+    quoted = ~np.isnan(rates)
+    counts = quoted.sum(axis=0)
+    usable = counts >= ANOMALY_MIN_QUOTES
+    zscores = np.full(rates.shape, np.nan)
+    if not usable.any():
+        return zscores
+
+    sub = rates[:, usable]
+    median = (medians if medians is not None else _column_medians(rates))[usable]
+    deviation = np.abs(sub - median)
+    scale = _column_medians(deviation) * 1.4826
+    tied = ~(scale > 0)
+    if tied.any():
+        scale[tied] = np.nanmean(deviation[:, tied], axis=0) * 1.2533
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscores[:, usable] = np.where(scale > 0, (sub - median) / scale, 0.0)
+    zscores[~quoted] = np.nan
+    return zscores
+
+
+def identical_rate_pairs(rates):
+    """
+    Count, for every pair of bidders, the items on which they quoted the same
+    rate to the cent. Returns (shared, identical_items): a bidders x bidders
+    array and the number of items where at least two bidders quoted the same rate.
+    """
+    rates = np.asarray(rates, dtype=float)
+    bidders, items = rates.shape
+
+    # Sort each item's quotes by cents, with the bidder row packed into the low
+    # bits of the key so a plain sort (no argsort) keeps track of who quoted what
+    shift = max(int(bidders - 1).bit_length(), 1)
+    unquoted = np.iinfo(np.int64).max
+    keys = np.where(np.isnan(rates), unquoted,
+                    (np.round(np.nan_to_num(rates) * 100).astype(np.int64) << shift) + np.arange(bidders)[:, None])
+    ordered = np.sort(keys.T, axis=1)
+    row_mask = (1 << shift) - 1
+
+    # linked[:, j] is True when sorted quotes j and j+d of an item are equal;
+    # start with neighbours (d=1) and extend one step per pass
+    cents = ordered >> shift
+    linked = (cents[:, 1:] == cents[:, :-1]) & (ordered[:, 1:] != unquoted)
+    identical_items = int(linked.any(axis=1).sum())
+    neighbours = linked
+    pair_cells = []
+    distance = 1
+    while linked.any():
+        item_rows, positions = np.nonzero(linked)
+        first = ordered[item_rows, positions] & row_mask
+        second = ordered[item_rows, positions + distance] & row_mask
+        pair_cells.append(np.minimum(first, second) * bidders + np.maximum(first, second))
+        linked = linked[:, :-1] & neighbours[:, distance:]
+        distance += 1
+    cells = np.concatenate(pair_cells) if pair_cells else np.zeros(0, dtype=np.int64)
+    shared = np.bincount(cells, minlength=bidders * bidders).reshape(bidders, bidders).astype(np.float32)
+    return shared + shared.T, identical_items
+
+
+def pattern_correlation(rates, medians=None):
+    """
+    Correlation between bidders of their relative prices: each quote's log ratio
+    to the item median, centred on the bidder's own average so an overall cheap
+    or expensive bidder is not a match. Items a bidder did not quote count as
+    no deviation. Returns a bidders x bidders array.
+    """
+    rates = np.asarray(rates, dtype=float)
+    medians = medians if medians is not None else _column_medians(rates)
+    # float32 throughout: a correlation needs nowhere near float64 precision
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = np.log(np.where(rates > 0, rates, np.nan).astype(np.float32)
+                        / np.where(medians > 0, medians, np.nan).astype(np.float32))
+    quoted = ~np.isnan(ratios)
+    ratios[~quoted] = 0.0
+    counts = quoted.sum(axis=1, keepdims=True)
+    level = ratios.sum(axis=1, keepdims=True) / np.maximum(counts, 1)
+    centred = np.where(quoted, ratios - level, np.float32(0.0))
+
+    products = centred @ centred.T
+    norms = np.sqrt(np.diag(products))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = products / np.outer(norms, norms)
+    return np.nan_to_num(correlation)
+
+
+def detect_anomalies(rates):
+    """
+    Anomaly analysis of a bidders x items rate array, by matrix position
+    Returns zscores, identical pair counts and pattern correlations; see
+    get_bid_anomalies for the labelled version. Items both bidders quoted
+    ('common') are counted only for pairs that could be reported.
+    """
+    rates = np.asarray(rates, dtype=float)
+    medians = _column_medians(rates)
+    zscores = item_zscores(rates, medians)
+    shared, identical_items = identical_rate_pairs(rates)
+    correlation = pattern_correlation(rates, medians)
+
+    # Usually a handful of pairs, far cheaper than a second bidders x bidders product
+    quoted = ~np.isnan(rates)
+    first, second = _upper_pairs((shared >= IDENTICAL_MIN_ITEMS) | (correlation >= CORRELATION_THRESHOLD))
+    if len(first) <= len(rates):
+        common = np.zeros(shared.shape, dtype=np.float32)
+        common[first, second] = common[second, first] = (quoted[first] & quoted[second]).sum(axis=1)
+    else:
+        mask = quoted.astype(np.float32)
+        common = mask @ mask.T
+    return {
+        'zscores': zscores,
+        'shared': shared,
+        'common': common,
+        'identical_items': identical_items,
+        'correlation': correlation
+    }
+
+
+def _upper_pairs(condition):
+    """(i, j) bidder pairs with i < j where condition holds"""
+    first, second = np.nonzero(np.triu(condition, k=1))
+    return first, second
+
+
+def _label_anomalies(found, rates, items, bidder_names):
+    """Turn positional anomaly results into records for the approver views"""
+    bidder_ids = list(rates.index)
+    name = lambda position: bidder_names.get(bidder_ids[position], bidder_ids[position])
+    item_records = items[['item_id', 'item_name']].to_dict('records')
+    values = rates.to_numpy(dtype=float)
+
+    zscores = found['zscores']
+    with np.errstate(invalid='ignore'):
+        extreme = np.abs(np.nan_to_num(zscores)) >= ANOMALY_Z_THRESHOLD
+    rows, columns = np.nonzero(extreme)
+    order = np.argsort(-np.abs(zscores[rows, columns]), kind='stable')
+    outliers = [
+        {
+            'bidder_id': bidder_ids[row],
+            'bidder_name': name(row),
+            'item_id': item_records[column]['item_id'],
+            'item_name': item_records[column]['item_name'],
+            'unit_rate': float(values[row, column]),
+            'zscore': float(zscores[row, column]),
+            'direction': 'high' if zscores[row, column] > 0 else 'low'
+        }
+        for row, column in zip(rows[order][:ANOMALY_MAX_ROWS], columns[order][:ANOMALY_MAX_ROWS])
+    ]
+    high = (extreme & (np.nan_to_num(zscores) > 0)).sum(axis=1)
+    low = extreme.sum(axis=1) - high
+    bidder_outliers = [
+        {'bidder_id': bidder_ids[row], 'bidder_name': name(row), 'high': int(high[row]), 'low': int(low[row])}
+        for row in np.argsort(-(high + low), kind='stable') if high[row] + low[row]
+    ][:ANOMALY_MAX_ROWS]
+
+    shared, common = found['shared'], found['common']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(common > 0, shared / common, 0.0)
+    first, second = _upper_pairs((shared >= IDENTICAL_MIN_ITEMS) & (share >= IDENTICAL_MIN_SHARE))
+    order = np.argsort(-share[first, second], kind='stable')[:ANOMALY_MAX_ROWS]
+    identical_pairs = [
+        {
+            'bidders': [name(first[k]), name(second[k])],
+            'bidder_ids': [bidder_ids[first[k]], bidder_ids[second[k]]],
+            'identical_items': int(shared[first[k], second[k]]),
+            'common_items': int(common[first[k], second[k]]),
+            'share': float(share[first[k], second[k]])
+        }
+        for k in order
+    ]
+
+    correlation = found['correlation']
+    first, second = _upper_pairs((correlation >= CORRELATION_THRESHOLD) & (common >= CORRELATION_MIN_ITEMS))
+    order = np.argsort(-correlation[first, second], kind='stable')[:ANOMALY_MAX_ROWS]
+    correlated_pairs = [
+        {
+            'bidders': [name(first[k]), name(second[k])],
+            'bidder_ids': [bidder_ids[first[k]], bidder_ids[second[k]]],
+            'correlation': float(min(correlation[first[k], second[k]], 1.0)),
+            'common_items': int(common[first[k], second[k]])
+        }
+        for k in order
+    ]
+
+    return {
+        'outlier_count': int(extreme.sum()),
+        'outliers': outliers,
+        'bidder_outliers': bidder_outliers,
+        'identical_items': found['identical_items'],
+        'identical_pairs': identical_pairs,
+        'correlated_pairs': correlated_pairs,
+        'has_anomalies': bool(extreme.any() or identical_pairs or correlated_pairs)
+    }
+
+
+def get_bid_anomalies(bid_id, bundle=None):
+    """
+    Outlier quotes, identical-rate bidder pairs and correlated bidders for a bid,
+    or None without quotes. Cached until the workbook changes.
+    """
+    version = bundle['version'] if bundle is not None else db.data_version()
+    cached = _cache_get(_anomaly_cache, bid_id, version)
+    if cached is not None:
+        return cached
+
+    if bundle is not None:
+        rates, items = bundle['rates'], bundle['items']
+    else:
+        items = db.select_rows('BidItems', 'bid_id', [bid_id])
+        rates = db.build_rate_matrix(db.select_rows('BidderItemBids', 'bid_id', [bid_id]), items) \
+            if not items.empty else pd.DataFrame()
+    if rates.empty or items.empty:
+        return None
+
+    bidders_df = db.read_sheet('Bidders')
+    bidder_names = dict(zip(bidders_df['bidder_id'], bidders_df['bidder_name'])) if not bidders_df.empty else {}
+    anomalies = _label_anomalies(detect_anomalies(rates.to_numpy(dtype=float)), rates, items, bidder_names)
+
+    _cache_put(_anomaly_cache, bid_id, version, anomalies)
+    return anomalies
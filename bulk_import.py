@@ -0,0 +1,318 @@
+"""
+Parsing and validation of uploaded CSV/XLSX spreadsheets
+
+Uploads are read into a DataFrame in one go and validated column-wise, so a file
+with thousands of rows is checked with a handful of vectorised operations. Each
+validator returns the accepted rows plus a list of (line number, message) errors,
+where line numbers match what the user sees in the spreadsheet (header = line 1).
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import db_helper as db
+import money
+
+UPLOAD_EXTENSIONS = {'.csv', '.xlsx', '.xls'}
+
+ITEM_COLUMNS = ['item_name', 'item_description', 'quantity', 'unit']
+
+RATE_SHEET_COLUMNS = ['item_id', 'item_name', 'quantity', 'unit', 'unit_rate']
+
+BID_COLUMNS = ['ref', 'contract_name', 'contract_description', 'contract_value',
+               'assigned_buyer_id', 'created_date']
+
+# Errors shown back to the user are capped so one bad column doesn't flood the page
+MAX_REPORTED_ERRORS = 20
+
+
+class UploadError(ValueError):
+    """Raised when an uploaded file cannot be read or lacks required columns"""
+
+
+def _check_extension(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in UPLOAD_EXTENSIONS:
+        raise UploadError(f"Unsupported file type '{extension or filename}'. Upload a CSV or XLSX file.")
+    return extension
+
+
+def _normalize_frame(df):
+    """Normalise headers and strip cells; blank rows are dropped but keep their line numbers"""
+    df.columns = [str(column).strip().lower().replace(' ', '_') for column in df.columns]
+    df = df.apply(lambda column: column.str.strip())
+    # Drop rows that are completely blank (common at the end of spreadsheets)
+    df = df[(df != '').any(axis=1)] if not df.empty else df
+    return df
+
+
+def read_table(file_obj, filename):
+    """Read an uploaded CSV or Excel file into a DataFrame with normalised headers"""
+    extension = _check_extension(filename)
+    try:
+        if extension == '.csv':
+            df = pd.read_csv(file_obj, dtype=str, keep_default_na=False)
+        else:
+            df = pd.read_excel(file_obj, dtype=str, keep_default_na=False)
+    except Exception as e:
+        raise UploadError(f"Could not read {filename}: {e}")
+    return _normalize_frame(df)
+
+
+def read_tables(file_obj, filename):
+    """
+    Read every sheet of an uploaded workbook as a dict of lowercase sheet name -> DataFrame
+    A CSV file is returned as a single sheet named 'bids'.
+    """
+    extension = _check_extension(filename)
+    if extension == '.csv':
+        return {'bids': read_table(file_obj, filename)}
+    try:
+        sheets = pd.read_excel(file_obj, sheet_name=None, dtype=str, keep_default_na=False)
+    except Exception as e:
+        raise UploadError(f"Could not read {filename}: {e}")
+    return {str(name).strip().lower(): _normalize_frame(df) for name, df in sheets.items()}
+
+
+def _require_columns(df, required):
+    missing = [column for column in required if column not in df.columns]
+    if missing:
+        raise UploadError(f"Missing required column(s): {', '.join(missing)}")
+
+
+def _line_numbers(df, mask):
+    """Spreadsheet line numbers (header is line 1) for the rows selected by mask"""
+    return (df.index[mask] + 2).tolist()
+
+
+def _collect_errors(errors, df, mask, message):
+    errors.extend((line, message) for line in _line_numbers(df, mask))
+
+
+def format_errors(errors, limit=MAX_REPORTED_ERRORS):
+    """Render validation errors as short human-readable lines (line None = whole file)"""
+    errors = sorted(errors, key=lambda error: (error[0] is None, error[0] or 0, error[1]))
+    lines = [f"Line {line}: {message}" if line is not None else message
+             for line, message in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return lines
+
+
+def validate_items(df):
+    """
+    Validate bid line items (item_name, item_description, quantity, unit)
+    item_name is required and quantity must be a non-negative number; blank
+    quantities become 0 and missing optional columns default to ''.
+    Returns (items DataFrame with ITEM_COLUMNS, errors).
+    """
+    df = df.copy()
+    _require_columns(df, ['item_name', 'quantity'])
+    for column in ('item_description', 'unit'):
+        if column not in df.columns:
+            df[column] = ''
+
+    errors = []
+    missing_name = df['item_name'] == ''
+    _collect_errors(errors, df, missing_name, 'item_name is required')
+
+    quantity = pd.to_numeric(df['quantity'].replace('', '0'), errors='coerce')
+    bad_quantity = quantity.isna()
+    _collect_errors(errors, df, bad_quantity, 'quantity must be a number')
+    negative = quantity < 0
+    _collect_errors(errors, df, negative, 'quantity cannot be negative')
+
+    valid = ~(missing_name | bad_quantity | negative)
+    items = df.loc[valid, ITEM_COLUMNS].copy()
+    items['quantity'] = quantity[valid]
+    return items, errors
+
+
+def _normalize_ids(ids):
+    """String form of IDs for matching, so 7, 7.0 and '7' compare equal"""
+    return ids.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+
+def rate_sheet_template(items, existing_rates=None):
+    """Build a rate sheet for a bid's items, pre-filled with any existing rates"""
+    sheet = items.reindex(columns=['item_id', 'item_name', 'quantity', 'unit']).copy()
+    rates = pd.Series(existing_rates or {}, dtype=object)
+    sheet['unit_rate'] = sheet['item_id'].map(rates) if not rates.empty else ''
+    return sheet[RATE_SHEET_COLUMNS]
+
+
+def validate_rate_sheet(df, items):
+    """
+    Validate a bidder rate sheet (item_id, unit_rate) against the bid's items
+    Every item of the bid needs exactly one non-negative numeric rate; unknown and
+    duplicate item IDs are rejected. Rates are rounded to MONEY_DECIMALS places, as
+    when they are entered in the form. Rows are matched to items with a single join.
+    Returns (Series of unit_rate indexed by the bid's item_id, errors).
+    """
+    _require_columns(df, ['item_id', 'unit_rate'])
+
+    errors = []
+    sheet = pd.DataFrame({
+        'key': _normalize_ids(df['item_id']),
+        'unit_rate': money.quantize(pd.to_numeric(df['unit_rate'], errors='coerce'))
+    })
+    bid_items = pd.DataFrame({
+        'key': _normalize_ids(items['item_id']),
+        'item_id': items['item_id'].to_numpy(dtype=object)
+    }).drop_duplicates('key')
+    matched = sheet.merge(bid_items, on='key', how='left')
+    matched.index = df.index
+
+    unknown = matched['item_id'].isna()
+    _collect_errors(errors, df, unknown, 'item_id is not an item of this bid')
+    duplicate = ~unknown & matched['key'].duplicated(keep='first')
+    _collect_errors(errors, df, duplicate, 'item_id appears more than once')
+    missing_rate = df['unit_rate'] == ''
+    _collect_errors(errors, df, missing_rate, 'unit_rate is required')
+    bad_rate = ~missing_rate & matched['unit_rate'].isna()
+    _collect_errors(errors, df, bad_rate, 'unit_rate must be a number')
+    negative = matched['unit_rate'] < 0
+    _collect_errors(errors, df, negative, 'unit_rate cannot be negative')
+
+    not_priced = ~bid_items['key'].isin(matched['key'])
+    errors.extend((None, f"No unit_rate for item {item_id}")
+                  for item_id in bid_items.loc[not_priced, 'item_id'])
+
+    valid = ~(unknown | duplicate | missing_rate | bad_rate | negative)
+    rates = pd.Series(matched.loc[valid, 'unit_rate'].to_numpy(dtype=float),
+                      index=pd.Index(matched.loc[valid, 'item_id'], dtype=object))
+    return rates, errors
+
+
+def validate_bids(df, buyer_ids):
+    """
+    Validate bids for bulk import
+    contract_name is required and contract_value must be a non-negative number.
+    assigned_buyer_id, if given, must be a known buyer and created_date, if given,
+    must be a date. ref links the bid to rows of the items sheet and defaults to
+    the line number. Returns (bids DataFrame with BID_COLUMNS, errors).
+    """
+    df = df.copy()
+    _require_columns(df, ['contract_name', 'contract_value'])
+    for column in ('contract_description', 'assigned_buyer_id', 'created_date'):
+        if column not in df.columns:
+            df[column] = ''
+    if 'ref' not in df.columns:
+        df['ref'] = ''
+    df['ref'] = df['ref'].where(df['ref'] != '', (df.index + 2).astype(str))
+
+    errors = []
+    missing_name = df['contract_name'] == ''
+    _collect_errors(errors, df, missing_name, 'contract_name is required')
+
+    value = pd.to_numeric(df['contract_value'], errors='coerce')
+    bad_value = value.isna()
+    _collect_errors(errors, df, bad_value, 'contract_value must be a number')
+    negative = value < 0
+    _collect_errors(errors, df, negative, 'contract_value cannot be negative')
+
+    has_buyer = df['assigned_buyer_id'] != ''
+    unknown_buyer = has_buyer & ~df['assigned_buyer_id'].isin(set(buyer_ids))
+    _collect_errors(errors, df, unknown_buyer, 'assigned_buyer_id is not a known buyer')
+
+    has_date = df['created_date'] != ''
+    created = pd.to_datetime(df['created_date'].where(has_date), errors='coerce', format='mixed')
+    bad_date = has_date & created.isna()
+    _collect_errors(errors, df, bad_date, 'created_date is not a valid date')
+
+    duplicate_ref = df['ref'].duplicated(keep='first')
+    _collect_errors(errors, df, duplicate_ref, 'ref appears more than once')
+
+    valid = ~(missing_name | bad_value | negative | unknown_buyer | bad_date | duplicate_ref)
+    bids = df.loc[valid, BID_COLUMNS].copy()
+    bids['contract_value'] = value[valid]
+    bids['created_date'] = created[valid].dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
+    return bids, errors
+
+
+def validate_bid_items(df, refs):
+    """
+    Validate items for bulk import; like validate_items plus a bid_ref column
+    that must match the ref of one of the imported bids.
+    Returns (items DataFrame with bid_ref + ITEM_COLUMNS, errors).
+    """
+    _require_columns(df, ['bid_ref'])
+    items, errors = validate_items(df)
+
+    unknown_ref = ~df['bid_ref'].isin(set(refs))
+    _collect_errors(errors, df, unknown_ref, 'bid_ref does not match any bid ref')
+
+    items = items[~unknown_ref.loc[items.index]]
+    items.insert(0, 'bid_ref', df.loc[items.index, 'bid_ref'])
+    return items, errors
+
+
+def load_bid_import(bids_df, items_df=None):
+    """
+    Validate a bulk bid import against the current buyers
+    Returns (bids, items, errors); items is None when no items were supplied.
+    """
+    buyers_df = db.get_all_buyers()
+    buyer_ids = buyers_df['buyer_id'].dropna().astype(str) if not buyers_df.empty else []
+    bids, errors = validate_bids(bids_df, buyer_ids)
+
+    items = None
+    if items_df is not None:
+        refs = set(bids['ref'])
+        if 'ref' in bids_df.columns:
+            refs |= set(bids_df['ref'])
+        items, item_errors = validate_bid_items(items_df, refs)
+        errors += [(line, f"Items: {message}") for line, message in item_errors]
+    return bids, items, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import bids (and items) from CSV/XLSX')
+    parser.add_argument('bids_file', help="CSV of bids, or XLSX with a 'Bids' sheet and optional 'Items' sheet")
+    parser.add_argument('--items', dest='items_file', help='CSV/XLSX of items with a bid_ref column')
+    parser.add_argument('--vendor-name', default='Vendor', help='Recorded as the creator of the bids')
+    parser.add_argument('--database', default=db.DATABASE_FILE, help='Path to database.xlsx')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only; do not write')
+    args = parser.parse_args(argv)
+
+    db.DATABASE_FILE = args.database
+    start = time.perf_counter()
+    try:
+        with open(args.bids_file, 'rb') as f:
+            sheets = read_tables(f, args.bids_file)
+        bids_df = sheets.get('bids', next(iter(sheets.values())))
+        items_df = sheets.get('items')
+        if args.items_file:
+            with open(args.items_file, 'rb') as f:
+                items_df = read_table(f, args.items_file)
+        bids, items, errors = load_bid_import(bids_df, items_df)
+    except UploadError as e:
+        print(f"Error: {e}")
+        return 1
+
+    if errors:
+        print(f"Import rejected ({len(errors)} problem(s)):")
+        for line in format_errors(errors, limit=100):
+            print(f"  {line}")
+        return 1
+
+    item_count = 0 if items is None else len(items)
+    if args.dry_run:
+        print(f"Dry run: {len(bids)} bid(s) and {item_count} item(s) are valid.")
+        return 0
+
+    imported = db.import_bids_bulk(bids, items, args.vendor_name)
+    if not imported:
+        print("Error: import failed; nothing was written.")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"Imported {len(imported)} bid(s) and {item_count} item(s) in {elapsed:.1f}s "
+          f"({len(imported) / elapsed:,.0f} bids/s).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
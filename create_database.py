@@ -4,6 +4,8 @@ Script to create the initial database.xlsx structure for the Bid Management Syst
 import pandas as pd
 from datetime import datetime
 
+import db_helper
+
 # Create Bids sheet structure with sample data
 bids_data = {
     'bid_id': ['BID001', 'BID002', 'BID003'],
@@ -127,6 +129,10 @@ with pd.ExcelWriter('database.xlsx', engine='openpyxl') as writer:
     pd.DataFrame(history_data).to_excel(writer, sheet_name='History', index=False)
     pd.DataFrame(bidders_data).to_excel(writer, sheet_name='Bidders', index=False)
     pd.DataFrame(bidder_item_bids_data).to_excel(writer, sheet_name='BidderItemBids', index=False)
+    db_helper.compute_bidder_totals(pd.DataFrame(bidder_item_bids_data), pd.DataFrame(bid_items_data)).to_excel(
+        writer, sheet_name='BidderTotals', index=False)
+    db_helper.compute_price_index(pd.DataFrame(bidder_item_bids_data), pd.DataFrame(bid_items_data)).to_excel(
+        writer, sheet_name='PriceIndex', index=False)
 
 print("database.xlsx created successfully!")
 print("\nDatabase Structure:")
@@ -137,3 +143,5 @@ print("4. VendorBids Sheet: Stores historical vendor submissions (legacy support
 print("5. History Sheet: Tracks all actions and comments throughout the approval process")
 print("6. Bidders Sheet: Stores bidder information and login credentials")
 print("7. BidderItemBids Sheet: Stores unit rates submitted by bidders for each item")
+print("8. BidderTotals Sheet: Precomputed bidder totals and ranks per bid")
+print("9. PriceIndex Sheet: Unit-rate percentiles of other bids for each quoted item")
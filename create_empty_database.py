@@ -5,6 +5,8 @@ Creates all necessary sheets with sample data including buyers, bidders, and bid
 import pandas as pd
 from datetime import datetime
 
+import db_helper
+
 # Create Bids sheet with sample data
 bids_data = {
     'bid_id': ['BID001'],
@@ -146,6 +148,10 @@ with pd.ExcelWriter('database.xlsx', engine='openpyxl') as writer:
     pd.DataFrame(bidders_data).to_excel(writer, sheet_name='Bidders', index=False)
     pd.DataFrame(bidder_item_bids_data).to_excel(writer, sheet_name='BidderItemBids', index=False)
     pd.DataFrame(bid_comparison_data).to_excel(writer, sheet_name='BidComparison', index=False)
+    db_helper.compute_bidder_totals(pd.DataFrame(bidder_item_bids_data), pd.DataFrame(bid_items_data)).to_excel(
+        writer, sheet_name='BidderTotals', index=False)
+    db_helper.compute_price_index(pd.DataFrame(bidder_item_bids_data), pd.DataFrame(bid_items_data)).to_excel(
+        writer, sheet_name='PriceIndex', index=False)
 
 print("✓ Database.xlsx created successfully with sample data!")
 print("\nDatabase Structure:")
@@ -158,6 +164,8 @@ print("6. History Sheet: Contains bid creation and buyer assignment records")
 print("7. Bidders Sheet: Contains 2 bidders (companies submitting quotes)")
 print("8. BidderItemBids Sheet: Contains bid submissions from both bidders for both items")
 print("9. BidComparison Sheet: Contains comparison data for PDF generation")
+print("10. BidderTotals Sheet: Precomputed bidder totals and ranks for BID001")
+print("11. PriceIndex Sheet: Empty until a second bid quotes the same items")
 print("\n" + "="*80)
 print("SAMPLE DATA SUMMARY:")
 print("="*80)
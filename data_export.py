@@ -0,0 +1,257 @@
+"""
+Streaming CSV/XLSX export of Bids, BidItems, BidderItemBids and History
+
+Exports read from a snapshot copy of database.xlsx taken under the write lock, so
+the app keeps serving writes while an export runs and every export reflects a
+single consistent state. Rows are read with openpyxl in read-only mode and written
+one at a time (CSV directly to the response, XLSX through a write-only workbook),
+so memory use does not grow with the number of rows exported.
+
+Usage:
+    python data_export.py History --format csv --from 2025-01-01 --output history.csv
+    python data_export.py Bids BidItems --format xlsx --status Approved --output approved.xlsx
+"""
+import argparse
+import copy
+import csv
+import io
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+
+from openpyxl import Workbook, load_workbook
+
+import db_helper as db
+
+EXPORT_SHEETS = ('Bids', 'BidItems', 'BidderItemBids', 'History')
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Column used by the date-range filter for each sheet (BidItems has none)
+DATE_COLUMNS = {
+    'Bids': 'created_date',
+    'BidItems': None,
+    'BidderItemBids': 'submission_date',
+    'History': 'action_date'
+}
+
+CSV_BATCH_ROWS = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ExportFilter:
+    """Row filter shared by all export sheets
+
+    bid_ids and status restrict every sheet to those bids (status through the
+    Bids rows of the snapshot, see resolve) and date_from/date_to (inclusive,
+    YYYY-MM-DD or full timestamps) apply to the sheet's date column from
+    DATE_COLUMNS.
+    """
+
+    def __init__(self, bid_ids=None, status=None, date_from=None, date_to=None):
+        self.bid_ids = {str(bid_id).strip() for bid_id in bid_ids} if bid_ids else None
+        self.status = status or None
+        self.date_from = _validate_date(date_from)
+        self.date_to = _validate_date(date_to)
+
+    def resolve(self, snapshot_path):
+        """
+        The filter for one snapshot: a status filter also becomes the set of bids
+        with that status, so BidItems, BidderItemBids and History follow it too
+        """
+        if not self.status:
+            return self
+        status_bids = set()
+        rows = iter_sheet_rows(snapshot_path, 'Bids', ExportFilter(status=self.status))
+        header = next(rows, None)
+        if header is not None and 'bid_id' in header:
+            bid_pos = header.index('bid_id')
+            status_bids = {_cell_text(row[bid_pos]) for row in rows}
+        resolved = copy.copy(self)
+        resolved.bid_ids = status_bids if self.bid_ids is None else self.bid_ids & status_bids
+        return resolved
+
+    def row_predicate(self, sheet_name, header):
+        """Build a fast per-row test for a sheet with the given header"""
+        positions = {name: index for index, name in enumerate(header)}
+        checks = []
+
+        if self.bid_ids is not None and 'bid_id' in positions:
+            bid_pos = positions['bid_id']
+            checks.append(lambda row: _cell_text(row[bid_pos]) in self.bid_ids)
+
+        if self.status and sheet_name == 'Bids' and 'status' in positions:
+            status_pos = positions['status']
+            checks.append(lambda row: _cell_text(row[status_pos]) == self.status)
+
+        date_column = DATE_COLUMNS.get(sheet_name)
+        if (self.date_from or self.date_to) and date_column in positions:
+            date_pos = positions[date_column]
+            checks.append(lambda row: self._in_date_range(_cell_text(row[date_pos])))
+
+        if not checks:
+            return lambda row: True
+        return lambda row: all(check(row) for check in checks)
+
+    def _in_date_range(self, value):
+        if not value:
+            return False
+        if self.date_from and value < self.date_from:
+            return False
+        # Compare on the filter's precision so a bare date covers the whole day
+        if self.date_to and value[:len(self.date_to)] > self.date_to:
+            return False
+        return True
+
+
+def _validate_date(value):
+    """Return a normalised date/timestamp string, raising ValueError on bad input"""
+    if not value:
+        return None
+    value = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S'):
+        try:
+            datetime.strptime(value, fmt)
+            return value
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}'. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS.")
+
+
+def _cell_text(value):
+    """Render a cell the way the rest of the app stores it (timestamps as strings)"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def iter_sheet_rows(snapshot_path, sheet_name, export_filter=None):
+    """Yield the header and then each matching row of a sheet in the snapshot"""
+    workbook = load_workbook(snapshot_path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            return
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = tuple(name for name in header if name is not None)
+        width = len(header)
+        yield header
+
+        matches = (export_filter or ExportFilter()).row_predicate(sheet_name, header)
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if all(cell is None for cell in row):
+                continue
+            if matches(row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def iter_csv(sheet_name, export_filter=None):
+    """Yield a sheet as UTF-8 CSV bytes, taking a fresh snapshot first"""
+    _check_sheet(sheet_name)
+    snapshot_path = db.snapshot_database()
+    try:
+        export_filter = export_filter.resolve(snapshot_path) if export_filter else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+        for row in iter_sheet_rows(snapshot_path, sheet_name, export_filter):
+            writer.writerow(['' if cell is None else cell for cell in row])
+            pending += 1
+            if pending >= CSV_BATCH_ROWS:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if pending:
+            yield buffer.getvalue().encode('utf-8')
+    finally:
+        os.remove(snapshot_path)
+
+
+def write_xlsx(sheet_names, output_path, export_filter=None):
+    """Write the selected sheets to a new workbook using openpyxl write-only mode"""
+    for sheet_name in sheet_names:
+        _check_sheet(sheet_name)
+    snapshot_path = db.snapshot_database()
+    try:
+        export_filter = export_filter.resolve(snapshot_path) if export_filter else None
+        workbook = Workbook(write_only=True)
+        for sheet_name in sheet_names:
+            worksheet = workbook.create_sheet(sheet_name)
+            for row in iter_sheet_rows(snapshot_path, sheet_name, export_filter):
+                worksheet.append(row)
+        workbook.save(output_path)
+    finally:
+        os.remove(snapshot_path)
+
+
+def iter_xlsx(sheet_names, export_filter=None):
+    """Yield an XLSX export in chunks; the workbook is built in a temp file first"""
+    fd, output_path = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+    os.close(fd)
+    try:
+        write_xlsx(sheet_names, output_path, export_filter)
+        with open(output_path, 'rb') as output:
+            while True:
+                chunk = output.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(output_path)
+
+
+def _check_sheet(sheet_name):
+    if sheet_name not in EXPORT_SHEETS:
+        raise ValueError(f"Unknown export sheet '{sheet_name}'. Choose from: {', '.join(EXPORT_SHEETS)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export database sheets as CSV or XLSX')
+    parser.add_argument('sheets', nargs='+', choices=EXPORT_SHEETS, help='Sheets to export')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--bid-id', action='append', dest='bid_ids', help='Restrict to a bid (repeatable)')
+    parser.add_argument('--status', help='Only bids with this status (all sheets)')
+    parser.add_argument('--from', dest='date_from', help='Earliest date (inclusive)')
+    parser.add_argument('--to', dest='date_to', help='Latest date (inclusive)')
+    parser.add_argument('--output', help='Output file (CSV defaults to stdout)')
+    parser.add_argument('--database', default=db.DATABASE_FILE, help='Path to database.xlsx')
+    args = parser.parse_args(argv)
+
+    db.DATABASE_FILE = args.database
+    try:
+        export_filter = ExportFilter(args.bid_ids, args.status, args.date_from, args.date_to)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.format == 'xlsx':
+        output_path = args.output or 'export.xlsx'
+        write_xlsx(args.sheets, output_path, export_filter)
+        print(f"Exported {', '.join(args.sheets)} to {output_path}")
+        return 0
+
+    if len(args.sheets) != 1:
+        parser.error('CSV export takes exactly one sheet')
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in iter_csv(args.sheets[0], export_filter):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,36 @@
 """
 Excel Database Helper Functions for Bid Management System
 """
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
+import shutil
+import tempfile
+import threading
+import time
+
+import metrics
+import money
+import slowlog
+import tracing
 
 DATABASE_FILE = 'database.xlsx'
 
+# Serialises workbook rewrites and snapshots within this process
+_db_lock = threading.RLock()
+
+# Parsed sheets and row indexes, valid while the workbook file is unchanged
+_cache_lock = threading.Lock()
+_cache_signature = None
+_sheet_cache = {}
+_index_cache = {}
+_sheet_names = None
+
+# Bumped by every workbook rewrite in this process, so data_version() changes
+# even when a new file happens to get the same signature as the old one
+_write_count = 0
+
 
 def current_timestamp():
     """Return the current timestamp string in a consistent format"""
@@ -68,33 +92,232 @@ def _clean_bids_dataframe(bids_df):
 
     return bids_df
 
+def _workbook_signature():
+    """Identify the current workbook file; writes swap in a new file so this changes"""
+    stat = os.stat(DATABASE_FILE)
+    return (os.path.abspath(DATABASE_FILE), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def data_version():
+    """
+    Version of the workbook contents for caches of derived results: changes on
+    every write by this process (a counter) or another one (the file signature)
+    """
+    return (_workbook_signature(), _write_count)
+
+def _cached_sheets(sheet_names):
+    """
+    Return parsed sheets from the cache, loading any missing ones with one workbook open
+    The returned frames are shared with the cache and must not be modified.
+    """
+    global _cache_signature, _sheet_names
+    signature = _workbook_signature()
+    with _cache_lock:
+        if signature != _cache_signature:
+            _sheet_cache.clear()
+            _index_cache.clear()
+            _sheet_names = None
+            _cache_signature = signature
+        cached = {sheet: _sheet_cache[sheet] for sheet in sheet_names if sheet in _sheet_cache}
+
+    missing = [sheet for sheet in sheet_names if sheet not in cached]
+    if cached:
+        metrics.inc('sheet_cache_hits_total', len(cached))
+    if missing:
+        loaded = {}
+        with tracing.span('pandas.ExcelFile', sheets=','.join(missing), file_bytes=signature[3]), \
+                pd.ExcelFile(DATABASE_FILE) as xls:
+            available = xls.sheet_names
+            for sheet in missing:
+                start = time.perf_counter()
+                with tracing.span('pandas.read_excel', sheet=sheet) as parse_span:
+                    loaded[sheet] = pd.read_excel(xls, sheet) if sheet in available else pd.DataFrame()
+                    parse_span.set_attribute('rows', len(loaded[sheet]))
+                slowlog.record('parse', sheet, time.perf_counter() - start, len(loaded[sheet]))
+        metrics.inc('workbook_opens_total')
+        metrics.inc('workbook_bytes_read_total', signature[3])
+        for sheet, df in loaded.items():
+            metrics.inc('sheet_reads_total', sheet=sheet)
+            metrics.inc('sheet_rows_read_total', len(df), sheet=sheet)
+        with _cache_lock:
+            if signature == _cache_signature:
+                _sheet_cache.update(loaded)
+                _sheet_names = list(available)
+        cached.update(loaded)
+
+    return {sheet: cached[sheet] for sheet in sheet_names}
+
+def workbook_sheet_names():
+    """Return the sheet names of the workbook, in file order"""
+    global _sheet_names
+    _cached_sheets([])
+    with _cache_lock:
+        names = _sheet_names
+    if names is None:
+        with pd.ExcelFile(DATABASE_FILE) as xls:
+            names = list(xls.sheet_names)
+        with _cache_lock:
+            _sheet_names = names
+    return list(names)
+
+def cached_objects():
+    """
+    The parsed sheets and row indexes currently cached, for memory diagnostics
+    Returns {'sheets': {sheet: DataFrame}, 'indexes': {(sheet, column): index}};
+    the values are shared with the cache and must not be modified.
+    """
+    with _cache_lock:
+        return {'sheets': dict(_sheet_cache), 'indexes': dict(_index_cache)}
+
+def clear_cache():
+    """Drop all cached sheets and indexes"""
+    global _cache_signature, _sheet_names
+    with _cache_lock:
+        _sheet_cache.clear()
+        _index_cache.clear()
+        _sheet_names = None
+        _cache_signature = None
+
 def read_sheet(sheet_name):
     """Read data from a specific sheet"""
+    start = time.perf_counter()
     try:
-        df = pd.read_excel(DATABASE_FILE, sheet_name=sheet_name)
-        return df
+        df = _cached_sheets([sheet_name])[sheet_name].copy()
+    except Exception as e:
+        print(f"Error reading {sheet_name}: {e}")
+        df = pd.DataFrame()
+    slowlog.record('read_sheet', sheet_name, time.perf_counter() - start, len(df))
+    return df
+
+def read_sheets(sheet_names):
+    """Read several sheets with a single open of the workbook
+
+    Sheets that do not exist come back as empty DataFrames, matching read_sheet.
+    """
+    start = time.perf_counter()
+    try:
+        frames = {sheet: df.copy() for sheet, df in _cached_sheets(sheet_names).items()}
+    except Exception as e:
+        print(f"Error reading {', '.join(sheet_names)}: {e}")
+        frames = {sheet: pd.DataFrame() for sheet in sheet_names}
+    # One workbook open serves all the sheets, so the time is split between them
+    seconds = (time.perf_counter() - start) / max(len(frames), 1)
+    for sheet, df in frames.items():
+        slowlog.record('read_sheet', sheet, seconds, len(df))
+    return frames
+
+def select_rows(sheet_name, column, values):
+    """
+    Return the rows of a sheet whose column matches any of values
+    Uses a cached value -> row positions index, so looking up many keys costs one
+    pass over the sheet per workbook version instead of one scan per key.
+    """
+    start = time.perf_counter()
+    rows = _select_rows(sheet_name, column, values)
+    slowlog.record('select_rows', sheet_name, time.perf_counter() - start, len(rows))
+    return rows
+
+def _select_rows(sheet_name, column, values):
+    try:
+        df = _cached_sheets([sheet_name])[sheet_name]
     except Exception as e:
         print(f"Error reading {sheet_name}: {e}")
         return pd.DataFrame()
+    if df.empty or column not in df.columns:
+        return df.iloc[0:0].copy()
+
+    key = (sheet_name, column)
+    with _cache_lock:
+        index = _index_cache.get(key)
+    metrics.inc('sheet_index_lookups_total', sheet=sheet_name, cached='true' if index is not None else 'false')
+    if index is None:
+        index = df.groupby(column, sort=False).indices
+        with _cache_lock:
+            _index_cache[key] = index
+
+    positions = [index[value] for value in values if value in index]
+    if not positions:
+        return df.iloc[0:0].copy()
+    rows = np.sort(np.concatenate(positions))
+    metrics.inc('sheet_rows_selected_total', len(rows), sheet=sheet_name)
+    return df.iloc[rows].copy()
 
 def write_sheet(df, sheet_name):
     """Write data to a specific sheet"""
+    return write_sheets({sheet_name: df})
+
+def write_sheets(frames):
+    """Write several sheets (dict of sheet name -> DataFrame) in one workbook rewrite"""
+    global _write_count
+    start = time.perf_counter()
     try:
-        # Read all sheets
-        with pd.ExcelFile(DATABASE_FILE) as xls:
-            sheets = {sheet: pd.read_excel(xls, sheet) for sheet in xls.sheet_names}
-        
-        # Update the specific sheet
-        sheets[sheet_name] = df
-        
-        # Write all sheets back
-        with pd.ExcelWriter(DATABASE_FILE, engine='openpyxl') as writer:
-            for sheet, data in sheets.items():
-                data.to_excel(writer, sheet_name=sheet, index=False)
-        return True
+        with _db_lock:
+            # Read all sheets
+            sheets = dict(_cached_sheets(workbook_sheet_names()))
+            
+            # Update the given sheets
+            sheets.update(frames)
+            
+            # Write all sheets to a temp file and swap it in, so readers and
+            # snapshots never see a half-written workbook
+            directory = os.path.dirname(os.path.abspath(DATABASE_FILE))
+            fd, temp_path = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+            os.close(fd)
+            try:
+                writer = pd.ExcelWriter(temp_path, engine='openpyxl')
+                try:
+                    for sheet, data in sheets.items():
+                        with tracing.span('pandas.to_excel', sheet=sheet, rows=len(data)):
+                            data.to_excel(writer, sheet_name=sheet, index=False)
+                finally:
+                    with tracing.span('openpyxl.save', sheets=len(sheets)):
+                        writer.close()
+                metrics.inc('workbook_writes_total')
+                metrics.inc('workbook_bytes_written_total', os.path.getsize(temp_path))
+                for sheet, data in frames.items():
+                    metrics.inc('sheet_writes_total', sheet=sheet)
+                    metrics.inc('sheet_rows_written_total', len(data), sheet=sheet)
+                os.replace(temp_path, DATABASE_FILE)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                _write_count += 1
+                clear_cache()
+        written = True
     except Exception as e:
-        print(f"Error writing to {sheet_name}: {e}")
-        return False
+        print(f"Error writing to {', '.join(frames)}: {e}")
+        written = False
+    # The whole workbook is rewritten once, so the time is split between the given sheets
+    seconds = (time.perf_counter() - start) / max(len(frames), 1)
+    for sheet, data in frames.items():
+        slowlog.record('write_sheet', sheet, seconds, len(data))
+    return written
+
+def snapshot_database(dest_path=None):
+    """
+    Copy the workbook to dest_path (a new temp file by default) and return the path
+    Taken under the write lock, so the copy reflects one consistent state even
+    while the app keeps writing; the caller is responsible for deleting it.
+    """
+    if dest_path is None:
+        fd, dest_path = tempfile.mkstemp(suffix='.xlsx', prefix='database_snapshot_')
+        os.close(fd)
+    with _db_lock:
+        shutil.copyfile(DATABASE_FILE, dest_path)
+    return dest_path
+
+def _reserve_ids(existing_ids, prefix, count, width=3):
+    """
+    Reserve a block of count new IDs of the form PREFIX + zero-padded number
+    Both prefixed strings ('ITEM007') and bare numbers (7) already in the sheet
+    are taken into account when finding the highest number in use.
+    """
+    ids = pd.Series(existing_ids, dtype=object).dropna()
+    numbers = pd.to_numeric(
+        ids.astype(str).str.strip().str.replace(f'^{prefix}', '', regex=True),
+        errors='coerce'
+    ).dropna()
+    start = int(numbers.max()) + 1 if not numbers.empty else 1
+    return [f'{prefix}{str(number).zfill(width)}' for number in range(start, start + count)]
 
 def get_next_bid_id():
     """Generate next bid ID"""
@@ -153,12 +376,7 @@ def get_next_item_id():
     if items_df.empty or len(items_df) == 0:
         return 'ITEM001'
     
-    existing_ids = items_df['item_id'].dropna().tolist()
-    if not existing_ids:
-        return 'ITEM001'
-    
-    max_num = max([int(item_id.replace('ITEM', '')) for item_id in existing_ids if isinstance(item_id, str)])
-    return f'ITEM{str(max_num + 1).zfill(3)}'
+    return _reserve_ids(items_df['item_id'], 'ITEM', 1)[0]
 
 def create_bid(contract_name, contract_description, contract_value, vendor_name, assigned_buyer_id=None):
     """Create a new bid and optionally assign a buyer immediately"""
@@ -209,6 +427,109 @@ def create_bid(contract_name, contract_description, contract_value, vendor_name,
     
     return new_bid['bid_id']
 
+def import_bids_bulk(bids, items=None, vendor_name='Vendor'):
+    """
+    Create many bids (and optionally their items) with a single workbook write
+    bids: DataFrame with ref, contract_name, contract_description, contract_value,
+          assigned_buyer_id and created_date ('' = not assigned / now)
+    items: DataFrame with bid_ref plus item_name, item_description, quantity, unit
+    Bid, item and history IDs are reserved in blocks and the Bids, BidItems and
+    History rows are built as frames. Returns a dict of ref -> new bid_id.
+    """
+    if bids is None or len(bids) == 0:
+        return {}
+    bids = bids.reset_index(drop=True)
+    count = len(bids)
+
+    with _db_lock:
+        sheets = read_sheets(['Bids', 'BidItems', 'History', 'Buyers'])
+        bids_df = _clean_bids_dataframe(sheets['Bids'])
+        items_df = sheets['BidItems']
+        history_df = sheets['History']
+        buyers_df = sheets['Buyers']
+
+        bid_ids = _reserve_ids(bids_df.get('bid_id', []), 'BID', count)
+        timestamp = current_timestamp()
+        created = bids['created_date'].where(bids['created_date'] != '', timestamp)
+        buyer_ids = bids['assigned_buyer_id'].fillna('')
+        assigned = (buyer_ids != '').to_numpy()
+        status = np.where(assigned, 'Awaiting Buyer', 'Draft')
+
+        new_bids = pd.DataFrame({
+            'bid_id': bid_ids,
+            'contract_name': bids['contract_name'].to_numpy(),
+            'contract_description': bids['contract_description'].to_numpy(),
+            'contract_value': bids['contract_value'].to_numpy(),
+            'created_date': created.to_numpy(),
+            'vendor_name': vendor_name,
+            'status': status,
+            'selected_buyer_id': buyer_ids.to_numpy(),
+            'selected_submission_id': '',
+            'vendor_justification': '',
+            'submission_date': '',
+            'buyer_comment': '',
+            'a1_status': 'Pending',
+            'a1_comment': '',
+            'a1_date': '',
+            'a2_status': 'Pending',
+            'a2_comment': '',
+            'a2_date': ''
+        })
+        bids_df = pd.concat([bids_df, new_bids], ignore_index=True)
+
+        ref_to_bid = dict(zip(bids['ref'], bid_ids))
+        if items is not None and len(items) > 0:
+            new_items = pd.DataFrame({
+                'item_id': _reserve_ids(items_df.get('item_id', []), 'ITEM', len(items)),
+                'bid_id': items['bid_ref'].map(ref_to_bid).to_numpy(),
+                'item_name': items['item_name'].to_numpy(),
+                'item_description': items['item_description'].to_numpy(),
+                'quantity': items['quantity'].to_numpy(),
+                'unit': items['unit'].to_numpy()
+            })
+            items_df = pd.concat([items_df, new_items], ignore_index=True)
+
+        # History: one 'Created Bid' row per bid plus 'Assigned Buyer' where a buyer is set
+        created_history = pd.DataFrame({
+            'bid_id': bid_ids,
+            'action_date': created.to_numpy(),
+            'action_by': vendor_name,
+            'role': 'Vendor',
+            'action': 'Created Bid',
+            'comment': ('Imported bid: ' + bids['contract_name'].astype(str)).to_numpy(),
+            'previous_status': None,
+            'new_status': status
+        })
+        buyer_names = buyers_df.set_index('buyer_id')['buyer_name'] if not buyers_df.empty else pd.Series(dtype=object)
+        assigned_ids = buyer_ids[assigned]
+        assigned_history = pd.DataFrame({
+            'bid_id': np.asarray(bid_ids, dtype=object)[assigned],
+            'action_date': created[assigned].to_numpy(),
+            'action_by': vendor_name,
+            'role': 'Vendor',
+            'action': 'Assigned Buyer',
+            'comment': ('Assigned buyer ' + assigned_ids.map(buyer_names).fillna(assigned_ids).astype(str)
+                        + ' (' + assigned_ids.astype(str) + ')').to_numpy(),
+            'previous_status': 'Awaiting Buyer',
+            'new_status': 'Awaiting Buyer'
+        })
+        # Keep each bid's rows together, in the same order create_bid writes them
+        order = np.concatenate([np.arange(count), np.flatnonzero(assigned)])
+        new_history = pd.concat([created_history, assigned_history], ignore_index=True)
+        new_history = new_history.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+        new_history.insert(0, 'history_id', _next_history_ids(history_df, len(new_history)))
+        history_df = pd.concat([history_df, new_history], ignore_index=True)
+
+        frames = {'Bids': bids_df, 'BidItems': items_df, 'History': history_df}
+        if items is not None and len(items) > 0:
+            index_df = _items_price_index(items_df, new_items)
+            if index_df is not None:
+                frames['PriceIndex'] = index_df
+        if not write_sheets(frames):
+            return {}
+
+    return ref_to_bid
+
 def submit_buyer_bid(bid_id, buyer_id, buyer_name, bid_amount, bid_description):
     """Submit a buyer bid (legacy support)"""
     try:
@@ -404,6 +725,161 @@ def a2_reopen_bid(bid_id, comment, approver_name):
     # Add to history
     add_history(bid_id, approver_name, 'A2 Approver', 'Reopened Bid for Modifications', comment, 'Approved', 'Awaiting Buyer')
 
+# Status-changing approval actions that can be applied to many bids at once.
+# 'updates' are the Bids columns set by the action; '{comment}' and '{date}'
+# are filled in when applied.
+APPROVAL_ACTIONS = {
+    'a1_approve': {
+        'required_status': 'Pending A1',
+        'role': 'A1 Approver',
+        'history_action': 'Approved',
+        'new_status': 'Pending A2',
+        'updates': {'a1_status': 'Approved', 'a1_comment': '{comment}', 'a1_date': '{date}'}
+    },
+    'a1_reject': {
+        'required_status': 'Pending A1',
+        'role': 'A1 Approver',
+        'history_action': 'Rejected',
+        'new_status': 'Awaiting Buyer',
+        'updates': {'a1_status': 'Rejected', 'a1_comment': '{comment}', 'a1_date': '{date}'}
+    },
+    'a2_approve': {
+        'required_status': 'Pending A2',
+        'role': 'A2 Approver',
+        'history_action': 'Approved - Final',
+        'new_status': 'Approved',
+        'updates': {'a2_status': 'Approved', 'a2_comment': '{comment}', 'a2_date': '{date}'}
+    },
+    'a2_reject': {
+        'required_status': 'Pending A2',
+        'role': 'A2 Approver',
+        'history_action': 'Rejected - Sent back to A1',
+        'new_status': 'Pending A1',
+        'updates': {'a2_status': 'Rejected', 'a2_comment': '{comment}', 'a2_date': '{date}', 'a1_status': 'Pending'}
+    },
+    'a2_reopen': {
+        'required_status': 'Approved',
+        'role': 'A2 Approver',
+        'history_action': 'Reopened Bid for Modifications',
+        'new_status': 'Awaiting Buyer',
+        'updates': {
+            'a1_status': 'Pending', 'a1_comment': '', 'a1_date': '',
+            'a2_status': 'Pending', 'a2_comment': '', 'a2_date': '',
+            'selected_submission_id': '', 'vendor_justification': '',
+            'submission_date': '', 'buyer_comment': ''
+        }
+    }
+}
+
+def _next_history_ids(history_df, count):
+    """Reserve a block of consecutive history IDs"""
+    start = 1
+    if not history_df.empty and 'history_id' in history_df.columns:
+        existing = pd.to_numeric(history_df['history_id'], errors='coerce').max()
+        if not pd.isna(existing):
+            start = int(existing) + 1
+    return list(range(start, start + count))
+
+def bulk_apply_approval(bid_ids, action, comment, approver_name):
+    """
+    Apply one approval action (a key of APPROVAL_ACTIONS) to many bids
+    Every bid is checked against the action's required status; the ones that pass
+    are updated together and their history rows appended in a single workbook
+    write. Returns a dict of bid_id -> (success, message) in request order.
+    """
+    spec = APPROVAL_ACTIONS[action]
+    bid_ids = list(dict.fromkeys(bid_ids))
+    results = {}
+
+    with _db_lock:
+        sheets = read_sheets(['Bids', 'History'])
+        bids_df = sheets['Bids']
+        history_df = sheets['History']
+
+        if bids_df.empty:
+            return {bid_id: (False, 'Bid not found') for bid_id in bid_ids}
+
+        current_status = bids_df.drop_duplicates(subset=['bid_id']).set_index('bid_id')['status']
+        accepted = []
+        for bid_id in bid_ids:
+            if bid_id not in current_status.index:
+                results[bid_id] = (False, 'Bid not found')
+            elif current_status[bid_id] != spec['required_status']:
+                results[bid_id] = (False, f"Status is '{current_status[bid_id]}', expected '{spec['required_status']}'")
+            else:
+                accepted.append(bid_id)
+                results[bid_id] = (True, f"{spec['history_action']} ({spec['required_status']} -> {spec['new_status']})")
+
+        if not accepted:
+            return results
+
+        timestamp = current_timestamp()
+        mask = bids_df['bid_id'].isin(accepted)
+        for column, value in spec['updates'].items():
+            bids_df.loc[mask, column] = value.format(comment=comment, date=timestamp)
+        bids_df.loc[mask, 'status'] = spec['new_status']
+
+        new_history = pd.DataFrame({
+            'history_id': _next_history_ids(history_df, len(accepted)),
+            'bid_id': accepted,
+            'action_date': timestamp,
+            'action_by': approver_name,
+            'role': spec['role'],
+            'action': spec['history_action'],
+            'comment': comment,
+            'previous_status': spec['required_status'],
+            'new_status': spec['new_status']
+        })
+        history_df = pd.concat([history_df, new_history], ignore_index=True)
+
+        if not write_sheets({'Bids': bids_df, 'History': history_df}):
+            return {bid_id: (False, 'Could not save changes') if bid_id in accepted else result
+                    for bid_id, result in results.items()}
+
+    return results
+
+def bulk_update_bids(mask, updates, action_by, role, action, comment, dry_run=False):
+    """
+    Set-based update of every bid selected by mask, with one history row per bid
+    mask: callable taking the Bids DataFrame and returning a boolean Series
+    updates: dict of Bids column -> value ('status' included when it changes)
+    All rows are changed and their history appended with a single workbook write.
+    Returns a DataFrame of the matched bids' bid_id and previous status (nothing is
+    written when dry_run is set), or None if the write failed.
+    """
+    with _db_lock:
+        sheets = read_sheets(['Bids', 'History'])
+        bids_df = sheets['Bids']
+        history_df = sheets['History']
+
+        if bids_df.empty:
+            return pd.DataFrame(columns=['bid_id', 'status'])
+        selected = mask(bids_df) & bids_df['bid_id'].notna()
+        affected = bids_df.loc[selected, ['bid_id', 'status']].reset_index(drop=True)
+        if dry_run or affected.empty:
+            return affected
+
+        for column, value in updates.items():
+            bids_df.loc[selected, column] = value
+
+        new_history = pd.DataFrame({
+            'history_id': _next_history_ids(history_df, len(affected)),
+            'bid_id': affected['bid_id'].to_numpy(),
+            'action_date': current_timestamp(),
+            'action_by': action_by,
+            'role': role,
+            'action': action,
+            'comment': comment,
+            'previous_status': affected['status'].to_numpy(),
+            'new_status': bids_df.loc[selected, 'status'].to_numpy()
+        })
+        history_df = pd.concat([history_df, new_history], ignore_index=True)
+
+        if not write_sheets({'Bids': bids_df, 'History': history_df}):
+            return None
+
+    return affected
+
 def add_history(bid_id, action_by, role, action, comment, previous_status, new_status):
     """Add entry to history"""
     history_df = read_sheet('History')
@@ -434,6 +910,43 @@ def get_all_bids():
     """Get all bids"""
     return _clean_bids_dataframe(read_sheet('Bids'))
 
+def bid_filter_mask(bids_df, status=None, buyer_id=None, date_from=None, date_to=None):
+    """
+    Boolean mask of bids matching status (one value or a list), assigned buyer and
+    created_date range (inclusive). A bare date for date_to covers the whole day.
+    Raises ValueError on bad dates.
+    """
+    mask = pd.Series(True, index=bids_df.index)
+    if bids_df.empty:
+        return mask
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        mask &= bids_df['status'].astype(str).str.strip().isin(statuses)
+    if buyer_id and 'selected_buyer_id' in bids_df.columns:
+        mask &= bids_df['selected_buyer_id'].astype(str).str.strip() == str(buyer_id).strip()
+
+    if date_from or date_to:
+        created = pd.to_datetime(bids_df['created_date'], errors='coerce')
+        if date_from:
+            mask &= created >= pd.to_datetime(date_from)
+        if date_to:
+            upper = pd.to_datetime(date_to)
+            if upper == upper.normalize():
+                upper += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            mask &= created <= upper
+
+    return mask
+
+def filter_bids(status=None, buyer_id=None, date_from=None, date_to=None):
+    """
+    Get bids filtered by status, assigned buyer and created_date range (inclusive)
+    A bare date for date_to covers the whole day. Raises ValueError on bad dates.
+    """
+    bids_df = get_all_bids()
+    if bids_df.empty:
+        return bids_df
+    return bids_df[bid_filter_mask(bids_df, status, buyer_id, date_from, date_to)]
+
 def get_bid_by_id(bid_id):
     """Get specific bid by ID with vendor name"""
     bids_df = _clean_bids_dataframe(read_sheet('Bids'))
@@ -518,24 +1031,92 @@ def get_buyer_by_id(buyer_id):
     return None
 
 # Bid Items Functions
+def _items_price_index(items_df, changed_items):
+    """
+    The PriceIndex sheet after changed_items were added to or removed from
+    BidItems (items_df is the new sheet), or None when it does not change: only
+    items with submitted rates are in the index, so unquoted new items are skipped.
+    """
+    if changed_items.empty or 'PriceIndex' not in workbook_sheet_names():
+        return None
+    submissions = read_sheet('BidderItemBids')
+    if submissions.empty:
+        return None
+    quoted = changed_items[changed_items['item_id'].isin(submissions['item_id'])]
+    if quoted.empty:
+        return None
+    return _refresh_price_index(read_sheet('PriceIndex'), submissions, items_df, quoted)
+
+def _save_items(items_df, changed_items, sign):
+    """
+    Write BidItems together with the BidderTotals and PriceIndex rows affected
+    by the change. changed_items: the added (sign=1) or removed (sign=-1) item
+    rows. Both move only when rates exist for those items, e.g. a reused item ID
+    or a deleted item that was already quoted.
+    """
+    frames = {'BidItems': items_df}
+    index_df = _items_price_index(items_df, changed_items)
+    if index_df is not None:
+        frames['PriceIndex'] = index_df
+    if 'BidderTotals' in workbook_sheet_names():
+        totals_df = read_sheet('BidderTotals')
+        changed = False
+        for bid_id, bid_items in changed_items.groupby('bid_id', sort=False):
+            updated = _apply_item_deltas(totals_df, bid_id, bid_items, sign)
+            if updated is not None:
+                totals_df = updated
+                changed = True
+        if changed:
+            frames['BidderTotals'] = totals_df
+    return write_sheets(frames)
+
 def add_bid_item(bid_id, item_name, item_description, quantity, unit):
     """Add item to a bid"""
-    items_df = read_sheet('BidItems')
-    
-    new_item = {
-        'item_id': get_next_item_id(),
-        'bid_id': bid_id,
-        'item_name': item_name,
-        'item_description': item_description,
-        'quantity': quantity,
-        'unit': unit
-    }
-    
-    items_df = pd.concat([items_df, pd.DataFrame([new_item])], ignore_index=True)
-    write_sheet(items_df, 'BidItems')
+    with _db_lock:
+        items_df = read_sheet('BidItems')
+        
+        new_item = {
+            'item_id': get_next_item_id(),
+            'bid_id': bid_id,
+            'item_name': item_name,
+            'item_description': item_description,
+            'quantity': quantity,
+            'unit': unit
+        }
+        
+        new_items = pd.DataFrame([new_item])
+        items_df = pd.concat([items_df, new_items], ignore_index=True)
+        _save_items(items_df, new_items, 1)
     
     return new_item['item_id']
 
+def add_bid_items_bulk(bid_id, items):
+    """
+    Add many items to a bid with one block of IDs and a single workbook write
+    items: DataFrame with item_name, item_description, quantity and unit columns
+    Returns the list of new item IDs in input order.
+    """
+    if items is None or len(items) == 0:
+        return []
+
+    with _db_lock:
+        items_df = read_sheet('BidItems')
+        existing_ids = items_df['item_id'] if 'item_id' in items_df.columns else []
+        new_ids = _reserve_ids(existing_ids, 'ITEM', len(items))
+
+        new_items = pd.DataFrame({
+            'item_id': new_ids,
+            'bid_id': bid_id,
+            'item_name': items['item_name'].to_numpy(),
+            'item_description': items['item_description'].to_numpy(),
+            'quantity': items['quantity'].to_numpy(),
+            'unit': items['unit'].to_numpy()
+        })
+        items_df = pd.concat([items_df, new_items], ignore_index=True)
+        _save_items(items_df, new_items, 1)
+
+    return new_ids
+
 def get_items_for_bid(bid_id):
     """Get all items for a specific bid"""
     items_df = read_sheet('BidItems')
@@ -543,9 +1124,10 @@ def get_items_for_bid(bid_id):
 
 def delete_bid_item(item_id):
     """Delete a bid item"""
-    items_df = read_sheet('BidItems')
-    items_df = items_df[items_df['item_id'] != item_id]
-    write_sheet(items_df, 'BidItems')
+    with _db_lock:
+        items_df = read_sheet('BidItems')
+        removed = items_df['item_id'] == item_id
+        _save_items(items_df[~removed], items_df[removed], -1)
 
 # Bidder Management Functions
 def get_next_bidder_id():
@@ -564,15 +1146,9 @@ def get_next_bidder_id():
 def get_next_bidder_bid_id():
     """Generate next bidder bid ID"""
     bidder_bids_df = read_sheet('BidderItemBids')
-    if bidder_bids_df.empty or len(bidder_bids_df) == 0:
+    if bidder_bids_df.empty or 'bidder_bid_id' not in bidder_bids_df.columns:
         return 'BB001'
-    
-    existing_ids = bidder_bids_df['bidder_bid_id'].dropna().tolist()
-    if not existing_ids:
-        return 'BB001'
-    
-    max_num = max([int(bb_id.replace('BB', '')) for bb_id in existing_ids if isinstance(bb_id, str)])
-    return f'BB{str(max_num + 1).zfill(3)}'
+    return _reserve_ids(bidder_bids_df['bidder_bid_id'], 'BB', 1)[0]
 
 def create_bidder(bidder_name, contact_email, contact_phone, password):
     """Create a new bidder"""
@@ -614,37 +1190,67 @@ def bidder_login(bidder_id, password):
 def submit_bidder_item_bids(bid_id, bidder_id, item_rates):
     """
     Submit unit rates for multiple items by a bidder
-    item_rates: dict with item_id as key and unit_rate as value
+    item_rates: dict (or Series) with item_id as key and unit_rate as value
+    Rates are rounded to MONEY_DECIMALS places before they are stored. The
+    bidder's previous rates for the bid are replaced and the new rates plus
+    the history entry are saved with a single workbook write.
     """
-    bidder_bids_df = read_sheet('BidderItemBids')
-    
-    # Remove any existing bids from this bidder for this bid
-    bidder_bids_df = bidder_bids_df[~((bidder_bids_df['bid_id'] == bid_id) & 
-                                      (bidder_bids_df['bidder_id'] == bidder_id))]
-    
-    # Add new bids
-    new_bids = []
-    for item_id, unit_rate in item_rates.items():
-        new_bid = {
-            'bidder_bid_id': get_next_bidder_bid_id(),
-            'bid_id': bid_id,
-            'bidder_id': bidder_id,
-            'item_id': item_id,
-            'unit_rate': float(unit_rate),
-            'submission_date': current_timestamp()
-        }
-        new_bids.append(new_bid)
-    
-    bidder_bids_df = pd.concat([bidder_bids_df, pd.DataFrame(new_bids)], ignore_index=True)
-    write_sheet(bidder_bids_df, 'BidderItemBids')
-    
-    # Add to history
+    item_rates = pd.Series(item_rates, dtype=object)
     bidder = get_bidder_by_id(bidder_id)
     bidder_name = bidder['bidder_name'] if bidder else bidder_id
-    add_history(bid_id, bidder_name, 'Bidder', 'Submitted Item Bids', 
-                f"Submitted unit rates for {len(item_rates)} items", None, None)
-    
-    return True
+
+    with _db_lock:
+        sheets = read_sheets(['BidderItemBids', 'History'])
+        bidder_bids_df = sheets['BidderItemBids']
+        history_df = sheets['History']
+        
+        # Remove any existing bids from this bidder for this bid
+        bidder_bids_df = bidder_bids_df[~((bidder_bids_df['bid_id'] == bid_id) & 
+                                          (bidder_bids_df['bidder_id'] == bidder_id))]
+        
+        # Add new bids with one block of IDs
+        timestamp = current_timestamp()
+        new_bids = pd.DataFrame({
+            'bidder_bid_id': _reserve_ids(sheets['BidderItemBids'].get('bidder_bid_id', []), 'BB', len(item_rates)),
+            'bid_id': bid_id,
+            'bidder_id': bidder_id,
+            'item_id': item_rates.index.to_numpy(dtype=object),
+            'unit_rate': money.quantize(item_rates.to_numpy(dtype=float)),
+            'submission_date': timestamp
+        })
+        bidder_bids_df = pd.concat([bidder_bids_df, new_bids], ignore_index=True)
+        
+        # Re-rank this bid with the bidder's new total; other bidders' totals are reused
+        frames = {'BidderItemBids': bidder_bids_df}
+        bid_items = select_rows('BidItems', 'bid_id', [bid_id])
+        if 'BidderTotals' in workbook_sheet_names():
+            totals_df = read_sheet('BidderTotals')
+            bidder_row = compute_bidder_totals(new_bids, bid_items)
+            rows = totals_df[(totals_df['bid_id'] == bid_id) & (totals_df['bidder_id'] != bidder_id)] \
+                if not totals_df.empty else totals_df
+            frames['BidderTotals'] = _replace_bid_totals(totals_df, bid_id, pd.concat([rows, bidder_row], ignore_index=True))
+
+        # Refresh the price reference rows for the items this bid covers
+        if 'PriceIndex' in workbook_sheet_names():
+            frames['PriceIndex'] = _refresh_price_index(read_sheet('PriceIndex'), bidder_bids_df,
+                                                        read_sheet('BidItems'), bid_items)
+
+        # Add to history
+        new_history = pd.DataFrame([{
+            'history_id': _next_history_ids(history_df, 1)[0],
+            'bid_id': bid_id,
+            'action_date': timestamp,
+            'action_by': bidder_name,
+            'role': 'Bidder',
+            'action': 'Submitted Item Bids',
+            'comment': f"Submitted unit rates for {len(item_rates)} items",
+            'previous_status': None,
+            'new_status': None
+        }])
+        history_df = pd.concat([history_df, new_history], ignore_index=True)
+        frames['History'] = history_df
+        
+        return write_sheets(frames)
 
 def get_bidder_bids_for_bid(bid_id):
     """Get all bidder item bids for a specific bid"""
@@ -663,64 +1269,464 @@ def get_bidder_submission_for_bid(bid_id, bidder_id):
     return bidder_bids_df[(bidder_bids_df['bid_id'] == bid_id) & 
                          (bidder_bids_df['bidder_id'] == bidder_id)]
 
+# Materialized per-bid comparison: one row per (bid, bidder) with the bidder's
+# total over the bid's current items, the number of items priced and the rank
+# (1 = lowest total). Kept up to date by the functions that change rates or
+# items, so views read rankings instead of re-aggregating every rate.
+# total_amount is the exact sum of the line totals at money.LINE_DECIMALS;
+# it is rounded only for display.
+BIDDER_TOTALS_COLUMNS = ['bid_id', 'bidder_id', 'total_amount', 'item_count', 'rank', 'submission_date']
+
+def _rank_bidder_totals(totals_df):
+    """Sort totals by bid, then lowest total first (ties by bidder_id), and number the ranks"""
+    if totals_df.empty:
+        return pd.DataFrame(columns=BIDDER_TOTALS_COLUMNS)
+    ranked = totals_df.sort_values(['bid_id', 'total_amount', 'bidder_id'], kind='stable').reset_index(drop=True)
+    ranked['rank'] = ranked.groupby('bid_id', sort=False).cumcount() + 1
+    return ranked[BIDDER_TOTALS_COLUMNS]
+
+def _object_keys(df, columns):
+    """Cast merge key columns to object so int and 'ITEM007'-style IDs can be joined"""
+    return df.astype({column: object for column in columns})
+
+def _first_rates(submissions):
+    """One rate per (bid, bidder, item): the first submitted row wins, as in build_rate_matrix"""
+    if submissions.empty:
+        return submissions
+    return submissions.drop_duplicates(subset=['bid_id', 'bidder_id', 'item_id'], keep='first')
+
+def compute_bidder_totals(submissions, items):
+    """
+    Aggregate bidder totals from scratch for the bids in submissions
+    Only rates for items that currently belong to the bid are counted. Returns a
+    ranked DataFrame with BIDDER_TOTALS_COLUMNS.
+    """
+    if submissions.empty or items.empty:
+        return pd.DataFrame(columns=BIDDER_TOTALS_COLUMNS)
+
+    rates = _first_rates(submissions).dropna(subset=['unit_rate'])
+    keys = ['bid_id', 'item_id']
+    lines = _object_keys(rates, keys).merge(
+        _object_keys(items[['bid_id', 'item_id', 'quantity']], keys), on=keys, how='inner')
+    if lines.empty:
+        return pd.DataFrame(columns=BIDDER_TOTALS_COLUMNS)
+    lines['line_units'] = money.line_units(lines['unit_rate'], lines['quantity'])
+
+    totals = lines.groupby(['bid_id', 'bidder_id'], sort=False).agg(
+        total_units=('line_units', 'sum'),
+        item_count=('line_units', 'size')
+    ).reset_index()
+    totals['total_amount'] = money.from_units(totals['total_units'], money.LINE_DECIMALS)
+    first_dates = submissions.groupby(['bid_id', 'bidder_id'], sort=False)['submission_date'].first()
+    totals = totals.join(first_dates, on=['bid_id', 'bidder_id'])
+    return _rank_bidder_totals(totals)
+
+def _replace_bid_totals(totals_df, bid_id, rows):
+    """Swap in the totals rows of one bid and re-rank its bidders"""
+    others = totals_df[totals_df['bid_id'] != bid_id] if not totals_df.empty else totals_df
+    ranked = _rank_bidder_totals(rows)
+    if others.empty:
+        return ranked
+    return pd.concat([others, ranked], ignore_index=True)
+
+def _apply_item_deltas(totals_df, bid_id, items, sign):
+    """
+    Add (sign=1) or remove (sign=-1) the contribution of items to a bid's totals
+    items: DataFrame with item_id and quantity. Only the bid's existing rates for
+    these items are touched. Returns the updated totals, or None if nothing changed.
+    """
+    submissions = _first_rates(select_rows('BidderItemBids', 'bid_id', [bid_id]))
+    if submissions.empty:
+        return None
+    lines = _object_keys(submissions.dropna(subset=['unit_rate']), ['item_id']).merge(
+        _object_keys(items[['item_id', 'quantity']], ['item_id']), on='item_id', how='inner')
+    if lines.empty:
+        return None
+    lines['line_units'] = money.line_units(lines['unit_rate'], lines['quantity'])
+    deltas = lines.groupby('bidder_id', sort=False).agg(
+        delta_units=('line_units', 'sum'), delta_count=('line_units', 'size'))
+
+    rows = totals_df[totals_df['bid_id'] == bid_id] if not totals_df.empty else pd.DataFrame(columns=BIDDER_TOTALS_COLUMNS)
+    rows = rows.merge(deltas.reset_index(), on='bidder_id', how='outer')
+    rows['bid_id'] = bid_id
+    # One row per bidder: add as Python ints so a total near the int64 limit cannot wrap
+    total_units = money.as_units(
+        money.to_units(rows['total_amount'].astype(float), money.LINE_DECIMALS).astype(object) +
+        sign * money.as_units(rows['delta_units'].fillna(0)).astype(object))
+    rows['total_amount'] = money.from_units(total_units, money.LINE_DECIMALS)
+    rows['item_count'] = rows['item_count'].fillna(0).astype(int) + sign * rows['delta_count'].fillna(0).astype(int)
+    first_dates = submissions.groupby('bidder_id', sort=False)['submission_date'].first()
+    rows['submission_date'] = rows['submission_date'].fillna(rows['bidder_id'].map(first_dates))
+    return _replace_bid_totals(totals_df, bid_id, rows[rows['item_count'] > 0])
+
+def rebuild_bidder_totals():
+    """Recompute the BidderTotals sheet for every bid from the rates; returns the row count"""
+    with _db_lock:
+        sheets = read_sheets(['BidderItemBids', 'BidItems'])
+        totals_df = compute_bidder_totals(sheets['BidderItemBids'], sheets['BidItems'])
+        if not write_sheet(totals_df, 'BidderTotals'):
+            return None
+    return len(totals_df)
+
+def ensure_materialized_sheets(dry_run=False):
+    """
+    Build the materialized sheets a workbook is missing, or has in an older layout
+    Run by admin_tools.py migrate and when app.py starts the development server,
+    never on import; returns the names of the sheets that were built, or with
+    dry_run those that would be.
+    """
+    if not os.path.exists(DATABASE_FILE):
+        return []
+    builders = {
+        'BidderTotals': (BIDDER_TOTALS_COLUMNS, rebuild_bidder_totals),
+        'PriceIndex': (PRICE_INDEX_COLUMNS, rebuild_price_index)
+    }
+    built = []
+    with _db_lock:
+        for sheet, (columns, rebuild) in builders.items():
+            if sheet in workbook_sheet_names() and set(columns) <= set(read_sheet(sheet).columns):
+                continue
+            if dry_run or rebuild() is not None:
+                built.append(sheet)
+    return built
+
+def get_bid_rankings(bid_ids):
+    """
+    Return the materialized totals rows for the given bids, ordered by bid and rank
+    Workbooks created before the BidderTotals sheet existed get it from
+    ensure_materialized_sheets(); until then the totals are computed in memory.
+    """
+    bid_ids = list(bid_ids)
+    if 'BidderTotals' in workbook_sheet_names():
+        rankings = select_rows('BidderTotals', 'bid_id', bid_ids)
+    else:
+        rankings = compute_bidder_totals(select_rows('BidderItemBids', 'bid_id', bid_ids),
+                                         select_rows('BidItems', 'bid_id', bid_ids))
+    if rankings.empty:
+        return pd.DataFrame(columns=BIDDER_TOTALS_COLUMNS)
+    return rankings.sort_values(['bid_id', 'rank'], kind='stable')
+
+# Materialized price reference across tenders: for every bid that has rates, one
+# row per normalized (item name, unit) it quotes, with percentiles of the unit
+# rates the other bids received for that item. A bid is therefore compared with
+# history only, never with its own quotes. Rows are recomputed for the touched
+# keys whenever rates are submitted, so views need one indexed lookup by bid.
+PRICE_INDEX_PERCENTILES = [10, 25, 50, 75, 90]
+PRICE_INDEX_COLUMNS = (['bid_id', 'item_key', 'unit_key', 'sample_count'] +
+                       [f'p{p}' for p in PRICE_INDEX_PERCENTILES] +
+                       ['min_rate', 'max_rate', 'updated_date'])
+PRICE_REFERENCE_COLUMNS = PRICE_INDEX_COLUMNS[3:-1]
+
+def normalize_item_key(values):
+    """Lowercase item names or units and reduce punctuation and spacing, so 'Office  Desk.' == 'office desk'"""
+    keys = pd.Series(values, dtype=object).fillna('').astype(str).str.lower()
+    keys = keys.str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip()
+    return keys.where(~keys.isin(['nan', 'none']), '')
+
+def _price_keys(items):
+    """item_key / unit_key columns for BidItems rows"""
+    return pd.DataFrame({
+        'item_key': normalize_item_key(items['item_name']).to_numpy(),
+        'unit_key': normalize_item_key(items['unit']).to_numpy()
+    }, index=items.index)
+
+def _index_key_columns(index_df):
+    """Excel reads numeric-looking keys back as numbers and blank units as NaN; restore the strings"""
+    if index_df.empty:
+        return index_df
+    index_df = index_df.copy()
+    for column in ['item_key', 'unit_key']:
+        index_df[column] = index_df[column].astype(object).where(index_df[column].notna(), '').astype(str)
+    return index_df
+
+def _other_order_stats(own, stride, group_start, group, first, ranks):
+    """
+    Positions in the sorted rates of the ranks-th smallest rate of the other bids
+    own: sorted group * stride + position of each rate, where a group is one bid's
+    rates for one key; first: position of the key's lowest rate. Skipping the
+    bid's own rates converges in at most one step per own rate.
+    """
+    position = first + ranks
+    while True:
+        skipped = np.searchsorted(own, group * stride + position, side='right') - group_start[group]
+        moved = first + ranks + skipped
+        if np.array_equal(moved, position):
+            return position
+        position = moved
+
+def compute_price_index(submissions, items):
+    """
+    Leave-one-bid-out rate percentiles: for each bid in submissions and each
+    normalized item name and unit it quotes, the percentiles of the rates the
+    other bids in submissions received for it (linear interpolation, as pandas'
+    quantile). Order statistics of the other bids are read from one sort of all
+    rates. Returns PRICE_INDEX_COLUMNS rows; keys no other bid has quoted get no row.
+    """
+    if submissions.empty or items.empty:
+        return pd.DataFrame(columns=PRICE_INDEX_COLUMNS)
+
+    keyed = pd.concat([items[['bid_id', 'item_id']], _price_keys(items)], axis=1)
+    keyed = keyed[keyed['item_key'] != '']
+    rates = _first_rates(submissions).dropna(subset=['unit_rate'])
+    keys = ['bid_id', 'item_id']
+    lines = _object_keys(rates[keys + ['unit_rate']], keys).merge(_object_keys(keyed, keys), on=keys, how='inner')
+    if lines.empty:
+        return pd.DataFrame(columns=PRICE_INDEX_COLUMNS)
+    lines['unit_rate'] = lines['unit_rate'].astype(float)
+    lines = lines.sort_values(['item_key', 'unit_key', 'unit_rate'], kind='stable', ignore_index=True)
+    values = lines['unit_rate'].to_numpy()
+
+    # Each key's rates are contiguous; a group is one bid's rates within one key
+    key = lines.groupby(['item_key', 'unit_key'], sort=False).ngroup().to_numpy()
+    key_first = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    key_size = np.diff(np.r_[key_first, len(lines)])
+    grouped = lines.groupby(['item_key', 'unit_key', 'bid_id'], sort=False)
+    group = grouped.ngroup().to_numpy()
+    order = np.lexsort((np.arange(len(lines)), group))
+    group_start = np.searchsorted(group[order], np.arange(group.max() + 1))
+    stride = len(lines) + 1
+    own = group[order].astype(np.int64) * stride + order
+
+    heads = lines.loc[order[group_start], ['bid_id', 'item_key', 'unit_key']].reset_index(drop=True)
+    groups = np.arange(len(heads))
+    first = key_first[key[order[group_start]]]
+    count = key_size[key[order[group_start]]] - np.diff(np.r_[group_start, len(lines)])
+    has_others = count > 0
+    heads, groups, first, count = heads[has_others], groups[has_others], first[has_others], count[has_others]
+
+    def other_rate(ranks):
+        return values[_other_order_stats(own, stride, group_start, groups, first, ranks)]
+
+    index_df = heads.reset_index(drop=True)
+    index_df['sample_count'] = count
+    for percentile in PRICE_INDEX_PERCENTILES:
+        positions = (count - 1) * percentile / 100
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, count - 1)
+        low_rate = other_rate(lower)
+        index_df[f'p{percentile}'] = low_rate + (positions - lower) * (other_rate(upper) - low_rate)
+    index_df['min_rate'] = other_rate(np.zeros_like(count))
+    index_df['max_rate'] = other_rate(count - 1)
+    index_df['updated_date'] = current_timestamp()
+    return index_df[PRICE_INDEX_COLUMNS].sort_values(['item_key', 'unit_key'], kind='stable', ignore_index=True)
+
+def _related_price_rows(submissions, items_df, bid_items):
+    """
+    Index rows for every bid quoting the (item_key, unit_key) pairs of bid_items
+    submissions and items_df are the full BidderItemBids and BidItems sheets.
+    Returns (the touched keys, their recomputed rows).
+    """
+    touched = _price_keys(bid_items).drop_duplicates()
+    touched = touched[touched['item_key'] != '']
+    if touched.empty:
+        return touched, pd.DataFrame(columns=PRICE_INDEX_COLUMNS)
+
+    all_keys = _price_keys(items_df)
+    matching = all_keys.merge(touched, on=['item_key', 'unit_key'], how='left', indicator=True)['_merge'] == 'both'
+    related = items_df[matching.to_numpy()]
+    rows = compute_price_index(submissions[submissions['bid_id'].isin(related['bid_id'].unique())], related)
+    return touched, rows
+
+def _refresh_price_index(index_df, submissions, items_df, bid_items):
+    """Recompute the index rows of every bid for the (item_key, unit_key) pairs of bid_items"""
+    touched, rows = _related_price_rows(submissions, items_df, bid_items)
+    if touched.empty:
+        return index_df
+
+    index_df = _index_key_columns(index_df)
+    if index_df.empty:
+        return rows
+    stale = index_df[['item_key', 'unit_key']].merge(touched, how='left', indicator=True)['_merge'] == 'both'
+    kept = index_df[~stale.to_numpy()]
+    return pd.concat([kept, rows], ignore_index=True).sort_values(['item_key', 'unit_key'], kind='stable')
+
+def rebuild_price_index():
+    """Recompute the PriceIndex sheet from every submitted rate; returns the row count"""
+    with _db_lock:
+        sheets = read_sheets(['BidderItemBids', 'BidItems'])
+        index_df = compute_price_index(sheets['BidderItemBids'], sheets['BidItems'])
+        if not write_sheet(index_df, 'PriceIndex'):
+            return None
+    return len(index_df)
+
+def get_price_reference(items):
+    """
+    Rate percentiles of other bids for each row of items (BidItems rows), aligned
+    to items' index; rows without history are NaN. Workbooks created before the
+    PriceIndex sheet existed get it from ensure_materialized_sheets(); until then
+    the reference is computed in memory.
+    """
+    keys = _price_keys(items)
+    keys['bid_id'] = items['bid_id'].to_numpy(dtype=object)
+    bid_ids = keys['bid_id'].unique().tolist()
+    if 'PriceIndex' in workbook_sheet_names():
+        index_df = _index_key_columns(select_rows('PriceIndex', 'bid_id', bid_ids))
+    else:
+        sheets = read_sheets(['BidderItemBids', 'BidItems'])
+        _, index_df = _related_price_rows(sheets['BidderItemBids'], sheets['BidItems'], items)
+        index_df = index_df[index_df['bid_id'].isin(bid_ids)]
+    if index_df.empty:
+        return pd.DataFrame(index=items.index, columns=PRICE_REFERENCE_COLUMNS, dtype=float)
+    reference = _object_keys(keys, ['bid_id']).merge(
+        _object_keys(index_df, ['bid_id']), on=['bid_id', 'item_key', 'unit_key'], how='left')
+    reference.index = items.index
+    return reference[PRICE_REFERENCE_COLUMNS].astype(float)
+
 def get_all_bidder_bids_with_totals(bid_id):
     """
     Get all bidder bids for a bid with calculated totals
-    Returns a structured dict with bidder info and their total bid amounts
+    Returns a structured dict with bidder info and their total bid amounts,
+    ordered by the precomputed rank (lowest total first)
     """
-    bidder_bids_df = read_sheet('BidderItemBids')
-    items_df = read_sheet('BidItems')
-    bidders_df = read_sheet('Bidders')
-    
-    # Filter for this bid
-    bid_submissions = bidder_bids_df[bidder_bids_df['bid_id'] == bid_id]
-    bid_items = items_df[items_df['bid_id'] == bid_id]
-    
-    if bid_submissions.empty:
+    rankings = get_bid_rankings([bid_id])
+    if rankings.empty:
         return []
-    
-    # Calculate totals for each bidder
+
+    bidders_df = read_sheet('Bidders')
+    bid_items = select_rows('BidItems', 'bid_id', [bid_id])
+    rates = _first_rates(select_rows('BidderItemBids', 'bid_id', [bid_id])).dropna(subset=['unit_rate'])
+    lines = _object_keys(bid_items, ['item_id']).merge(
+        _object_keys(rates[['bidder_id', 'item_id', 'unit_rate']], ['item_id']), on='item_id', how='inner')
+    lines['quantity'] = lines['quantity'].astype(float)
+    lines['unit_rate'] = lines['unit_rate'].astype(float)
+    lines['total'] = money.from_units(money.line_units(lines['unit_rate'], lines['quantity']), money.LINE_DECIMALS)
+    detail_columns = ['item_id', 'item_name', 'item_description', 'quantity', 'unit', 'unit_rate', 'total']
+    lines_by_bidder = dict(tuple(lines.groupby('bidder_id', sort=False))) if not lines.empty else {}
+    bidder_info = bidders_df.drop_duplicates(subset=['bidder_id']).set_index('bidder_id') if not bidders_df.empty else bidders_df
+
     bidder_totals = []
-    for bidder_id in bid_submissions['bidder_id'].unique():
-        bidder_items = bid_submissions[bid_submissions['bidder_id'] == bidder_id]
-        bidder_info = bidders_df[bidders_df['bidder_id'] == bidder_id]
-        
-        if bidder_info.empty:
+    for ranking in rankings.to_dict('records'):
+        bidder_id = ranking['bidder_id']
+        if bidder_id not in bidder_info.index:
             continue
-        
-        total = 0
-        item_details = []
-        
-        for _, bid_item in bid_items.iterrows():
-            item_bid = bidder_items[bidder_items['item_id'] == bid_item['item_id']]
-            if not item_bid.empty:
-                unit_rate = float(item_bid.iloc[0]['unit_rate'])
-                quantity = float(bid_item['quantity'])
-                item_total = unit_rate * quantity
-                total += item_total
-                
-                item_details.append({
-                    'item_id': bid_item['item_id'],
-                    'item_name': bid_item['item_name'],
-                    'item_description': bid_item['item_description'],
-                    'quantity': quantity,
-                    'unit': bid_item['unit'],
-                    'unit_rate': unit_rate,
-                    'total': item_total
-                })
-        
+        info = bidder_info.loc[bidder_id]
+        bidder_lines = lines_by_bidder.get(bidder_id, lines.iloc[0:0])
         bidder_totals.append({
             'bidder_id': bidder_id,
-            'bidder_name': bidder_info.iloc[0]['bidder_name'],
-            'contact_email': bidder_info.iloc[0]['contact_email'],
-            'contact_phone': bidder_info.iloc[0]['contact_phone'],
-            'total_bid_amount': total,
-            'bid_items': item_details,
-            'submission_date': bidder_items.iloc[0]['submission_date'] if not bidder_items.empty else ''
+            'bidder_name': info['bidder_name'],
+            'contact_email': info['contact_email'],
+            'contact_phone': info['contact_phone'],
+            'total_bid_amount': float(ranking['total_amount']),
+            'item_count': int(ranking['item_count']),
+            'rank': int(ranking['rank']),
+            'bid_items': bidder_lines[detail_columns].to_dict('records'),
+            'submission_date': ranking['submission_date']
         })
-    
-    # Sort by total bid amount (lowest first)
-    bidder_totals.sort(key=lambda x: x['total_bid_amount'])
-    
+
     return bidder_totals
 
+
+def build_rate_matrix(submissions, items):
+    """
+    Pivot BidderItemBids rows into a bidders x items unit-rate matrix
+    Columns follow the order of items; missing rates are NaN and bidders without
+    a rate for any of the items are dropped. The first submission row wins on
+    duplicates, as in the per-item lookups this replaces.
+    """
+    item_ids = items['item_id'].tolist() if not items.empty else []
+    if submissions.empty or not item_ids:
+        return pd.DataFrame(columns=item_ids, dtype=float)
+
+    rates = submissions[submissions['item_id'].isin(item_ids)]
+    rates = rates.drop_duplicates(subset=['bidder_id', 'item_id'], keep='first')
+    matrix = rates.pivot(index='bidder_id', columns='item_id', values='unit_rate')
+    matrix = matrix.reindex(columns=item_ids).astype(float)
+    return matrix.dropna(how='all')
+
+def get_bid_bundle(bid_id):
+    """
+    Prefetch everything needed to report on a bid from one workbook read
+    Returns None if the bid does not exist, otherwise a dict with:
+      bid             - cleaned bid record (as get_bid_by_id)
+      items           - BidItems rows for the bid
+      rates           - bidders x items unit-rate matrix (NaN where not quoted)
+      line_totals     - rates multiplied by item quantities
+      bidder_totals   - total bid amount per bidder, lowest first (from BidderTotals)
+      rankings        - BidderTotals rows for the bid, in rank order
+      bidders         - bidder_id -> bidder record for every bidder in rates
+      assigned_buyer  - buyer record for selected_buyer_id, or None
+      history         - History rows for the bid, newest first
+      version         - data_version() taken before the bundle was read
+    """
+    return get_bid_bundles([bid_id]).get(bid_id)
+
+def get_bid_bundles(bid_ids):
+    """
+    Batch version of get_bid_bundle
+    Returns a dict of bid_id -> bundle for the bids that exist. All bids share
+    one read of each sheet and indexed row lookups, however many are requested.
+    """
+    bid_ids = list(dict.fromkeys(bid_ids))
+    version = data_version()
+    bids_df = _clean_bids_dataframe(select_rows('Bids', 'bid_id', bid_ids))
+    if bids_df.empty:
+        return {}
+
+    items_df = select_rows('BidItems', 'bid_id', bid_ids)
+    submissions_df = select_rows('BidderItemBids', 'bid_id', bid_ids)
+    history_df = select_rows('History', 'bid_id', bid_ids)
+    rankings_df = get_bid_rankings(bid_ids)
+    lookups = read_sheets(['Bidders', 'Buyers', 'Vendors'])
+    bidders_df = lookups['Bidders']
+    buyers_df = lookups['Buyers']
+    vendors_df = lookups['Vendors']
+    if 'technical_capability' in buyers_df.columns:
+        buyers_df = buyers_df.drop(columns=['technical_capability'])
+
+    items_by_bid = dict(tuple(items_df.groupby('bid_id', sort=False))) if not items_df.empty else {}
+    submissions_by_bid = dict(tuple(submissions_df.groupby('bid_id', sort=False))) if not submissions_df.empty else {}
+    history_by_bid = dict(tuple(history_df.groupby('bid_id', sort=False))) if not history_df.empty else {}
+    rankings_by_bid = dict(tuple(rankings_df.groupby('bid_id', sort=False))) if not rankings_df.empty else {}
+
+    bundles = {}
+    for bid in bids_df.drop_duplicates(subset=['bid_id']).to_dict('records'):
+        bid_id = bid['bid_id']
+
+        vendor_id = bid.get('admin_name', '')
+        if vendor_id and not pd.isna(vendor_id):
+            vendor = vendors_df[vendors_df['vendor_id'] == vendor_id] if not vendors_df.empty else vendors_df
+            bid['vendor_name'] = vendor.iloc[0].get('vendor_name', vendor_id) if not vendor.empty else vendor_id
+        else:
+            bid['vendor_name'] = bid.get('vendor_name') or 'N/A'
+
+        items = items_by_bid.get(bid_id, items_df.iloc[0:0])
+        submissions = submissions_by_bid.get(bid_id, submissions_df.iloc[0:0])
+
+        rates = build_rate_matrix(submissions, items)
+        quantities = items['quantity'].astype(float).to_numpy() if not items.empty else []
+        line_totals = pd.DataFrame(money.line_amounts(rates.to_numpy(dtype=float), quantities),
+                                   index=rates.index, columns=rates.columns) if not rates.empty else rates
+        rankings = rankings_by_bid.get(bid_id, rankings_df.iloc[0:0])
+        bidder_totals = pd.Series(rankings['total_amount'].astype(float).to_numpy(),
+                                  index=rankings['bidder_id'].to_numpy(), dtype=float)
+
+        bidders = {}
+        if not bidders_df.empty and not rates.empty:
+            known = bidders_df[bidders_df['bidder_id'].isin(rates.index)].drop_duplicates(subset=['bidder_id'])
+            bidders = {row['bidder_id']: row for row in known.to_dict('records')}
+
+        assigned_buyer = None
+        buyer_id = str(bid.get('selected_buyer_id', '')).strip()
+        if buyer_id and not buyers_df.empty:
+            buyer = buyers_df[buyers_df['buyer_id'] == buyer_id]
+            if not buyer.empty:
+                assigned_buyer = buyer.iloc[0].to_dict()
+
+        history = history_by_bid.get(bid_id, history_df.iloc[0:0])
+        if not history.empty:
+            history = history.sort_values('action_date', ascending=False)
+
+        bundles[bid_id] = {
+            'bid': bid,
+            'items': items,
+            'rates': rates,
+            'line_totals': line_totals,
+            'bidder_totals': bidder_totals,
+            'rankings': rankings,
+            'bidders': bidders,
+            'assigned_buyer': assigned_buyer,
+            'history': history,
+            'version': version
+        }
+
+    return bundles
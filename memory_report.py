@@ -0,0 +1,350 @@
+"""
+Memory diagnostics: tracemalloc snapshots per request type and cache sizes
+
+With BID_MEMORY_PROFILE=1 the app starts tracemalloc and, after the first request
+of each endpoint and every SNAPSHOT_EVERY requests after that, takes a snapshot
+and keeps its allocation totals per source line. tracemalloc sees the whole
+process, so a snapshot covers every thread; it is filed under the endpoint whose
+request triggered it. The report shows, per endpoint and for the process as a
+whole, the top allocation sites and their growth since the first snapshot,
+along with the size of every cached sheet, row index and analysis result.
+
+The report is served as JSON at /admin/memory (Vendor only). From the command
+line it can be fetched from a running server, or produced by replaying page
+views against a copy of the app in this process:
+
+Usage:
+    python memory_report.py --url http://localhost:5000
+    python memory_report.py --rounds 20 --database database.xlsx
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MEMORY_PROFILING = os.environ.get('BID_MEMORY_PROFILE', '').strip().lower() in {'1', 'true', 'yes', 'on'}
+
+# Stack frames stored per allocation; sites are reported by their innermost
+# line, and every extra frame makes traced allocations noticeably slower
+TRACEMALLOC_FRAMES = 1
+
+# Requests of one endpoint between snapshots (the first request is always snapshotted)
+SNAPSHOT_EVERY = 50
+
+# Allocation sites listed per report section
+TOP_SITES = 15
+
+# Largest allocation sites kept from each snapshot; growth is compared over these
+SITES_KEPT = 1000
+
+_lock = threading.Lock()
+_requests = {}
+_process = {}
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def start():
+    """Start tracemalloc if memory profiling is enabled and it is not running yet"""
+    if MEMORY_PROFILING and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+def _site_name(frame):
+    filename = frame.filename.replace('\\', '/')
+    if 'site-packages/' in filename:
+        filename = filename.split('site-packages/', 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.lineno}"
+
+
+def _site_totals():
+    """
+    Current traced memory per allocation site, as ({site: (bytes, blocks)}, total
+    bytes). Allocations made by this module, such as stored snapshots, are left out.
+    """
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    totals = {}
+    for stat in snapshot.statistics('lineno'):
+        site = _site_name(stat.traceback[0])
+        size, count = totals.get(site, (0, 0))
+        totals[site] = (size + stat.size, count + stat.count)
+    largest = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:SITES_KEPT]
+    return dict(largest), sum(size for size, _ in totals.values())
+
+
+def _update_record(record, totals, traced):
+    now = datetime.now().isoformat(timespec='seconds')
+    if 'baseline' not in record:
+        record.update(baseline=totals, baseline_at=now, baseline_traced=traced)
+    record.update(latest=totals, latest_at=now, latest_traced=traced,
+                  snapshots=record.get('snapshots', 0) + 1)
+
+
+def record_request(endpoint):
+    """Count a finished request and snapshot memory when its endpoint is due"""
+    if not tracemalloc.is_tracing():
+        return
+    with _lock:
+        record = _requests.setdefault(endpoint or 'unmatched', {'requests': 0})
+        record['requests'] += 1
+        _process['requests'] = _process.get('requests', 0) + 1
+        due = record['requests'] == 1 or record['requests'] % SNAPSHOT_EVERY == 0
+    if not due:
+        return
+
+    totals, traced = _site_totals()
+    with _lock:
+        _update_record(record, totals, traced)
+        _update_record(_process, totals, traced)
+
+
+def _top_sites(totals, limit):
+    ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return [{'site': site, 'bytes': size, 'blocks': count} for site, (size, count) in ranked]
+
+
+def _growth(baseline, latest, limit):
+    changes = []
+    for site in set(baseline) | set(latest):
+        size, count = latest.get(site, (0, 0))
+        old_size, old_count = baseline.get(site, (0, 0))
+        if size != old_size:
+            changes.append({'site': site, 'bytes': size, 'growth_bytes': size - old_size,
+                            'growth_blocks': count - old_count})
+    changes.sort(key=lambda change: change['growth_bytes'], reverse=True)
+    return changes[:limit]
+
+
+def _summarize(record, limit):
+    if 'latest' not in record:
+        return {'requests': record.get('requests', 0), 'snapshots': 0}
+    return {
+        'requests': record.get('requests', 0),
+        'snapshots': record['snapshots'],
+        'baseline_at': record['baseline_at'],
+        'latest_at': record['latest_at'],
+        'traced_bytes': record['latest_traced'],
+        'traced_growth_bytes': record['latest_traced'] - record['baseline_traced'],
+        'top_sites': _top_sites(record['latest'], limit),
+        'growth': _growth(record['baseline'], record['latest'], limit)
+    }
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by obj, counting DataFrames, arrays and containers deeply"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) if obj.base is None else obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def cache_footprint():
+    """Size of each cached sheet, row index and analysis result set"""
+    import bid_analysis
+    import db_helper as db
+
+    cached = db.cached_objects()
+    sheets = [{'sheet': sheet, 'rows': len(df), 'columns': len(df.columns), 'bytes': deep_size(df)}
+              for sheet, df in cached['sheets'].items()]
+    indexes = [{'sheet': sheet, 'column': column, 'keys': len(index), 'bytes': deep_size(index)}
+               for (sheet, column), index in cached['indexes'].items()]
+    results = [{'cache': name, 'entries': len(entries), 'bytes': deep_size(entries)}
+               for name, entries in bid_analysis.cached_results().items()]
+    for rows in (sheets, indexes):
+        rows.sort(key=lambda row: row['bytes'], reverse=True)
+    return {
+        'sheets': sheets,
+        'indexes': indexes,
+        'analysis': results,
+        'total_bytes': sum(row['bytes'] for row in sheets + indexes + results)
+    }
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def report(limit=TOP_SITES):
+    """Everything above as one JSON-serialisable dict"""
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (None, None)
+    with _lock:
+        requests = {endpoint: _summarize(record, limit) for endpoint, record in _requests.items()}
+        process = _summarize(_process, limit)
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rss_bytes': rss_bytes(),
+        'tracemalloc': {'enabled': tracing, 'traced_bytes': current, 'peak_bytes': peak,
+                        'snapshot_every': SNAPSHOT_EVERY},
+        'caches': cache_footprint(),
+        'process': process,
+        'requests': dict(sorted(requests.items()))
+    }
+
+
+def reset():
+    """Forget all snapshots, so the next ones become the new baselines"""
+    with _lock:
+        _requests.clear()
+        _process.clear()
+
+
+def _mb(size):
+    return 'n/a' if size is None else f"{size / (1024 * 1024):,.2f} MB"
+
+
+def format_report(data, limit=TOP_SITES):
+    """Plain-text rendering of report() for the command line"""
+    lines = [f"RSS: {_mb(data['rss_bytes'])}"]
+    tracing = data['tracemalloc']
+    if tracing['enabled']:
+        lines.append(f"tracemalloc: {_mb(tracing['traced_bytes'])} traced, {_mb(tracing['peak_bytes'])} peak")
+    else:
+        lines.append("tracemalloc: off (set BID_MEMORY_PROFILE=1)")
+
+    caches = data['caches']
+    lines += ['', f"Caches: {_mb(caches['total_bytes'])}"]
+    for row in caches['sheets']:
+        lines.append(f"  sheet {row['sheet']:<24}{row['rows']:>9} rows {_mb(row['bytes']):>14}")
+    for row in caches['indexes']:
+        lines.append(f"  index {row['sheet'] + '.' + row['column']:<24}{row['keys']:>9} keys {_mb(row['bytes']):>14}")
+    for row in caches['analysis']:
+        lines.append(f"  {row['cache']:<30}{row['entries']:>9} bids {_mb(row['bytes']):>14}")
+
+    sections = [('process', data['process'])] + list(data['requests'].items())
+    for name, section in sections:
+        if not section.get('snapshots'):
+            continue
+        lines += ['', f"{name}: {section['requests']} request(s), {section['snapshots']} snapshot(s), "
+                      f"traced {_mb(section['traced_bytes'])} ({section['traced_growth_bytes'] / 1024:+,.1f} KB)"]
+        lines.append('  growth since first snapshot:')
+        for row in section['growth'][:limit]:
+            lines.append(f"    {row['growth_bytes'] / 1024:>+12,.1f} KB  {row['site']}")
+        lines.append('  top allocation sites:')
+        for row in section['top_sites'][:limit]:
+            lines.append(f"    {row['bytes'] / 1024:>12,.1f} KB  {row['site']}")
+    return '\n'.join(lines)
+
+
+def fetch_report(url):
+    """Get the report of a running server, switching to the Vendor role first"""
+    import http.cookiejar
+    import urllib.request
+
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    base = url.rstrip('/')
+    opener.open(f"{base}/switch_role/Vendor").read()
+    with opener.open(f"{base}/admin/memory") as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def replay_requests(rounds):
+    """
+    Load the main pages of every bid `rounds` times, as each role, with the
+    Flask test client. Returns the number of requests made. Importing the app
+    starts tracemalloc when MEMORY_PROFILING is set.
+    """
+    import app as bid_app
+    import db_helper as db
+
+    client = bid_app.app.test_client()
+    bids = db.get_all_bids()
+    bid_ids = bids['bid_id'].dropna().astype(str).tolist() if not bids.empty else []
+    buyers = db.read_sheet('Buyers')
+    buyer_id = str(buyers.iloc[0]['buyer_id']) if not buyers.empty else None
+
+    pages = {
+        'Vendor': ['/vendor/dashboard'] + [f"/vendor/view_bid/{bid_id}" for bid_id in bid_ids],
+        'A1 Approver': ['/a1/dashboard'] + [f"/a1/view_bid/{bid_id}" for bid_id in bid_ids],
+        'A2 Approver': ['/a2/dashboard'] + [f"/a2/view_bid/{bid_id}" for bid_id in bid_ids],
+    }
+    count = 0
+    for _ in range(rounds):
+        for role, urls in pages.items():
+            client.get(f"/switch_role/{role}")
+            for url in urls:
+                client.get(url)
+                count += 1
+        if buyer_id:
+            client.get('/switch_role/Buyer')
+            client.post('/buyer/login', data={'buyer_id': buyer_id})
+            for bid_id in bid_ids:
+                client.get(f"/buyer/view_bid/{bid_id}")
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report memory use by request type and cache')
+    parser.add_argument('--url', help='Fetch the report from a running server instead, e.g. http://localhost:5000')
+    parser.add_argument('--database', default='database.xlsx', help='Path to database.xlsx (replay mode)')
+    parser.add_argument('--rounds', type=int, default=10, help='Times every page is loaded (replay mode)')
+    parser.add_argument('--snapshot-every', type=int, default=None,
+                        help='Requests per endpoint between snapshots (replay mode; default: --rounds)')
+    parser.add_argument('--top', type=int, default=TOP_SITES, help='Allocation sites listed per section')
+    parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        try:
+            data = fetch_report(args.url)
+        except Exception as e:
+            print(f"Error fetching memory report from {args.url}: {e}")
+            return 1
+    else:
+        # The app records requests through the imported module, not __main__
+        import db_helper as db
+        import memory_report
+        db.DATABASE_FILE = args.database
+        memory_report.MEMORY_PROFILING = True
+        memory_report.SNAPSHOT_EVERY = max(args.snapshot_every or args.rounds, 1)
+        started = time.perf_counter()
+        count = memory_report.replay_requests(max(args.rounds, 1))
+        print(f"Replayed {count} page view(s) in {time.perf_counter() - started:.1f}s")
+        data = memory_report.report(args.top)
+
+    print(json.dumps(data, indent=2) if args.json else format_report(data, args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+In-process metrics in the Prometheus text format
+
+Counters and latency histograms are kept in module-level dicts guarded by one
+lock, so every thread of the worker adds to the same totals. app.py times each
+route and wraps the public db_helper functions with instrument_functions;
+db_helper counts sheet reads, writes, bytes, rows and cache hits itself.
+render() produces the text served at /metrics.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+# name -> (type, help) for the # HELP / # TYPE lines
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint, method and status'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'db_function_duration_seconds': ('histogram', 'Latency of db_helper functions'),
+    'db_function_errors_total': ('counter', 'db_helper calls that raised an exception'),
+    'sheet_reads_total': ('counter', 'Sheets parsed from the workbook'),
+    'sheet_rows_read_total': ('counter', 'Rows parsed from the workbook'),
+    'sheet_cache_hits_total': ('counter', 'Sheet reads served from the parsed-sheet cache'),
+    'sheet_index_lookups_total': ('counter', 'select_rows lookups, by whether the row index was cached'),
+    'sheet_rows_selected_total': ('counter', 'Rows returned by select_rows'),
+    'sheet_writes_total': ('counter', 'Sheets replaced by workbook writes'),
+    'sheet_rows_written_total': ('counter', 'Rows written to replaced sheets'),
+    'workbook_opens_total': ('counter', 'Times the workbook file was opened for parsing'),
+    'workbook_bytes_read_total': ('counter', 'Workbook bytes opened for parsing'),
+    'workbook_writes_total': ('counter', 'Workbook rewrites'),
+    'workbook_bytes_written_total': ('counter', 'Workbook bytes written'),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add amount to a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(DEFAULT_BUCKETS), 'sum': 0.0, 'count': 0}
+        position = bisect.bisect_left(DEFAULT_BUCKETS, seconds)
+        if position < len(DEFAULT_BUCKETS):
+            histogram['buckets'][position] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+
+def reset():
+    """Forget all recorded values"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def instrument_functions(module):
+    """
+    Replace every public function defined in module with a wrapper that records
+    its latency in db_function_duration_seconds. Calls between the module's own
+    functions go through the module globals, so they are timed as well.
+    """
+    for name, function in list(vars(module).items()):
+        if name.startswith('_') or not inspect.isfunction(function):
+            continue
+        if function.__module__ != module.__name__ or getattr(function, '_metrics_timed', False):
+            continue
+        setattr(module, name, _timed_function(function))
+
+
+def _timed_function(function):
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            inc('db_function_errors_total', function=name)
+            raise
+        finally:
+            observe('db_function_duration_seconds', time.perf_counter() - start, function=name)
+
+    wrapper._metrics_timed = True
+    return wrapper
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                      for key, h in _histograms.items()}
+
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, help_text = METRICS.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]!r}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,121 @@
+"""
+Fixed-point money arithmetic
+
+Amounts are handled as int64 counts of the smallest currency unit (cents with
+the default two decimal places), so totals are exact and computed as whole
+arrays. Quantities have their own scale; a line total (unit rate x quantity)
+is exact at the combined scale, LINE_DECIMALS. Values are rounded only when
+they are displayed, with format_amount.
+
+int64 holds line amounts up to about 9.2e13 at the default scales. Counts that
+could go past that are kept as Python ints (object arrays) instead, which stay
+exact at any size, only slower.
+
+The number of decimal places comes from the BID_MONEY_DECIMALS and
+BID_QUANTITY_DECIMALS environment variables (defaults 2 and 3).
+"""
+import os
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+MONEY_DECIMALS = int(os.environ.get('BID_MONEY_DECIMALS', 2))
+QUANTITY_DECIMALS = int(os.environ.get('BID_QUANTITY_DECIMALS', 3))
+LINE_DECIMALS = MONEY_DECIMALS + QUANTITY_DECIMALS
+
+# Unit counts whose magnitude reaches this do not fit in int64
+INT64_BOUND = 2.0 ** 63
+
+_python_int = np.frompyfunc(int, 1, 1)
+
+
+def as_units(values):
+    """
+    Whole unit counts as int64, or as Python ints (object dtype) when any of them
+    is outside the int64 range, so large amounts stay exact instead of wrapping
+    """
+    values = np.asarray(values)
+    if values.size and float(np.abs(values).max()) >= INT64_BOUND:
+        return np.asarray(_python_int(values), dtype=object)
+    return values.astype(np.int64)
+
+
+def to_units(values, decimals=MONEY_DECIMALS):
+    """
+    Scale numbers to units of 10**-decimals (see as_units), rounding half away
+    from zero. NaN becomes 0, so keep a separate mask where missing values
+    matter. Binary float noise (1.005 stored as 1.00499999...) is removed
+    before rounding.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    scaled = np.round(values * 10 ** decimals, 6)
+    return as_units(np.sign(scaled) * np.floor(np.abs(scaled) + 0.5))
+
+
+def from_units(units, decimals=MONEY_DECIMALS):
+    """Convert int64 or Python int units back to floats, e.g. for storing in the workbook"""
+    units = np.asarray(units)
+    # A Python int just past the int64 range comes back from NumPy as uint64
+    if units.dtype != object and units.dtype.kind != 'u':
+        units = units.astype(np.int64)
+    return units.astype(float) / 10 ** decimals
+
+
+def quantize(values, decimals=MONEY_DECIMALS):
+    """
+    Round numbers to `decimals` places half away from zero, as floats for storing
+    Unit rates are quantized when they are saved so that a stored rate times the
+    quantity is exactly the line total shown for it. NaN stays NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isnan(values), np.nan, from_units(to_units(values, decimals), decimals))
+
+
+def line_units(rates, quantities):
+    """
+    Exact line totals (rate x quantity) as units at LINE_DECIMALS
+    rates and quantities are plain numbers and broadcast like NumPy arrays;
+    NaN rates or quantities count as zero. The result is int64 when the lines'
+    absolute values add up to less than 2**62, so every line and every sum of
+    lines fits; otherwise it holds Python ints.
+    """
+    rate_units = to_units(rates, MONEY_DECIMALS)
+    quantity_units = to_units(quantities, QUANTITY_DECIMALS)
+    rate_size = np.abs(rate_units)
+    quantity_size = np.abs(quantity_units)
+    largest = float(rate_size.max(initial=0)) * float(quantity_size.max(initial=0))
+    # The cheap bound settles ordinary tenders; the float sum only runs near the limit
+    if largest * np.broadcast(rate_units, quantity_units).size < INT64_BOUND / 2 or \
+            (rate_size.astype(float) * quantity_size.astype(float)).sum() < INT64_BOUND / 2:
+        return (rate_units * quantity_units).astype(np.int64)
+    return rate_units.astype(object) * quantity_units.astype(object)
+
+
+def line_amounts(rates, quantities):
+    """Line totals as floats at LINE_DECIMALS precision, NaN where the rate is missing"""
+    rates = np.asarray(rates, dtype=float)
+    return np.where(np.isnan(rates), np.nan, from_units(line_units(rates, quantities), LINE_DECIMALS))
+
+
+def difference(a, b, decimals=LINE_DECIMALS):
+    """a - b for amounts exact at `decimals` places, without float subtraction noise"""
+    return float(from_units(to_units(a, decimals) - to_units(b, decimals), decimals))
+
+
+def round_amount(value, decimals=MONEY_DECIMALS):
+    """Round one amount half up to the display precision, as a Decimal (None for missing values)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    try:
+        amount = Decimal(repr(float(value)))
+    except (TypeError, ValueError):
+        return None
+    return amount.quantize(Decimal(1).scaleb(-decimals), rounding=ROUND_HALF_UP)
+
+
+def format_amount(value, decimals=MONEY_DECIMALS):
+    """Thousands-separated amount rounded for display, e.g. 1234.565 -> '1,234.57'"""
+    amount = round_amount(value, decimals)
+    if amount is None:
+        return 'N/A'
+    return f"{amount:,.{decimals}f}"
@@ -0,0 +1,501 @@
+"""
+Bid comparison report as a PDF
+
+render_bid_pdf draws the report served by the download_pdf route and bundled by
+report_export. It only reads the workbook, and importing this module has no side
+effects, so report worker processes can import it without loading the web app.
+"""
+import math
+from datetime import datetime
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+import bid_analysis
+import db_helper as db
+import money
+
+
+def _is_missing_excel_value(value):
+    """Detect whether a cell value from Excel should be treated as empty"""
+    if value is None:
+        return True
+    try:
+        if math.isnan(value):
+            return True
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, str) and value.strip().lower() in {'', 'nan', 'nat', 'none'}:
+        return True
+    return False
+
+
+def sanitize_excel_value(value, default=''):
+    """Return a safe default when Excel data is missing"""
+    return default if _is_missing_excel_value(value) else value
+
+
+def normalize_bid_record(bid_record):
+    """Coerce optional bid fields to predictable defaults"""
+    if not bid_record:
+        return {}
+
+    normalized = bid_record.copy()
+    for key in [
+        'selected_buyer_id',
+        'selected_submission_id',
+        'vendor_justification',
+        'buyer_comment',
+        'submission_date',
+        'a1_comment',
+        'a1_date',
+        'a2_comment',
+        'a2_date'
+    ]:
+        normalized[key] = sanitize_excel_value(normalized.get(key), '')
+    return normalized
+
+
+def render_bid_pdf(bid_id, output):
+    """Draw the bid comparison report for a bid into a writable binary file object
+
+    Returns False when the bid does not exist so callers can decide how to report it.
+    """
+    bundle = db.get_bid_bundle(bid_id)
+    if not bundle:
+        return False
+    
+    bid = normalize_bid_record(bundle['bid'])
+    history = bundle['history']
+    items = bundle['items']
+    
+    # Bidders who quoted at least one item, with their rates and totals
+    rates = bundle['rates']
+    all_bidders = set(rates.index)
+    bidder_names = {
+        bidder_id: bundle['bidders'].get(bidder_id, {}).get('bidder_name', bidder_id)
+        for bidder_id in all_bidders
+    }
+    
+    # Create Professional PDF
+    c = canvas.Canvas(output, pagesize=letter)
+    width, height = letter
+    
+    def draw_header(canvas_obj, y_start):
+        """Draw professional header"""
+        canvas_obj.setFillColorRGB(0.2, 0.3, 0.5)
+        canvas_obj.rect(0, y_start - 0.8*inch, width, 0.8*inch, fill=1)
+        canvas_obj.setFillColorRGB(1, 1, 1)
+        canvas_obj.setFont("Helvetica-Bold", 20)
+        canvas_obj.drawCentredString(width/2, y_start - 0.5*inch, "BID COMPARISON REPORT")
+        canvas_obj.setFillColorRGB(0, 0, 0)
+        return y_start - 1*inch
+    
+    def draw_section(canvas_obj, y_pos, title):
+        """Draw section header"""
+        canvas_obj.setFillColorRGB(0.2, 0.3, 0.5)
+        canvas_obj.setFont("Helvetica-Bold", 14)
+        canvas_obj.drawString(0.75*inch, y_pos, title)
+        canvas_obj.setStrokeColorRGB(0.2, 0.3, 0.5)
+        canvas_obj.setLineWidth(2)
+        canvas_obj.line(0.75*inch, y_pos - 5, width - 0.75*inch, y_pos - 5)
+        canvas_obj.setFillColorRGB(0, 0, 0)
+        canvas_obj.setStrokeColorRGB(0, 0, 0)
+        canvas_obj.setLineWidth(1)
+        return y_pos - 0.3*inch
+    
+    def draw_field(canvas_obj, y_pos, label, value, bold_label=True):
+        """Draw a label-value pair"""
+        label_font = "Helvetica-Bold" if bold_label else "Helvetica"
+        value_font = "Helvetica"
+        font_size = 10
+
+        label_text = f"{label}:" if label else ""
+        canvas_obj.setFont(label_font, font_size)
+        if label_text:
+            canvas_obj.drawString(1 * inch, y_pos, label_text)
+
+        value_str = str(value) if value not in (None, "") else "N/A"
+        label_width = canvas_obj.stringWidth(label_text, label_font, font_size) if label_text else 0
+        value_x = 1 * inch + label_width + (0.12 * inch if label_text else 0)
+        
+        canvas_obj.setFont(value_font, font_size)
+        canvas_obj.drawString(value_x, y_pos, value_str)
+        return y_pos - 0.25 * inch
+    
+    # PAGE 1
+    y = draw_header(c, height)
+    y -= 0.3*inch
+    
+    # Contract Information
+    y = draw_section(c, y, "1. CONTRACT INFORMATION")
+    y = draw_field(c, y, "Bid ID", bid['bid_id'])
+    y = draw_field(c, y, "Contract Name", bid['contract_name'])
+    y = draw_field(c, y, "Description", bid['contract_description'])
+    y = draw_field(c, y, "Contract Value", f"${money.format_amount(bid['contract_value'])}")
+    y = draw_field(c, y, "Created By", bid['vendor_name'])
+    y = draw_field(c, y, "Created Date", bid['created_date'])
+    y = draw_field(c, y, "Status", bid['status'])
+    
+    # Get assigned buyer info
+    selected_buyer_id = str(sanitize_excel_value(bid.get('selected_buyer_id'), '')).strip()
+    assigned_buyer = bundle['assigned_buyer'] if selected_buyer_id else None
+    if assigned_buyer:
+        assigned_buyer_label = f"{assigned_buyer.get('buyer_name', 'N/A')} ({selected_buyer_id})"
+    else:
+        assigned_buyer_label = "Not Assigned"
+    y = draw_field(c, y, "Assigned Buyer", assigned_buyer_label)
+    y -= 0.3*inch
+    
+    # Bid Items and Comparison in Tabular Form
+    if not items.empty and all_bidders:
+        if y < 5*inch:
+            c.showPage()
+            y = draw_header(c, height) - 0.3*inch
+            
+        y = draw_section(c, y, "2. BID ITEMS & BIDDER COMPARISON")
+        y -= 0.2*inch
+        
+        # Calculate column widths based on number of bidders
+        bidders_list = sorted(list(all_bidders))
+        num_bidders = len(bidders_list)
+        
+        # items x bidders views of the prefetched matrices for row-wise drawing
+        rate_rows = rates.reindex(bidders_list).to_numpy().T
+        line_total_rows = bundle['line_totals'].reindex(bidders_list).to_numpy().T
+        bidder_totals = bundle['bidder_totals'].reindex(bidders_list).fillna(0).to_numpy()
+        
+        # Improved table layout
+        item_col_width = 2.5*inch
+        qty_col_width = 0.4*inch
+        unit_col_width = 0.6*inch
+        available_width = width - 2*0.75*inch - item_col_width - qty_col_width - unit_col_width
+        bidder_col_width = available_width / num_bidders if num_bidders > 0 else 1.5*inch
+        
+        x_start = 0.75*inch
+        table_width = width - 1.5*inch
+        
+        # Draw table header with better styling
+        header_height = 0.5*inch
+        c.setFillColorRGB(0.2, 0.3, 0.5)  # Dark blue header
+        c.rect(x_start, y - header_height, table_width, header_height, fill=1, stroke=1)
+        c.setFillColorRGB(1, 1, 1)  # White text
+        c.setFont("Helvetica-Bold", 9)
+        
+        x = x_start + 0.05*inch
+        # Multi-line header for Item column
+        c.drawString(x, y - 0.2*inch, "Item Name")
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(x, y - 0.35*inch, "Description")
+        
+        x += item_col_width
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(x, y - 0.27*inch, "Qty")
+        
+        x += qty_col_width
+        c.drawString(x, y - 0.27*inch, "Unit")
+        
+        x += unit_col_width
+        
+        # Bidder columns with better formatting
+        c.setFont("Helvetica-Bold", 8)
+        for bidder_id in bidders_list:
+            bidder_name = bidder_names.get(bidder_id, bidder_id)
+            # Smart truncation
+            if len(bidder_name) > 18:
+                bidder_name = bidder_name[:15] + "..."
+            c.drawString(x + 0.05*inch, y - 0.18*inch, bidder_name)
+            c.setFont("Helvetica", 7)
+            c.drawString(x + 0.05*inch, y - 0.35*inch, "Rate | Total")
+            c.setFont("Helvetica-Bold", 8)
+            x += bidder_col_width
+        
+        y -= (header_height + 0.05*inch)
+        
+        # Draw items rows with improved formatting
+        for idx, item in enumerate(items.to_dict('records')):
+            if y < 1.5*inch:
+                c.showPage()
+                y = draw_header(c, height) - 0.3*inch
+                # Redraw header on new page
+                c.setFillColorRGB(0.2, 0.3, 0.5)
+                c.rect(x_start, y - header_height, table_width, header_height, fill=1, stroke=1)
+                c.setFillColorRGB(1, 1, 1)
+                c.setFont("Helvetica-Bold", 9)
+                x = x_start + 0.05*inch
+                c.drawString(x, y - 0.2*inch, "Item Name")
+                c.setFont("Helvetica-Bold", 8)
+                c.drawString(x, y - 0.35*inch, "Description")
+                x += item_col_width
+                c.setFont("Helvetica-Bold", 9)
+                c.drawString(x, y - 0.27*inch, "Qty")
+                x += qty_col_width
+                c.drawString(x, y - 0.27*inch, "Unit")
+                x += unit_col_width
+                c.setFont("Helvetica-Bold", 8)
+                for bidder_id in bidders_list:
+                    bidder_name = bidder_names.get(bidder_id, bidder_id)
+                    if len(bidder_name) > 18:
+                        bidder_name = bidder_name[:15] + "..."
+                    c.drawString(x + 0.05*inch, y - 0.18*inch, bidder_name)
+                    c.setFont("Helvetica", 7)
+                    c.drawString(x + 0.05*inch, y - 0.35*inch, "Rate | Total")
+                    c.setFont("Helvetica-Bold", 8)
+                    x += bidder_col_width
+                y -= (header_height + 0.05*inch)
+            
+            row_height = 0.45*inch
+            
+            # Draw row background with alternating colors
+            if idx % 2 == 0:
+                c.setFillColorRGB(0.97, 0.97, 0.97)
+            else:
+                c.setFillColorRGB(1, 1, 1)
+            c.rect(x_start, y - row_height, table_width, row_height, fill=1, stroke=0)
+            
+            # Draw row border
+            c.setFillColorRGB(0, 0, 0)
+            c.setStrokeColorRGB(0.7, 0.7, 0.7)
+            c.setLineWidth(0.5)
+            c.rect(x_start, y - row_height, table_width, row_height, fill=0, stroke=1)
+            c.setStrokeColorRGB(0, 0, 0)
+            c.setLineWidth(1)
+            
+            x = x_start + 0.05*inch
+            
+            # Item name and description with better formatting
+            c.setFont("Helvetica-Bold", 9)
+            item_name = str(item['item_name'])
+            if len(item_name) > 35:
+                item_name = item_name[:32] + "..."
+            c.drawString(x, y - 0.17*inch, item_name)
+            
+            c.setFont("Helvetica", 7)
+            item_desc = str(item['item_description'])
+            if len(item_desc) > 45:
+                item_desc = item_desc[:42] + "..."
+            c.drawString(x, y - 0.32*inch, item_desc)
+            
+            x += item_col_width
+            
+            # Quantity
+            c.setFont("Helvetica", 9)
+            c.drawString(x, y - 0.25*inch, f"{item['quantity']}")
+            x += qty_col_width
+            
+            # Unit
+            unit_text = str(item['unit'])
+            if len(unit_text) > 6:
+                unit_text = unit_text[:5] + "."
+            c.drawString(x, y - 0.25*inch, unit_text)
+            x += unit_col_width
+            
+            # Bidder rates with better formatting
+            for unit_rate, total in zip(rate_rows[idx], line_total_rows[idx]):
+                rate_text = "N/A"
+                total_text = ""
+                
+                if not math.isnan(unit_rate):
+                    rate_text = f"${money.format_amount(unit_rate)}"
+                    total_text = f"${money.format_amount(total)}"
+                
+                c.setFont("Helvetica-Bold", 8)
+                c.drawString(x + 0.05*inch, y - 0.17*inch, rate_text)
+                if total_text:
+                    c.setFont("Helvetica", 7)
+                    c.setFillColorRGB(0.3, 0.3, 0.3)
+                    c.drawString(x + 0.05*inch, y - 0.32*inch, total_text)
+                    c.setFillColorRGB(0, 0, 0)
+                
+                x += bidder_col_width
+            
+            y -= row_height
+        
+        # Add total row
+        c.setFillColorRGB(0.9, 0.9, 0.9)
+        total_row_height = 0.35*inch
+        c.rect(x_start, y - total_row_height, table_width, total_row_height, fill=1, stroke=1)
+        c.setFillColorRGB(0, 0, 0)
+        
+        x = x_start + 0.05*inch
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(x, y - 0.22*inch, "TOTAL BID AMOUNTS:")
+        
+        x = x_start + item_col_width + qty_col_width + unit_col_width
+        
+        # Show the prefetched totals for each bidder
+        for total_amount in bidder_totals:
+            c.setFont("Helvetica-Bold", 9)
+            c.drawString(x + 0.05*inch, y - 0.22*inch, f"${money.format_amount(total_amount)}")
+            x += bidder_col_width
+        
+        y -= (total_row_height + 0.3*inch)
+
+    # Item-wise award analysis (L1/L2/L3 per item and split award savings)
+    award = bid_analysis.get_item_award(bid_id, bundle)
+    if award:
+        if y < 3*inch:
+            c.showPage()
+            y = draw_header(c, height) - 0.3*inch
+
+        y = draw_section(c, y, "3. ITEM-WISE AWARD ANALYSIS")
+        y -= 0.1*inch
+        y = draw_field(c, y, "Split Award Total (all L1)", f"${money.format_amount(award['split_total'])}")
+        if award['best_single_bidder']:
+            y = draw_field(c, y, "Best Single Bidder",
+                           f"{award['best_single_name']} (${money.format_amount(award['best_single_total'])})")
+            y = draw_field(c, y, "Savings from Split Award",
+                           f"${money.format_amount(award['savings'])} ({award['savings_pct']:.1f}%)"
+                           if award['savings_pct'] is not None else f"${money.format_amount(award['savings'])}")
+        else:
+            y = draw_field(c, y, "Best Single Bidder", "No bidder quoted every item")
+        if award['uncovered_items']:
+            y = draw_field(c, y, "Items Without Quotes", award['uncovered_items'])
+        for row in award['split_award']:
+            y = draw_field(c, y, f"  {row['bidder_name']}",
+                           f"{row['items']} item(s), ${money.format_amount(row['amount'])}", bold_label=False)
+        y -= 0.1*inch
+
+        for item in award['item_levels']:
+            if y < 1.5*inch:
+                c.showPage()
+                y = draw_header(c, height) - 0.3*inch
+            item_name = str(item['item_name'])
+            if len(item_name) > 30:
+                item_name = item_name[:27] + "..."
+            c.setFont("Helvetica-Bold", 9)
+            c.drawString(1*inch, y, item_name)
+            c.setFont("Helvetica", 8)
+            x = 3*inch
+            for level in item['levels']:
+                bidder_name = str(level['bidder_name'])
+                if len(bidder_name) > 18:
+                    bidder_name = bidder_name[:16] + ".."
+                c.drawString(x, y, f"{level['level']}: {bidder_name} ${money.format_amount(level['unit_rate'])}")
+                x += 1.75*inch
+            if not item['levels']:
+                c.drawString(x, y, "No quotes")
+            y -= 0.2*inch
+        y -= 0.2*inch
+
+    # Check if we need a new page
+    if y < 4*inch:
+        c.showPage()
+        y = draw_header(c, height) - 0.3*inch
+    
+    # Approval Workflow
+    y = draw_section(c, y, "4. APPROVAL WORKFLOW")
+    y -= 0.1*inch
+    
+    # Buyer Comments
+    buyer_comment = bid.get('buyer_comment', '').strip()
+    if buyer_comment:
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(1*inch, y, "Buyer Comments")
+        y -= 0.2*inch
+        y = draw_field(c, y, "Buyer", assigned_buyer_label if assigned_buyer else "N/A")
+        y = draw_field(c, y, "Comment", buyer_comment)
+        y = draw_field(c, y, "Submitted On", bid.get('submission_date') or 'Not submitted')
+        y -= 0.2*inch
+    
+    # A1 Approval
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(1*inch, y, "Level 1 Approval (A1)")
+    y -= 0.2*inch
+    y = draw_field(c, y, "Status", bid['a1_status'])
+    y = draw_field(c, y, "Comment", bid['a1_comment'])
+    y = draw_field(c, y, "Date", bid['a1_date'])
+    y -= 0.2*inch
+    
+    # A2 Approval
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(1*inch, y, "Level 2 Approval (A2) - FINAL")
+    y -= 0.2*inch
+    y = draw_field(c, y, "Status", bid['a2_status'])
+    y = draw_field(c, y, "Comment", bid['a2_comment'])
+    y = draw_field(c, y, "Date", bid['a2_date'])
+    y -= 0.3*inch
+    
+    # Final Status Box
+    final_status = bid.get('status', 'Unknown')
+    
+    # Determine status color
+    status_color = (0.9, 0.9, 0.9)  # Default gray
+    if final_status == 'Approved':
+        status_color = (0.2, 0.7, 0.3)  # Green
+    elif final_status == 'Rejected':
+        status_color = (0.8, 0.2, 0.2)  # Red
+    elif final_status in ['Pending', 'Submitted', 'Under Review']:
+        status_color = (0.95, 0.7, 0.2)  # Orange
+    
+    # Draw final status box with border
+    box_width = 3*inch
+    box_height = 0.5*inch
+    x_center = (width - box_width) / 2
+    
+    # Draw outer border (darker)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setLineWidth(2)
+    c.setFillColorRGB(*status_color)
+    c.rect(x_center, y - box_height, box_width, box_height, fill=1, stroke=1)
+    
+    # Draw text
+    c.setFillColorRGB(1, 1, 1)  # White text
+    c.setFont("Helvetica-Bold", 14)
+    text_width = c.stringWidth(f"FINAL STATUS: {final_status.upper()}", "Helvetica-Bold", 14)
+    c.drawString(x_center + (box_width - text_width) / 2, y - 0.32*inch, f"FINAL STATUS: {final_status.upper()}")
+    
+    # Reset colors
+    c.setFillColorRGB(0, 0, 0)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setLineWidth(1)
+    
+    y -= (box_height + 0.3*inch)
+    
+    # Check if we need a new page for audit trail
+    if y < 3*inch:
+        c.showPage()
+        y = draw_header(c, height) - 0.3*inch
+    
+    # Audit Trail
+    y = draw_section(c, y, "5. AUDIT TRAIL")
+    y -= 0.1*inch
+    
+    if not history.empty:
+        c.setFont("Helvetica", 8)
+        for idx, record in history.iterrows():
+            if y < 1.5*inch:
+                c.showPage()
+                y = draw_header(c, height) - 0.3*inch
+            
+            c.setFont("Helvetica-Bold", 9)
+            c.drawString(1*inch, y, f"{record['action_date']} - {record['action']}")
+            y -= 0.15*inch
+            c.setFont("Helvetica", 8)
+            c.drawString(1.2*inch, y, f"By: {record['action_by']} ({record['role']})")
+            y -= 0.12*inch
+            if record['comment']:
+                comment_str = str(record['comment'])
+                if len(comment_str) > 80:
+                    comment_str = comment_str[:77] + "..."
+                c.drawString(1.2*inch, y, f"Comment: {comment_str}")
+                y -= 0.12*inch
+            if record['previous_status'] or record['new_status']:
+                prev_status = record['previous_status'] if record['previous_status'] else 'None'
+                new_status = record['new_status'] if record['new_status'] else 'None'
+                c.drawString(1.2*inch, y, f"Status: {prev_status} → {new_status}")
+                y -= 0.12*inch
+            y -= 0.1*inch
+    else:
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(1*inch, y, "No audit trail records found")
+        y -= 0.3*inch
+    
+    # Footer
+    c.setFont("Helvetica", 8)
+    c.drawString(0.75*inch, 0.5*inch, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    c.drawRightString(width - 0.75*inch, 0.5*inch, f"Document: {bid['bid_id']}_Comparison.pdf")
+    
+    c.save()
+    return True
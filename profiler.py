@@ -0,0 +1,193 @@
+"""
+On-demand request profiling
+
+A profiled request runs under cProfile while a background thread samples the
+request thread's stack every SAMPLE_INTERVAL seconds. Each profile is written to
+PROFILE_DIR as three files sharing one name:
+
+    <name>.prof       pstats data (python -m pstats, snakeviz, ...)
+    <name>.collapsed  collapsed stacks, one "frame;frame;frame count" line per
+                      stack, for flamegraph.pl or speedscope
+    <name>.json       route, bid_id, duration and the top functions, for listing
+
+Profiling is opt-in: Vendor (admin) users add ?profile=1 to any URL, and
+BID_PROFILE_SAMPLE_RATE (0 to 1, default 0) profiles that share of all requests.
+Only one request is profiled at a time; the rest run normally.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get('BID_PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('BID_PROFILE_SAMPLE_RATE', 0))
+
+# Seconds between stack samples for the collapsed-stack file
+SAMPLE_INTERVAL = 0.005
+
+# Profiles kept on disk; older ones are deleted when a new one is saved
+PROFILE_KEEP = 50
+
+# Functions listed per profile on the admin page
+TOP_FUNCTIONS = 15
+
+PROFILE_EXTENSIONS = ('.prof', '.collapsed', '.json')
+
+_active = threading.Lock()
+
+
+def should_sample():
+    """True for the BID_PROFILE_SAMPLE_RATE share of requests"""
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled at a fixed interval"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """cProfile plus stack sampling for the calling thread, between start() and stop()"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.started = None
+        self.seconds = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sampler.stop()
+        self.seconds = time.perf_counter() - self.started
+
+
+def start():
+    """Begin profiling the current request, or return None if another one is being profiled"""
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        profile = RequestProfile()
+        profile.start()
+    except Exception:
+        _active.release()
+        raise
+    return profile
+
+
+def _top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6)
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:limit]
+
+
+def finish(profile, info):
+    """
+    Stop a profile returned by start() and save it under PROFILE_DIR
+    info holds the request details (endpoint, path, bid_id, ...) stored in the
+    .json file. Returns the profile name, or None if it could not be written.
+    """
+    try:
+        profile.stop()
+    finally:
+        _active.release()
+
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{info.get('endpoint') or 'unmatched'}"
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, name)
+        profile.profile.dump_stats(base + '.prof')
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in sorted(profile.sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        stats = pstats.Stats(profile.profile, stream=io.StringIO())
+        summary = dict(info,
+                       name=name,
+                       created=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                       seconds=round(profile.seconds, 6),
+                       samples=profile.sampler.samples,
+                       top=_top_functions(stats))
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+        prune()
+    except Exception as e:
+        print(f"Error saving profile {name}: {e}")
+        return None
+    return name
+
+
+def list_profiles(limit=PROFILE_KEEP):
+    """Summaries of the saved profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted((f[:-len('.json')] for f in os.listdir(PROFILE_DIR) if f.endswith('.json')), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name + '.json'), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading profile {name}: {e}")
+    return profiles
+
+
+def profile_path(name, extension):
+    """Path of one saved profile file, or None if the name or extension is not valid"""
+    if extension not in PROFILE_EXTENSIONS or os.path.basename(name) != name or name.startswith('.'):
+        return None
+    path = os.path.join(PROFILE_DIR, name + extension)
+    return path if os.path.isfile(path) else None
+
+
+def prune(keep=PROFILE_KEEP):
+    """Delete all but the newest `keep` profiles"""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(PROFILE_DIR)
+                    if f.endswith(PROFILE_EXTENSIONS)}, reverse=True)
+    for name in names[keep:]:
+        for extension in PROFILE_EXTENSIONS:
+            path = os.path.join(PROFILE_DIR, name + extension)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,168 @@
+"""
+Bulk export of bid comparison reports as a ZIP archive
+
+PDFs are rendered in parallel worker processes with the same drawing code used by
+the download_pdf route (pdf_report.py). Each worker writes its report to a
+temporary file and the parent process streams the files into the archive one at a
+time, so neither the web worker nor the CLI ever holds more than one report in
+memory.
+
+Workers are spawned, not forked: forking the threaded web server could copy a
+lock held by another thread (the sheet cache, the workbook lock) into a child that
+then waits on it forever. The web app shares one pool of REPORT_WORKERS processes
+across all requests (BID_REPORT_WORKERS, default up to 4); the CLI starts its own.
+
+Usage:
+    python report_export.py --status Approved --output approved_reports.zip
+    python report_export.py --from 2025-01-01 --to 2025-01-31 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import db_helper as db
+from pdf_report import render_bid_pdf
+
+ZIP_CHUNK_SIZE = 64 * 1024
+REPORT_WORKERS = int(os.environ.get('BID_REPORT_WORKERS', min(os.cpu_count() or 1, 4)))
+
+_shared_executor = None
+_executor_lock = threading.Lock()
+
+
+def select_report_bids(status=None, date_from=None, date_to=None):
+    """Return the bid IDs matching a status and/or created_date range (inclusive)"""
+    bids_df = db.filter_bids(status=status, date_from=date_from, date_to=date_to)
+    if bids_df.empty:
+        return []
+    return bids_df['bid_id'].dropna().astype(str).tolist()
+
+
+def _new_executor(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def shared_executor():
+    """The pool shared by every bulk export of this process, started on first use"""
+    global _shared_executor
+    with _executor_lock:
+        if _shared_executor is None:
+            _shared_executor = _new_executor(max(REPORT_WORKERS, 1))
+        return _shared_executor
+
+
+def _render_report(bid_id, output_dir, database_file):
+    """Render one report to a file in output_dir; returns (bid_id, path or None)"""
+    db.DATABASE_FILE = database_file
+    path = os.path.join(output_dir, f"bid_{bid_id}_comparison.pdf")
+    with open(path, 'wb') as output:
+        rendered = render_bid_pdf(bid_id, output)
+    if not rendered:
+        os.remove(path)
+        return bid_id, None
+    return bid_id, path
+
+
+class _ZipStreamBuffer:
+    """Write-only sink that collects zip bytes until the generator drains them"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _split_chunks(data, chunk_size=ZIP_CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def iter_reports_zip(bid_ids, workers=None):
+    """Yield the bytes of a ZIP archive containing one comparison PDF per bid
+
+    Reports are rendered by the shared pool, or by a pool of ``workers`` processes
+    started for this archive, and written into the archive in bid order as soon
+    as each one is ready.
+    """
+    bid_ids = list(bid_ids)
+    own_executor = workers is not None
+    executor = _new_executor(max(1, min(workers, len(bid_ids) or 1))) if own_executor else shared_executor()
+    database_file = os.path.abspath(db.DATABASE_FILE)
+    work_dir = tempfile.mkdtemp(prefix='bid_reports_')
+    sink = _ZipStreamBuffer()
+    futures = []
+    try:
+        missing = []
+        futures = [executor.submit(_render_report, bid_id, work_dir, database_file) for bid_id in bid_ids]
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for future in futures:
+                bid_id, path = future.result()
+                if path is None:
+                    missing.append(bid_id)
+                    continue
+                archive.write(path, arcname=os.path.basename(path))
+                os.remove(path)
+                yield from _split_chunks(sink.drain())
+
+            if missing:
+                archive.writestr('MISSING.txt', '\n'.join(missing) + '\n')
+        yield from _split_chunks(sink.drain())
+    finally:
+        # A client that disconnects stops the rest of its reports, not the shared pool;
+        # reports already rendering finish before their directory is removed
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        if own_executor:
+            executor.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def write_reports_zip(bid_ids, output_path, workers=None):
+    """Write the archive produced by iter_reports_zip to output_path"""
+    with open(output_path, 'wb') as output:
+        for chunk in iter_reports_zip(bid_ids, workers=workers):
+            output.write(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export bid comparison PDFs as a ZIP archive')
+    parser.add_argument('--status', help="Only export bids with this status, e.g. 'Approved'")
+    parser.add_argument('--from', dest='date_from', help='Earliest created_date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Latest created_date (YYYY-MM-DD)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--output', default='bid_reports.zip', help='Output ZIP path')
+    parser.add_argument('--database', default=db.DATABASE_FILE, help='Path to database.xlsx')
+    args = parser.parse_args(argv)
+
+    db.DATABASE_FILE = args.database
+    bid_ids = select_report_bids(args.status, args.date_from, args.date_to)
+    if not bid_ids:
+        print("No bids matched the given filters.")
+        return 1
+
+    print(f"Exporting {len(bid_ids)} report(s) to {args.output}...")
+    write_reports_zip(bid_ids, args.output, workers=args.workers)
+    print("Done.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
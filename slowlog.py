@@ -0,0 +1,164 @@
+"""
+Slow-operation log
+
+Requests and db_helper calls that take longer than SLOW_THRESHOLD_MS are written
+to SLOW_LOG_FILE as one JSON object per line, with the route or function, bid_id,
+total time and every sheet access made while they ran:
+
+    {"kind": "request", "name": "vendor_dashboard", "route": "/vendor/dashboard",
+     "total_ms": 812.4, "db_calls": {"get_buyer_by_id": 40, ...},
+     "sheets": [{"call": "select_rows", "sheet": "Buyers", "count": 40, "ms": 95.1, "rows": 40}, ...],
+     "calls": [{"call": "select_rows", "sheet": "Buyers", "ms": 2.3, "rows": 1}, ...]}
+
+"sheets" totals the calls per sheet, so a page that looks up one row per bid
+shows up as a single line with a large count. db_helper records read_sheet,
+select_rows and write_sheet calls, plus a "parse" entry whenever a sheet is
+actually parsed from the workbook rather than served from the cache.
+
+Settings come from BID_SLOW_THRESHOLD_MS (default 500) and BID_SLOW_LOG_FILE
+(default slow_log.jsonl).
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+SLOW_THRESHOLD_MS = float(os.environ.get('BID_SLOW_THRESHOLD_MS', 500))
+SLOW_LOG_FILE = os.environ.get('BID_SLOW_LOG_FILE', 'slow_log.jsonl')
+
+# Individual sheet calls written per entry; the per-sheet totals always cover all of them
+MAX_LOGGED_CALLS = 200
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+class Operation:
+    """A request or db_helper call being timed, with the sheet calls made under it"""
+
+    def __init__(self, kind, name, context):
+        self.kind = kind
+        self.name = name
+        self.context = context
+        self.calls = []
+        self.db_calls = {}
+        self.start = time.perf_counter()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def start(kind, name, **context):
+    """Begin timing an operation on this thread; pass the result to finish()"""
+    operation = Operation(kind, name, context)
+    _stack().append(operation)
+    return operation
+
+
+def finish(operation, **context):
+    """Stop timing an operation and log it if it exceeded SLOW_THRESHOLD_MS"""
+    elapsed_ms = (time.perf_counter() - operation.start) * 1000
+    stack = _stack()
+    if operation in stack:
+        stack.remove(operation)
+    if elapsed_ms >= SLOW_THRESHOLD_MS:
+        operation.context.update(context)
+        write_entry(operation, elapsed_ms)
+    return elapsed_ms
+
+
+def record(call, sheet, seconds, rows):
+    """Add one sheet access to every operation running on this thread"""
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return
+    entry = (call, sheet, seconds, rows)
+    for operation in stack:
+        operation.calls.append(entry)
+
+
+def _summarize(calls):
+    totals = {}
+    for call, sheet, seconds, rows in calls:
+        total = totals.setdefault((call, sheet), {'call': call, 'sheet': sheet, 'count': 0, 'ms': 0.0, 'rows': 0})
+        total['count'] += 1
+        total['ms'] += seconds * 1000
+        total['rows'] += rows
+    summary = sorted(totals.values(), key=lambda total: total['ms'], reverse=True)
+    for total in summary:
+        total['ms'] = round(total['ms'], 3)
+    return summary
+
+
+def write_entry(operation, elapsed_ms):
+    """Append one JSON line describing a slow operation"""
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        'kind': operation.kind,
+        'name': operation.name,
+        **operation.context,
+        'total_ms': round(elapsed_ms, 3),
+        'threshold_ms': SLOW_THRESHOLD_MS,
+        'db_calls': operation.db_calls,
+        'sheets': _summarize(operation.calls),
+        'calls': [
+            {'call': call, 'sheet': sheet, 'ms': round(seconds * 1000, 3), 'rows': rows}
+            for call, sheet, seconds, rows in operation.calls[:MAX_LOGGED_CALLS]
+        ]
+    }
+    if len(operation.calls) > MAX_LOGGED_CALLS:
+        entry['calls_truncated'] = len(operation.calls) - MAX_LOGGED_CALLS
+    try:
+        line = json.dumps(entry, default=str)
+        with _write_lock:
+            with open(SLOW_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except Exception as e:
+        print(f"Error writing slow log entry for {operation.name}: {e}")
+
+
+def instrument_functions(module):
+    """
+    Replace every public function defined in module with a wrapper that logs it
+    when slow. Only the outermost db_helper call on a thread is logged; calls
+    made inside it are counted in its db_calls instead.
+    """
+    for name, function in list(vars(module).items()):
+        if name.startswith('_') or not inspect.isfunction(function):
+            continue
+        if function.__module__ != module.__name__ or getattr(function, '_slow_logged', False):
+            continue
+        setattr(module, name, _logged_function(function))
+
+
+def _logged_function(function):
+    name = function.__name__
+    parameters = list(inspect.signature(function).parameters)
+    bid_position = parameters.index('bid_id') if 'bid_id' in parameters else None
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        for operation in stack:
+            operation.db_calls[name] = operation.db_calls.get(name, 0) + 1
+        if any(operation.kind == 'db' for operation in stack):
+            return function(*args, **kwargs)
+
+        bid_id = kwargs.get('bid_id')
+        if bid_id is None and bid_position is not None and bid_position < len(args):
+            bid_id = args[bid_position]
+        operation = start('db', name, bid_id='' if bid_id is None else str(bid_id))
+        try:
+            return function(*args, **kwargs)
+        finally:
+            finish(operation)
+
+    wrapper._slow_logged = True
+    return wrapper
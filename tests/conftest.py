@@ -0,0 +1,7 @@
+"""Make the application modules importable when pytest runs from any directory"""
+import os
+import sys
+
+project_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_home not in sys.path:
+    sys.path = [project_home] + sys.path
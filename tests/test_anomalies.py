@@ -0,0 +1,108 @@
+"""Pricing anomaly detection in bid_analysis"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import bid_analysis
+
+
+def column(values):
+    """One item quoted by len(values) bidders, as a bidders x 1 array"""
+    return np.array(values, dtype=float)[:, None]
+
+
+def test_zscores_use_median_and_mad():
+    zscores = bid_analysis.item_zscores(column([10, 10, 12, 14, 100]))[:, 0]
+    # median 12, absolute deviations [2, 2, 0, 2, 88], MAD 2
+    scale = 2 * 1.4826
+    assert zscores == pytest.approx([-2 / scale, -2 / scale, 0, 2 / scale, 88 / scale])
+
+
+def test_zscores_fall_back_to_mean_deviation_when_most_quotes_are_equal():
+    zscores = bid_analysis.item_zscores(column([10, 10, 10, 10, 13]))[:, 0]
+    # MAD is 0; the mean absolute deviation is 3 / 5
+    assert zscores == pytest.approx([0, 0, 0, 0, 3 / (0.6 * 1.2533)])
+
+
+def test_zscores_skip_thin_items_and_unquoted_cells():
+    rates = np.array([[10.0, 10.0], [12.0, np.nan], [np.nan, 50.0], [11.0, np.nan]])
+    zscores = bid_analysis.item_zscores(rates)
+    assert np.isnan(zscores[:, 1]).all()
+    assert np.isnan(zscores[2, 0]) and not np.isnan(zscores[[0, 1, 3], 0]).any()
+
+
+def random_rates(seed, bidders=9, items=30):
+    rng = np.random.default_rng(seed)
+    # Few distinct prices so that many quotes tie to the cent
+    rates = rng.integers(100, 106, size=(bidders, items)) / 10
+    rates[rng.random((bidders, items)) < 0.3] = np.nan
+    return rates
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_identical_pairs_match_brute_force(seed):
+    rates = random_rates(seed)
+    shared, identical_items = bid_analysis.identical_rate_pairs(rates)
+    cents = np.round(rates * 100)
+    bidders = len(rates)
+    expected = np.zeros((bidders, bidders))
+    for first in range(bidders):
+        for second in range(bidders):
+            if first != second:
+                expected[first, second] = (cents[first] == cents[second]).sum()
+    assert (shared == expected).all()
+    tied_items = sum(len(set(quotes[~np.isnan(quotes)])) < (~np.isnan(quotes)).sum() for quotes in cents.T)
+    assert identical_items == tied_items
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pattern_correlation_matches_direct_cosines(seed):
+    rates = random_rates(seed) * np.random.default_rng(seed).uniform(0.5, 2, size=30)
+    medians = np.nanmedian(rates, axis=0)
+    centred = []
+    for row in rates:
+        ratios = np.log(row / medians)
+        quoted = ~np.isnan(ratios)
+        centred.append(np.where(quoted, ratios - ratios[quoted].mean(), 0.0))
+    centred = np.array(centred)
+    norms = np.linalg.norm(centred, axis=1)
+    expected = centred @ centred.T / np.outer(norms, norms)
+    assert bid_analysis.pattern_correlation(rates) == pytest.approx(expected, abs=1e-5)
+
+
+def test_planted_copies_and_outliers_are_reported():
+    rng = np.random.default_rng(1)
+    base = rng.uniform(50, 150, size=40)
+    rates = np.round(base * rng.uniform(0.9, 1.1, size=(8, 40)), 2)
+    rates[1] = rates[0]                       # copied rates
+    rates[3] = np.round(rates[2] * 1.15, 2)   # same price pattern, 15% dearer
+    rates[5, 7] = rates[5, 7] * 10            # one extreme quote
+    rates[6, :10] = np.nan
+    frame = pd.DataFrame(rates, index=[f'BIDDER{n}' for n in range(8)])
+    items = pd.DataFrame({'item_id': [f'ITEM{n}' for n in range(40)], 'item_name': [f'Item {n}' for n in range(40)]})
+
+    found = bid_analysis.detect_anomalies(rates)
+    labelled = bid_analysis._label_anomalies(found, frame, items, {'BIDDER0': 'Acme'})
+
+    assert labelled['has_anomalies']
+    assert labelled['identical_pairs'][0]['bidder_ids'] == ['BIDDER0', 'BIDDER1']
+    assert labelled['identical_pairs'][0]['bidders'] == ['Acme', 'BIDDER1']
+    assert labelled['identical_pairs'][0]['share'] == 1.0
+    assert labelled['identical_pairs'][0]['common_items'] == 40
+    correlated = {tuple(pair['bidder_ids']) for pair in labelled['correlated_pairs']}
+    assert ('BIDDER2', 'BIDDER3') in correlated
+    assert {'bidder_id': 'BIDDER5', 'item_id': 'ITEM7', 'direction': 'high'}.items() <= labelled['outliers'][0].items()
+    pair = next(pair for pair in labelled['correlated_pairs'] if pair['bidder_ids'] == ['BIDDER2', 'BIDDER3'])
+    assert pair['common_items'] == 40
+
+
+@pytest.mark.parametrize('rates', [random_rates(0), random_rates(1, bidders=40, items=8)], ids=['full-product', 'pairwise'])
+def test_common_items_of_reportable_pairs(rates):
+    found = bid_analysis.detect_anomalies(rates)
+    reportable = (found['shared'] >= bid_analysis.IDENTICAL_MIN_ITEMS) | \
+        (found['correlation'] >= bid_analysis.CORRELATION_THRESHOLD)
+    first, second = bid_analysis._upper_pairs(reportable)
+    quoted = ~np.isnan(rates)
+    assert len(first)
+    assert (found['common'][first, second] == (quoted[first] & quoted[second]).sum(axis=1)).all()
+    assert (found['common'] == found['common'].T).all()
@@ -0,0 +1,103 @@
+"""Constrained award search in bid_analysis.optimize_award"""
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+import bid_analysis
+
+
+def make_tender(seed, bidders, items, coverage=0.75):
+    rng = np.random.default_rng(seed)
+    rates = np.round(rng.uniform(10, 100, size=(bidders, items)), 2)
+    rates[rng.random((bidders, items)) > coverage] = np.nan
+    quantities = rng.integers(1, 10, size=items).astype(float)
+    return rates, quantities
+
+
+def brute_force(rates, quantities, max_suppliers, min_lots):
+    """Cheapest total over every assignment of the quoted items, or inf if none follows the rules"""
+    bidders, items = rates.shape
+    quoted = [np.flatnonzero(~np.isnan(rates[:, item])) for item in range(items)]
+    columns = [item for item in range(items) if len(quoted[item])]
+    combos = np.array(list(itertools.product(*(quoted[item] for item in columns))))
+    cost = (rates[:, columns] * quantities[columns])[combos, np.arange(len(columns))].sum(axis=1)
+    lots = (combos[:, :, None] == np.arange(bidders)).sum(axis=1)
+    allowed = (lots > 0).sum(axis=1) <= (max_suppliers or bidders)
+    if min_lots:
+        allowed &= ((lots == 0) | (lots >= min_lots)).all(axis=1)
+    return cost[allowed].min() if allowed.any() else np.inf
+
+
+def assert_follows_rules(found, rates, quantities, max_suppliers, min_lots):
+    assignment = found['assignment']
+    quoted = ~np.isnan(rates)
+    assert ((assignment >= 0) == quoted.any(axis=0)).all()
+    awarded = np.flatnonzero(assignment >= 0)
+    assert quoted[assignment[awarded], awarded].all()
+    lots = np.bincount(assignment[awarded], minlength=len(rates))
+    assert (lots > 0).sum() <= (max_suppliers or len(rates))
+    if min_lots:
+        assert lots[lots > 0].min() >= min_lots
+    assert found['total'] == pytest.approx((rates[assignment[awarded], awarded] * quantities[awarded]).sum())
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('max_suppliers, min_lots', [(1, None), (2, None), (2, 3), (3, 2), (None, 4)])
+def test_exact_search_matches_brute_force(seed, max_suppliers, min_lots):
+    rates, quantities = make_tender(seed, bidders=4, items=6)
+    expected = brute_force(rates, quantities, max_suppliers, min_lots)
+    found = bid_analysis.optimize_award(rates, quantities, max_suppliers, min_lots, time_budget=10)
+
+    assert found['feasible'] == np.isfinite(expected)
+    if found['feasible']:
+        assert found['optimal']
+        assert found['method'] in ('exact', 'split')
+        assert found['total'] == pytest.approx(expected)
+        assert_follows_rules(found, rates, quantities, max_suppliers, min_lots)
+
+
+def test_split_award_when_rules_allow_it():
+    rates = np.array([[10.0, 50.0, np.nan], [20.0, 5.0, 7.0]])
+    found = bid_analysis.optimize_award(rates, np.array([1.0, 2.0, 3.0]), max_suppliers=2)
+    assert found['method'] == 'split'
+    assert found['assignment'].tolist() == [0, 1, 1]
+    assert found['total'] == 10 + 10 + 21
+
+
+def test_unquoted_items_are_left_out():
+    rates = np.array([[10.0, np.nan], [12.0, np.nan]])
+    found = bid_analysis.optimize_award(rates, np.ones(2), max_suppliers=1)
+    assert found['assignment'].tolist() == [0, -1]
+    assert found['total'] == 10
+
+
+def test_infeasible_rules():
+    # Four items cannot give two suppliers three lots each, and one supplier cannot cover item 2
+    rates = np.array([[10.0, 10.0, np.nan, 10.0], [12.0, 12.0, 12.0, np.nan]])
+    found = bid_analysis.optimize_award(rates, np.ones(4), max_suppliers=1)
+    assert not found['feasible'] and found['total'] is None
+    found = bid_analysis.optimize_award(rates, np.ones(4), min_lots=3)
+    assert not found['feasible']
+
+
+def test_expired_budget_returns_a_valid_non_exact_award():
+    rates, quantities = make_tender(5, bidders=12, items=40, coverage=0.9)
+    start = time.perf_counter()
+    found = bid_analysis.optimize_award(rates, quantities, max_suppliers=3, min_lots=5, time_budget=0)
+    assert time.perf_counter() - start < 1
+    assert found['feasible'] and not found['optimal']
+    assert found['method'] == 'heuristic'
+    assert_follows_rules(found, rates, quantities, 3, 5)
+
+
+def test_large_tender_stays_within_budget():
+    # Two full-coverage bidders, one much cheaper, so the lot rule is what makes it hard
+    rates, quantities = make_tender(7, bidders=200, items=400, coverage=0.5)
+    rates[:2] = make_tender(8, bidders=2, items=400, coverage=1)[0] * [[0.5], [1]]
+    start = time.perf_counter()
+    found = bid_analysis.optimize_award(rates, quantities, max_suppliers=2, min_lots=150, time_budget=0.5)
+    assert time.perf_counter() - start < 1.5
+    assert found['feasible'] and not found['optimal']
+    assert_follows_rules(found, rates, quantities, 2, 150)
@@ -0,0 +1,68 @@
+"""Fixed-point rounding and line totals in money.py"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pytest
+
+import money
+
+
+@pytest.mark.parametrize('value, decimals, units', [
+    (1.005, 2, 101),
+    (2.675, 2, 268),
+    (-1.005, 2, -101),
+    (0.125, 2, 13),
+    (-0.125, 2, -13),
+    (1.0049, 2, 100),
+    (0.0005, 3, 1),
+    (123456.785, 2, 12345679),
+])
+def test_to_units_rounds_half_away_from_zero(value, decimals, units):
+    assert int(money.to_units(value, decimals)) == units
+
+
+def test_to_units_counts_nan_as_zero():
+    assert money.to_units([np.nan, 1.5]).tolist() == [0, 150]
+
+
+def test_quantize_matches_decimal_half_up():
+    rng = np.random.default_rng(3)
+    # Values with a third decimal of exactly 5 are the ones binary floats get wrong
+    values = np.round(rng.uniform(0, 10000, 2000), 3)
+    expected = [float(Decimal(repr(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)) for value in values]
+    assert money.quantize(values).tolist() == expected
+
+
+def test_quantize_keeps_nan():
+    quantized = money.quantize([np.nan, 2.345])
+    assert np.isnan(quantized[0]) and quantized[1] == 2.35
+
+
+def test_line_units_are_exact_at_line_scale():
+    units = money.line_units([19.99, 0.07, np.nan], [3.333, 100, 5])
+    assert units.dtype == np.int64
+    assert units.tolist() == [1999 * 3333, 7 * 100000, 0]
+    assert money.from_units(units, money.LINE_DECIMALS).tolist() == [66.62667, 7.0, 0.0]
+
+
+def test_line_units_fall_back_to_python_ints_past_int64():
+    rates = [9_000_000_000.0, 1_000_000_000.0]
+    quantities = [1_000_000.0, 1.0]
+    units = money.line_units(rates, quantities)
+    assert units.dtype == object
+    expected = [9_000_000_000 * 100 * 1_000_000 * 1000, 1_000_000_000 * 100 * 1000]
+    assert units.tolist() == expected
+    assert units.sum() == sum(expected)
+    assert money.from_units(units, money.LINE_DECIMALS).tolist() == [9e15, 1e9]
+
+
+def test_sums_of_int64_lines_cannot_wrap():
+    # Each line fits in int64 but the total would not; the lines must come back as Python ints
+    units = money.line_units(np.full(4, 9_000_000_000.0), np.full(4, 10_000.0))
+    assert units.dtype == object
+    assert units.sum() == 4 * 9_000_000_000 * 100 * 10_000 * 1000
+
+
+def test_difference_is_exact():
+    assert money.difference(0.3, 0.1) == 0.2
+    assert money.difference(100_000_000_000_000.0, 1.5) == 99_999_999_999_998.5
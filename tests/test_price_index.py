@@ -0,0 +1,102 @@
+"""Leave-one-bid-out rate percentiles in db_helper.compute_price_index"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import db_helper as db
+
+NAMES = ['Office Desk', 'office  desk.', 'Chair', 'Laptop', '']
+UNITS = ['pcs', 'PCS', 'set']
+
+
+def make_tender(seed, bids=6, bidders=4):
+    """Random bids sharing item names (spelled differently) with tied and missing rates"""
+    rng = np.random.default_rng(seed)
+    items, submissions = [], []
+    for bid in range(bids):
+        bid_id = f'BID{bid:03d}'
+        for line in range(int(rng.integers(1, 6))):
+            item_id = f'ITEM{bid:03d}{line}'
+            items.append({'bid_id': bid_id, 'item_id': item_id, 'quantity': 1.0,
+                          'item_name': NAMES[rng.integers(len(NAMES))], 'unit': UNITS[rng.integers(len(UNITS))]})
+            for bidder in range(bidders):
+                if rng.random() < 0.2:
+                    continue
+                rate = float(rng.integers(1, 8)) * 5 if rng.random() < 0.8 else np.nan
+                submissions.append({'bid_id': bid_id, 'bidder_id': f'B{bidder}', 'item_id': item_id,
+                                    'unit_rate': rate, 'submission_date': '2025-01-01 00:00:00'})
+                if rng.random() < 0.1:
+                    # A later duplicate row; the first submitted rate counts
+                    submissions.append(dict(submissions[-1], unit_rate=999.0))
+    return pd.DataFrame(submissions), pd.DataFrame(items)
+
+
+def brute_force_index(submissions, items):
+    """For every bid and key it quotes, the percentiles of all other bids' rates for that key"""
+    keys = db._price_keys(items)
+    items = items.assign(item_key=keys['item_key'], unit_key=keys['unit_key'])
+    items = items[items['item_key'] != '']
+    rates = submissions.drop_duplicates(['bid_id', 'bidder_id', 'item_id']).dropna(subset=['unit_rate'])
+    lines = rates.merge(items, on=['bid_id', 'item_id'])
+    rows = []
+    for (bid_id, item_key, unit_key), _ in lines.groupby(['bid_id', 'item_key', 'unit_key']):
+        same_key = (lines['item_key'] == item_key) & (lines['unit_key'] == unit_key)
+        others = lines.loc[same_key & (lines['bid_id'] != bid_id), 'unit_rate'].to_numpy(dtype=float)
+        if not len(others):
+            continue
+        row = {'bid_id': bid_id, 'item_key': item_key, 'unit_key': unit_key, 'sample_count': len(others),
+               'min_rate': others.min(), 'max_rate': others.max()}
+        for percentile in db.PRICE_INDEX_PERCENTILES:
+            row[f'p{percentile}'] = np.percentile(others, percentile)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def comparable(index_df):
+    columns = db.PRICE_INDEX_COLUMNS[:-1]
+    index_df = index_df[columns].sort_values(['bid_id', 'item_key', 'unit_key'], ignore_index=True)
+    return index_df.astype({column: float for column in columns[3:]})
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_matches_brute_force(seed):
+    submissions, items = make_tender(seed)
+    expected = brute_force_index(submissions, items)
+    actual = db.compute_price_index(submissions, items)
+    pd.testing.assert_frame_equal(comparable(actual), comparable(expected), check_dtype=False)
+
+
+def test_hand_computed_percentiles():
+    items = pd.DataFrame({'bid_id': ['A', 'A', 'B', 'C', 'C'], 'item_id': ['a1', 'a2', 'b1', 'c1', 'c2'],
+                          'item_name': ['Desk'] * 5, 'unit': ['pcs'] * 5, 'quantity': 1.0})
+    submissions = pd.DataFrame({'bid_id': ['A', 'A', 'B', 'C', 'C'], 'bidder_id': 'X',
+                                'item_id': ['a1', 'a2', 'b1', 'c1', 'c2'], 'unit_rate': [10.0, 20.0, 30.0, 40.0, 50.0],
+                                'submission_date': '2025-01-01 00:00:00'})
+    index_df = db.compute_price_index(submissions, items).set_index('bid_id')
+
+    # A is compared with B and C only: [30, 40, 50]
+    row = index_df.loc['A']
+    assert row['sample_count'] == 3
+    assert (row['min_rate'], row['p10'], row['p25'], row['p50'], row['p90'], row['max_rate']) == (30, 32, 35, 40, 48, 50)
+    # B with [10, 20, 40, 50]: p50 halfway between 20 and 40
+    assert index_df.loc['B', 'p50'] == 30
+    assert index_df.loc['C', 'p75'] == 25
+
+
+def test_key_quoted_by_one_bid_gets_no_row():
+    items = pd.DataFrame({'bid_id': ['A', 'B'], 'item_id': ['a1', 'b1'], 'item_name': ['Desk', 'Chair'],
+                          'unit': ['pcs', 'pcs'], 'quantity': 1.0})
+    submissions = pd.DataFrame({'bid_id': ['A', 'B'], 'bidder_id': 'X', 'item_id': ['a1', 'b1'],
+                                'unit_rate': [10.0, 20.0], 'submission_date': '2025-01-01 00:00:00'})
+    assert db.compute_price_index(submissions, items).empty
+
+
+def test_refresh_after_delete_matches_full_recompute():
+    submissions, items = make_tender(11)
+    index_df = db.compute_price_index(submissions, items)
+    quoted = items[items['item_id'].isin(submissions['item_id']) & (items['item_name'] != '')]
+    removed = quoted.iloc[[0]]
+    remaining = items.drop(removed.index)
+    refreshed = db._refresh_price_index(index_df, submissions, remaining, removed)
+    expected = db.compute_price_index(submissions, remaining)
+    pd.testing.assert_frame_equal(comparable(refreshed), comparable(expected), check_dtype=False)
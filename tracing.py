@@ -0,0 +1,187 @@
+"""
+Local request tracing
+
+With BID_TRACING=1 every request gets a span, each db_helper function called
+while serving it a child span, and the pandas sheet parses and openpyxl
+workbook writes inside those their own spans. When a trace's root span ends,
+the whole trace is appended to BID_TRACE_FILE (default traces.jsonl) as one
+line in the OTLP/JSON format, the same format the OpenTelemetry Collector's
+file exporter writes, so the file can be replayed into any OTLP backend or read
+directly; no collector is needed.
+
+When tracing is disabled, db_helper functions are not wrapped and span()
+returns a shared no-op object, so the cost is one function call per span site.
+"""
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+
+TRACING_ENABLED = os.environ.get('BID_TRACING', '').strip().lower() in {'1', 'true', 'yes', 'on'}
+TRACE_FILE = os.environ.get('BID_TRACE_FILE', 'traces.jsonl')
+SERVICE_NAME = 'bid-management-system'
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Span:
+    """One timed operation; use as a context manager or call end()"""
+
+    def __init__(self, name, kind, attributes):
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.finished = []
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        stack.append(self)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        stack = _stack()
+        if self in stack:
+            del stack[stack.index(self):]
+        self.root.finished.append(self)
+        if self.root is self:
+            _export(self.finished)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            'status': {'code': STATUS_CODE_ERROR, 'message': self.error} if self.error else {}
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = self.parent.span_id
+        return span
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Stands in for Span while tracing is disabled"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Start a span as a child of the current one on this thread (a no-op when disabled)"""
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, kind, attributes)
+
+
+def _export(spans):
+    """Append one finished trace to TRACE_FILE as an OTLP/JSON ExportTraceServiceRequest"""
+    payload = {
+        'resourceSpans': [{
+            'resource': {'attributes': [_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [s.to_otlp() for s in sorted(spans, key=lambda s: s.start_ns)]
+            }]
+        }]
+    }
+    try:
+        line = json.dumps(payload, default=str)
+        with _write_lock:
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except Exception as e:
+        print(f"Error writing trace: {e}")
+
+
+def instrument_functions(module):
+    """
+    Wrap every public function defined in module so each call gets a span named
+    module.function. Does nothing while tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return
+    for name, function in list(vars(module).items()):
+        if name.startswith('_') or not inspect.isfunction(function):
+            continue
+        if function.__module__ != module.__name__ or getattr(function, '_traced', False):
+            continue
+        setattr(module, name, _traced_function(function, f"{module.__name__}.{name}"))
+
+
+def _traced_function(function, span_name):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with Span(span_name, SPAN_KIND_INTERNAL, {'code.function': function.__name__}):
+            return function(*args, **kwargs)
+
+    wrapper._traced = True
+    return wrapper